@@ -0,0 +1,323 @@
+# External imports:
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Internal imports:
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.algorithms.genetic import Individual, edges_of, fitness
+from parent.code.algorithms.operators import route_from_path
+from parent.code.classes.coverage import best_subpath
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.helpers.bounds import optimality_gap, upper_bound as map_upper_bound
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+
+
+# Ant builder of the worker process
+_worker_builder: "Ant_Builder | None" = None
+
+
+class Ant_Builder:
+    """
+    Builds the solution of one ant, route by route. A route starts at an
+    end of a connection that is not covered yet (picked with chance
+    proportional to its pheromone), then walks over the CSR adjacency of
+    the map: the next connection is picked with weight
+    pheromone^alpha * heuristic^beta, where the heuristic is the value
+    of the connection per minute (10000 / E if it is not covered yet, 1
+    if it is) over its minutes. The walk goes on until the time limit;
+    then the route is cut to its best contiguous part (see
+    coverage.best_subpath). The ant stops when this part is not worth
+    the 100 points of a route, or at the maximum number of routes.
+    """
+
+    def __init__(self, load: RailNL, route_time_limit: int, max_routes: int,
+                 alpha: float, beta: float,
+                 original_connections_only: bool = False) -> None:
+        self.load = load
+        self.route_time_limit = route_time_limit
+        self.max_routes = max_routes
+        self.alpha = alpha
+        self.beta = beta
+        self.original_connections_only = original_connections_only
+
+        indptr, indices, durations, edge_ids = load.get_csr()
+        self.indptr, self.indices = indptr.tolist(), indices.tolist()
+        self.durations, self.edge_ids = durations.tolist(), edge_ids.tolist()
+
+        self.n_connections = len(load.connection_list)
+        self.value_per_connection = 10000 / self.n_connections
+        self.ends = [(load.station_index[station1.name], load.station_index[station2.name])
+                     for station1, station2 in load.connection_list]
+
+    def build(self, pheromone: list[float], rng: random.Random) -> Individual:
+        """
+        Build the solution of one ant, with the pheromone per connection
+        (index as in RailNL.connection_list).
+        """
+        covered: set[int] = set()
+        solution = []
+
+        while len(solution) < self.max_routes and len(covered) < self.n_connections:
+            uncovered = [edge for edge in range(self.n_connections) if edge not in covered]
+            edge = rng.choices(uncovered, weights=[pheromone[edge] for edge in uncovered])[0]
+            station = self.ends[edge][rng.random() < 0.5]
+
+            path, minutes, used = [station], 0, set()
+            while True:
+                options, weights = [], []
+                for entry in range(self.indptr[station], self.indptr[station + 1]):
+                    duration, edge = self.durations[entry], self.edge_ids[entry]
+                    # Neighbours are sorted by duration, so the rest is too long
+                    if minutes + duration > self.route_time_limit:
+                        break
+                    if self.original_connections_only and edge in used:
+                        continue
+
+                    value = 1 if edge in covered or edge in used else self.value_per_connection
+                    options.append(entry)
+                    weights.append(pheromone[edge] ** self.alpha
+                                   * (value / duration) ** self.beta)
+
+                if not options:
+                    break
+                entry = rng.choices(options, weights=weights)[0]
+                station = self.indices[entry]
+                path.append(station)
+                minutes += self.durations[entry]
+                used.add(self.edge_ids[entry])
+
+            # Best part of the walk, given the routes before it
+            stations = [self.load.station_list[station] for station in path]
+            start, end, value = best_subpath(
+                stations, lambda key: self.load.connection_index[key] in covered,
+                self.value_per_connection)
+            if value <= 100:
+                break
+
+            route = tuple(path[start:end + 1])
+            solution.append(route)
+            covered.update(self.load.connection_index[tuple(sorted((station1.name, station2.name)))]
+                           for station1, station2 in zip(stations[start:end], stations[start + 1:end + 1]))
+
+        return tuple(solution)
+
+
+def _init_worker(maprange: str, settings: dict) -> None:
+    """
+    Load the map and make the ant builder once per worker process.
+    """
+    global _worker_builder
+    _worker_builder = Ant_Builder(RailNL(maprange), **settings)
+
+
+def _worker_build(task: tuple[list[float], int, str]) -> list[Individual]:
+    """
+    Build `n_ants` ants with the given pheromone in a worker process.
+    """
+    pheromone, n_ants, seed = task
+    rng = random.Random(seed)
+    return [_worker_builder.build(pheromone, rng) for _ in range(n_ants)]
+
+
+class ACO(Algorithm):
+    """Ant colony optimisation (MAX-MIN ant system) to optimize train
+    routes.
+
+    Every iteration, a colony of `n_ants` ants each build a whole
+    solution (see Ant_Builder), guided by the pheromone on every
+    connection (a NumPy array indexed like RailNL.connection_list).
+    Then all pheromone evaporates (times 1 - rho) and the best solution
+    of the colony and the best solution so far deposit pheromone on
+    their connections, proportional to their score. Pheromone is kept
+    between tau_min and tau_max, so no connection is ever left out
+    completely.
+
+    The ants of a colony are built in parallel over a process pool (in
+    chunks, one per worker).
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 n_workers: int | None = None) -> None:
+        """
+        - n_workers: number of processes to build ants with. Default is
+          the number of CPUs; with 1, everything runs in this process.
+        """
+        self.maprange = maprange
+        super().__init__(RailNL(maprange))
+
+        self.route_time_limit = 120 if maprange == "Holland" else 180
+        self.max_routes = 7 if maprange == "Holland" else 20
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count() or 1
+
+        self.edges = edges_of(self.load)
+        self.n_connections = len(self.load.connection_list)
+
+        self.best_score: float = 0
+        self.scores: list[float] = []
+
+    @classmethod
+    def from_start_state(cls, start_position: list[Route],
+                         maprange: str = "Holland") -> "ACO":
+        """
+        ACO that starts with `start_position` as best solution (so it
+        can replace Hillclimber in autorun_hillclimber).
+        """
+        aco = cls(maprange)
+        aco.routes = start_position
+        return aco
+
+    def to_individual(self, routes: list[Route]) -> Individual:
+        """
+        Turn routes into a tuple of station index tuples.
+        """
+        return tuple(tuple(self.load.station_index[station.name] for station in route.stations)
+                     for route in routes if len(route.stations) > 1)
+
+    def run(self, iterations: int = 2000,
+            simulated_annealing: bool = False,
+            cap=10**99,
+            improve_routes: bool = True,
+            original_connections_only: bool = False,
+            gap_threshold: float | None = None,
+            upper_bound: float | None = None,
+            n_ants: int = 20,
+            alpha: float = 1.0,
+            beta: float = 2.0,
+            rho: float = 0.1,
+            seed: int | None = None,
+
+            log_csv: str | None = None,
+            print_every_improvement: bool = True) -> list[Route]:
+        """
+        Run the ant colony.
+
+        Post: returns the best solution found.
+
+        Args (the first ones as in Hillclimber.run, so ACO can replace
+        Hillclimber in autorun_hillclimber):
+        - iterations: number of ants in total (solutions built, like the
+          one new solution per Hillclimber iteration), so
+          iterations / n_ants colonies.
+        - simulated_annealing, improve_routes: not used (routes are
+          always cut to their best part).
+        - cap: stop after this many ants without a new best solution.
+        - original_connections_only: if True, a route never uses the
+          same connection twice.
+        - gap_threshold, upper_bound: stop once the gap between the best
+          score and the upper bound is at most gap_threshold.
+        - n_ants: ants per colony.
+        - alpha, beta: weight of the pheromone and the heuristic.
+        - rho: evaporation per colony.
+        - seed: random seed (every chunk of ants of every colony gets
+          its own generator from it, so a run with the same seed and
+          n_workers gives the same result).
+        - log_csv: if not None, append the best score after every ant to
+          this csv file (one column per run, like log.csv).
+        - print_every_improvement: if True, print every new best score.
+        """
+        if upper_bound is None and gap_threshold is not None:
+            upper_bound = map_upper_bound(self.maprange)
+        self.upper_bound = upper_bound
+        seed = seed if seed is not None else random.randrange(2**31)
+
+        settings = {"route_time_limit": self.route_time_limit, "max_routes": self.max_routes,
+                    "alpha": alpha, "beta": beta,
+                    "original_connections_only": original_connections_only}
+        builder = Ant_Builder(self.load, **settings)
+        pool = None
+        if self.n_workers > 1:
+            pool = ProcessPoolExecutor(self.n_workers, initializer=_init_worker,
+                                       initargs=(self.maprange, settings))
+
+        # Start solution: the given routes, if any
+        self.best = self.to_individual(self.routes)
+        self.best_score = (fitness(self.best, self.edges, self.n_connections)
+                           if self.best else float("-inf"))
+        self.scores = []
+        print(f"start score: {self.best_score}")
+
+        # Pheromone limits: a deposit is at most 1 (score / 10000) per
+        # colony, so pheromone never gets above 1 / rho anyway
+        tau_max = 1 / rho
+        tau_min = tau_max / (2 * self.n_connections)
+        pheromone = np.full(self.n_connections, tau_max)
+        count_no_change = 0
+
+        try:
+            for colony in range(max(1, iterations // n_ants)):
+                # Build the ants of this colony, in chunks over the pool
+                chunks = np.array_split(np.arange(n_ants), self.n_workers if pool else 1)
+                tasks = [(pheromone.tolist(), len(chunk), f"{seed}-{colony}-{j}")
+                         for j, chunk in enumerate(chunks) if len(chunk) > 0]
+                if pool is None:
+                    ants = [ant for task in tasks for ant in self.build_chunk(builder, task)]
+                else:
+                    ants = [ant for chunk in pool.map(_worker_build, tasks) for ant in chunk]
+                scores = [fitness(ant, self.edges, self.n_connections) for ant in ants]
+
+                # Best score after every ant
+                for ant, score in zip(ants, scores):
+                    if score > self.best_score:
+                        self.best, self.best_score = ant, score
+                        count_no_change = 0
+                        if print_every_improvement:
+                            print(f"kolonie {colony}, score {self.best_score}")
+                    else:
+                        count_no_change += 1
+                    self.scores.append(self.best_score)
+
+                # Evaporate, then the colony best and the best so far
+                # deposit pheromone on their connections
+                best_ant = max(range(len(ants)), key=lambda i: scores[i])
+                pheromone *= 1 - rho
+                for individual, score in ((ants[best_ant], scores[best_ant]),
+                                          (self.best, self.best_score)):
+                    edges = self.edge_indices(individual)
+                    if len(edges) > 0 and score > 0:
+                        ridden = np.bincount(edges, minlength=self.n_connections) > 0
+                        pheromone += ridden * score / 10000
+                np.clip(pheromone, tau_min, tau_max, out=pheromone)
+
+                if count_no_change >= cap:
+                    print("Too long no change")
+                    break
+                if (gap_threshold is not None and
+                    optimality_gap(self.best_score, upper_bound) <= gap_threshold + 1e-9):
+                    print(f"Gap to upper bound {upper_bound} below threshold")
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.pheromone = pheromone
+        self.routes = [route_from_path([self.load.station_list[i] for i in route])
+                       for route in self.best]
+
+        if log_csv is not None:
+            append_scores_to_csv(self.scores, log_csv, custom_file_path=True)
+
+        print(f"End score: {self.best_score}")
+        if self.upper_bound is not None:
+            self.gap = optimality_gap(self.best_score, self.upper_bound)
+            print(f"Upper bound: {self.upper_bound}, gap: {self.gap:.2%}")
+        return self.routes
+
+    def build_chunk(self, builder: Ant_Builder,
+                    task: tuple[list[float], int, str]) -> list[Individual]:
+        """
+        Build a chunk of ants in this process (same as _worker_build).
+        """
+        pheromone, n_ants, seed = task
+        rng = random.Random(seed)
+        return [builder.build(pheromone, rng) for _ in range(n_ants)]
+
+    def edge_indices(self, individual: Individual) -> np.ndarray:
+        """
+        Connection indices of all connections of a solution.
+        """
+        return np.array([self.edges[(i, j)][0] for route in individual
+                         for i, j in zip(route, route[1:])], dtype=np.int64)
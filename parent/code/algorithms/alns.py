@@ -0,0 +1,336 @@
+# External imports:
+import math
+import random
+
+# Internal imports:
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.route import Route
+from parent.code.helpers.bounds import optimality_gap, upper_bound as map_upper_bound
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+from parent.code.helpers.score import calculate_score
+
+
+class ALNS(Hillclimber):
+    """Adaptive large neighbourhood search to optimize train routes.
+
+    Every iteration, a destroy operator removes some routes and a repair
+    operator builds new routes for the connections that became unused.
+    Operators are picked with a roulette wheel; their weights adapt to
+    how often they lead to new best, improved or accepted solutions.
+
+    Destroy operators:
+    - "random": remove k random routes.
+    - "worst": remove the k routes that contribute least to the score.
+    - "cluster": remove the k routes closest to a random station
+      (straight-line distance over latitude / longitude).
+
+    Repair operators (routes are built with Random_Greedy, starting at
+    stations or connections that are not used yet):
+    - "greedy": every next connection is the one that gains most.
+    - "beam": beam search lookahead (see Random_Greedy.beam_search).
+    - "random_walk": random connections until the time limit.
+
+    Same constructor and run arguments as Hillclimber, so it can replace
+    Hillclimber in autorun_hillclimber.
+    """
+
+    destroy_operators = ("random", "worst", "cluster")
+    repair_operators = ("greedy", "beam", "random_walk")
+
+    # Reward for an operator if the new solution is a new best, better
+    # than the current one, or accepted although not better
+    rewards = {"best": 33, "better": 9, "accepted": 13, "rejected": 0}
+
+    def __init__(self, start_position: list[Route],
+                 maprange: str = "Holland") -> None:
+        super().__init__(start_position, maprange)
+
+        # Builds new routes on top of a partial solution
+        self.route_builder = Random_Greedy(self.maprange)
+
+        self.value_per_connection = 10000 / len(self.load.connection_list)
+
+    def run(self, iterations: int,
+            simulated_annealing: bool = False,
+            cap=10**99,
+            improve_routes: bool = True,
+            original_connections_only: bool = False,
+            gap_threshold: float | None = None,
+            upper_bound: float | None = None,
+            max_destroy: int = 3,
+            segment_length: int = 100,
+            reaction_factor: float = 0.2,
+            beam_width: int = 3,
+            beam_depth: int = 3,
+
+            log_csv: str | None = None,
+            print_every_improvement: bool = True) -> list[Route]:
+        """
+        Run ALNS for a specified number of iterations.
+
+        Post: returns the best solution found.
+
+        Args:
+
+        Algorithm settings (same as Hillclimber.run):
+        - iterations, simulated_annealing, cap, improve_routes,
+          original_connections_only, gap_threshold, upper_bound.
+          Without simulated annealing, equal scores are accepted too (so
+          the search can move over plateaus).
+
+        ALNS settings:
+        - max_destroy: max number of routes removed per iteration (the
+          number is random between 1 and max_destroy).
+        - segment_length: number of iterations after which operator
+          weights are updated.
+        - reaction_factor: how fast weights follow the rewards (0: never
+          change, 1: only the last segment counts).
+        - beam_width, beam_depth: settings of the "beam" repair operator.
+
+        Data collection settings (same as Hillclimber.run):
+        - log_csv, print_every_improvement.
+        """
+        self.iterations = iterations
+        self.simulated_annealing = simulated_annealing
+        self.cap = cap
+        self.original_connections_only = original_connections_only
+        self.route_builder.beam_width = beam_width
+        self.route_builder.beam_depth = beam_depth
+
+        self.start_score = self.best_score
+        print(f"start score: {self.start_score}")
+
+        # Upper bound for the optimality gap
+        if upper_bound is None and gap_threshold is not None:
+            upper_bound = map_upper_bound(self.maprange)
+        self.upper_bound = upper_bound
+
+        if improve_routes:
+            self.routes = self.improve_routes(self.copy_routes(self.routes))
+            print(f"improved start score: {calculate_score(self.routes, self.maprange)}")
+
+        current_routes = self.routes
+        current_score = calculate_score(current_routes, self.maprange)
+        self.best_score = current_score
+
+        # Operator weights, and rewards / uses in the current segment
+        self.weights = {operator: 1.0 for operator in
+                        self.destroy_operators + self.repair_operators}
+        segment_rewards = {operator: 0.0 for operator in self.weights}
+        segment_uses = {operator: 0 for operator in self.weights}
+
+        count_no_change = 0
+        for i in range(self.iterations):
+            # If the gap to the upper bound is small enough, stop
+            if (gap_threshold is not None and
+                optimality_gap(self.best_score, upper_bound) <= gap_threshold + 1e-9):
+                print(f"Gap to upper bound {upper_bound} below threshold")
+                break
+
+            destroy = self.choose_operator(self.destroy_operators)
+            repair = self.choose_operator(self.repair_operators)
+
+            # Destroy and repair the current solution
+            k = random.randint(1, min(max_destroy, len(current_routes)))
+            kept_routes = getattr(self, f"destroy_{destroy}")(current_routes, k)
+            new_routes = self.repair(kept_routes, k, repair)
+
+            if improve_routes:
+                new_routes = self.improve_routes(self.copy_routes(new_routes))
+
+            new_score = calculate_score(new_routes, self.maprange)
+
+            # Accept or reject, and reward the operators
+            if new_score > self.best_score:
+                outcome = "best"
+            elif new_score > current_score:
+                outcome = "better"
+            elif self.accept(new_score, current_score):
+                outcome = "accepted"
+            else:
+                outcome = "rejected"
+
+            for operator in (destroy, repair):
+                segment_rewards[operator] += self.rewards[outcome]
+                segment_uses[operator] += 1
+
+            if outcome != "rejected":
+                if new_score != current_score:
+                    count_no_change = 0
+                current_routes, current_score = new_routes, new_score
+            else:
+                count_no_change += 1
+
+            if outcome == "best":
+                self.routes, self.best_score = new_routes, new_score
+                if print_every_improvement:
+                    print(f"iteratie {i}, score {new_score}")
+
+            self.scores.append(current_score)
+
+            # Update the weights at the end of every segment
+            if (i + 1) % segment_length == 0:
+                self.update_weights(segment_rewards, segment_uses, reaction_factor)
+
+            # If there has been no change for too many iterations, stop
+            if self.cap < self.iterations and count_no_change == self.cap:
+                print("Too long no change")
+                break
+
+        # When done:
+        # If set, log score per iteration to csv file
+        if log_csv is not None:
+            append_scores_to_csv(self.scores, log_csv, custom_file_path=True)
+
+        # Print summary
+        print(f"Start score: {self.start_score}, End score: {self.best_score}")
+        if self.upper_bound is not None:
+            self.gap = optimality_gap(self.best_score, self.upper_bound)
+            print(f"Upper bound: {self.upper_bound}, gap: {self.gap:.2%}")
+
+        return self.routes
+
+    def copy_routes(self, routes: list[Route]) -> list[Route]:
+        """
+        Copy routes, so they can be changed without changing the
+        originals (stations themselves are shared, not copied).
+        """
+        copies = []
+        for route in routes:
+            copy_of_route = Route()
+            copy_of_route.connections_used = list(route.connections_used)
+            copy_of_route.stations = list(route.stations)
+            copy_of_route.time = route.time
+            copies.append(copy_of_route)
+
+        return copies
+
+    def choose_operator(self, operators: tuple[str, ...]) -> str:
+        """
+        Roulette wheel selection: pick an operator with a chance
+        proportional to its weight.
+        """
+        return random.choices(operators,
+                              weights=[self.weights[operator] for operator in operators])[0]
+
+    def update_weights(self, segment_rewards: dict[str, float],
+                       segment_uses: dict[str, int],
+                       reaction_factor: float) -> None:
+        """
+        Move the weight of every operator that was used in the last
+        segment towards its average reward, and start a new segment.
+        """
+        for operator in self.weights:
+            if segment_uses[operator] > 0:
+                average_reward = segment_rewards[operator] / segment_uses[operator]
+                self.weights[operator] = max(
+                    0.1, (1 - reaction_factor) * self.weights[operator]
+                    + reaction_factor * average_reward)
+
+            segment_rewards[operator] = 0.0
+            segment_uses[operator] = 0
+
+    def accept(self, new_score: float, current_score: float) -> bool:
+        """
+        Decide whether a solution that is not better than the current one
+        is accepted: with the simulated annealing rule of Hillclimber, or
+        else only if the score is equal.
+        """
+        if self.simulated_annealing:
+            temperature = current_score / 10000
+            return random.random() < 2 ** (temperature * (new_score - current_score))
+
+        return new_score == current_score
+
+    def route_contributions(self, routes: list[Route]) -> list[float]:
+        """
+        Score contribution of every route: connections only this route
+        covers, minus its minutes and the cost of a route.
+        """
+        counts: dict[tuple[str, str], int] = {}
+        route_keys = []
+        for route in routes:
+            keys = {tuple(sorted(connection[:2])) for connection in route.connections_used}
+            route_keys.append(keys)
+            for key in keys:
+                counts[key] = counts.get(key, 0) + 1
+
+        return [sum(1 for key in keys if counts[key] == 1) * self.value_per_connection
+                - 100 - route.time
+                for route, keys in zip(routes, route_keys)]
+
+    def destroy_random(self, routes: list[Route], k: int) -> list[Route]:
+        """
+        Remove `k` random routes.
+        """
+        removed = set(random.sample(range(len(routes)), k))
+        return [route for i, route in enumerate(routes) if i not in removed]
+
+    def destroy_worst(self, routes: list[Route], k: int) -> list[Route]:
+        """
+        Remove the `k` routes with the lowest contribution to the score.
+        """
+        contributions = self.route_contributions(routes)
+        order = sorted(range(len(routes)), key=lambda i: contributions[i])
+        removed = set(order[:k])
+        return [route for i, route in enumerate(routes) if i not in removed]
+
+    def destroy_cluster(self, routes: list[Route], k: int) -> list[Route]:
+        """
+        Remove the `k` routes that come closest to a random station, so
+        a whole region of the map gets rebuilt.
+        """
+        center_lat, center_long = self.load.get_random_station().location()
+
+        def distance(route: Route) -> float:
+            if not route.stations:
+                return math.inf
+            return min((station.lat - center_lat) ** 2 + (station.long - center_long) ** 2
+                       for station in route.stations)
+
+        order = sorted(range(len(routes)), key=lambda i: distance(routes[i]))
+        removed = set(order[:k])
+        return [route for i, route in enumerate(routes) if i not in removed]
+
+    def repair(self, routes: list[Route], k: int, operator: str) -> list[Route]:
+        """
+        Add new routes to a partial solution. "random_walk" adds `k`
+        routes; "greedy" and "beam" add routes (at most one more than
+        were removed, within the max number of routes) as long as they
+        gain score.
+        """
+        builder = self.route_builder
+        builder.mark_routes_as_used(routes)
+        new_routes = list(routes)
+
+        if operator == "random_walk":
+            n_new, choice = k, "random"
+        else:
+            n_new = min(k + 1, self.max_routes - len(routes))
+            choice = "beam"
+
+            # Greedy is a beam of one, one connection deep
+            if operator == "greedy":
+                builder.beam_width, builder.beam_depth, settings = (
+                    1, 1, (builder.beam_width, builder.beam_depth))
+
+        for _ in range(n_new):
+            if len(builder.unused_connections) == 0:
+                break
+
+            start = builder.set_starting_station("original_stations_only_hard", None)
+            route = builder.create_a_route(start, self.route_time_limit, choice,
+                                           self.original_connections_only, False)
+
+            # Greedy and beam end routes that gain nothing
+            if not route.connections_used:
+                if choice == "beam":
+                    break
+                continue
+            new_routes.append(route)
+
+        if operator == "greedy":
+            builder.beam_width, builder.beam_depth = settings
+
+        return new_routes
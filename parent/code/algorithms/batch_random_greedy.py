@@ -0,0 +1,246 @@
+# Library imports
+import numpy as np
+
+# Local imports
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+
+
+class Batch_Random_Greedy(Algorithm):
+    """
+    Vectorised version of Random_Greedy for the configuration
+    `starting_stations="fully_random"` + `next_connection_choice="random"`.
+    In that configuration every route is a random walk with a time limit,
+    so thousands of solutions can be generated at once: all walkers take
+    one step per array operation, in lockstep.
+
+    Produces the same distribution of solutions as Random_Greedy with
+    these settings (but not the same random stream).
+
+    - Pre: Class is initialized for either "Holland" or "Nationaal".
+    - Post: Batch_Random_Greedy object is created and ready to run.
+    """
+
+    # Random_Greedy keyword arguments this class knows how to handle
+    supported_kwargs = {"next_connection_choice", "starting_stations",
+                        "final_number_of_routes", "route_time_limit",
+                        "chance_of_early_route_end"}
+
+    def __init__(self, maprange: str = "Holland") -> None:
+        # Load RailNL data with given maprange
+        self.load = RailNL(maprange)
+        super().__init__(self.load)
+
+        self.n_stations: int = len(self.load.station_list)
+        self.n_connections: int = len(self.load.connection_list)
+
+        # Turn CSR adjacency into padded arrays (stations x max degree),
+        # so the neighbours of all walkers can be looked up at once.
+        # Padding gets an infinite duration, so it never fits.
+        indptr, indices, durations, edge_ids = self.load.get_csr()
+        degree = np.diff(indptr)
+        max_degree = int(degree.max())
+
+        self.neighbours = np.zeros((self.n_stations, max_degree), dtype=np.int32)
+        self.durations = np.full((self.n_stations, max_degree), np.iinfo(np.int32).max,
+                                 dtype=np.int64)
+        self.edge_ids = np.zeros((self.n_stations, max_degree), dtype=np.int32)
+
+        for i in range(self.n_stations):
+            start, end = indptr[i], indptr[i + 1]
+            self.neighbours[i, :degree[i]] = indices[start:end]
+            self.durations[i, :degree[i]] = durations[start:end]
+            self.edge_ids[i, :degree[i]] = edge_ids[start:end]
+
+    @classmethod
+    def supports(cls, **random_greedy_kwargs) -> bool:
+        """
+        Check whether a set of Random_Greedy keyword arguments can be
+        handled by this class (so it can be used instead of
+        Random_Greedy, e.g. by Experiment).
+        """
+        if not set(random_greedy_kwargs) <= cls.supported_kwargs:
+            return False
+
+        return (random_greedy_kwargs.get("next_connection_choice", "random") == "random"
+                and random_greedy_kwargs.get("starting_stations", "fully_random") == "fully_random"
+                and not random_greedy_kwargs.get("chance_of_early_route_end", False))
+
+    def run(self, n_solutions: int,
+            final_number_of_routes: int | tuple[int] | None = None,
+            route_time_limit: int | tuple[int] | list[int] | None = None,
+            batch_size: int = 10000,
+            **random_greedy_kwargs) -> "np.ndarray[float]":
+        """
+        Generate `n_solutions` solutions and score them in bulk.
+
+        - Pre: arguments are set like for Random_Greedy.run (other
+          Random_Greedy arguments are accepted if `supports` allows them).
+        - Post: returns a numpy array with the score of every solution.
+          The solutions themselves can be retrieved as lists of routes
+          with `get_solution`.
+
+        Args:
+        - n_solutions: number of solutions to generate.
+        - final_number_of_routes, route_time_limit: see Random_Greedy.run.
+        - batch_size: max number of solutions generated in lockstep (to
+          limit memory use; large experiments are split into batches).
+        """
+        assert self.supports(**random_greedy_kwargs), """
+        Batch_Random_Greedy only supports starting_stations='fully_random'
+        and next_connection_choice='random'."""
+
+        scores = np.full(n_solutions, np.nan)
+
+        # Walks of each batch are saved, to turn them into routes later
+        self.batches: list[tuple[int, list]] = []
+
+        for start in range(0, n_solutions, batch_size):
+            size = min(batch_size, n_solutions - start)
+            scores[start:start + size], walks = self.generate_batch(
+                size, final_number_of_routes, route_time_limit)
+            self.batches.append((start, walks))
+
+        return scores
+
+    def set_number_of_routes(self, n: int,
+                             final_number_of_routes: int | tuple[int] | None
+                             ) -> "np.ndarray[int]":
+        """
+        Set the number of routes for each of `n` solutions (same rules
+        and defaults as Random_Greedy).
+        """
+        if final_number_of_routes is None:
+            final_number_of_routes = 7 if self.load.mapname == "Holland" else 20
+
+        if type(final_number_of_routes) is tuple:
+            return np.random.choice(final_number_of_routes, size=n)
+
+        return np.full(n, final_number_of_routes)
+
+    def set_time_limits(self, n: int, max_routes: int,
+                        route_time_limit: int | tuple[int] | list[int] | None
+                        ) -> "np.ndarray[int]":
+        """
+        Set the time limit of each route of each of `n` solutions (same
+        rules and defaults as Random_Greedy): returns an array of shape
+        (n, max_routes).
+        """
+        if route_time_limit is None:
+            route_time_limit = 120 if self.load.mapname == "Holland" else 180
+
+        # Tuple: one random time limit per solution
+        if type(route_time_limit) is tuple:
+            per_solution = np.random.choice(route_time_limit, size=n)
+            return np.repeat(per_solution[:, None], max_routes, axis=1)
+
+        # List: a random time limit for every route
+        if type(route_time_limit) is list:
+            return np.random.choice(route_time_limit, size=(n, max_routes))
+
+        return np.full((n, max_routes), route_time_limit)
+
+    def generate_batch(self, n: int,
+                       final_number_of_routes: int | tuple[int] | None,
+                       route_time_limit: int | tuple[int] | list[int] | None
+                       ) -> tuple["np.ndarray[float]", list]:
+        """
+        Generate `n` solutions in lockstep and return their scores,
+        together with the walks (per route: station per step of every
+        solution, -1 where a walker had already stopped).
+        """
+        number_of_routes = self.set_number_of_routes(n, final_number_of_routes)
+        max_routes = int(number_of_routes.max())
+        time_limits = self.set_time_limits(n, max_routes, route_time_limit)
+
+        # Coverage matrix (solution x connection), minutes and routes
+        covered = np.zeros((n, self.n_connections), dtype=bool)
+        minutes = np.zeros(n, dtype=np.int64)
+        routes_made = np.zeros(n, dtype=np.int64)
+        walks = []
+
+        # Routes are made one after the other (like Random_Greedy), but
+        # for all solutions at once
+        for route_number in range(max_routes):
+
+            # Only solutions that need more routes and still have unused
+            # connections get a new route
+            solutions = np.flatnonzero((route_number < number_of_routes)
+                                    & (covered.sum(axis=1) < self.n_connections))
+            if len(solutions) == 0:
+                break
+            routes_made[solutions] += 1
+
+            # Every walker starts at a random station
+            current = np.random.randint(0, self.n_stations, size=len(solutions))
+            time_left = time_limits[solutions, route_number].astype(np.int64)
+
+            walk = np.full((1, n), -1, dtype=np.int32)
+            walk[0, solutions] = current
+            steps = [walk[0]]
+
+            # Walk until no walker can make another step
+            while len(solutions) > 0:
+
+                # Neighbours are sorted on duration, so the connections
+                # that fit within the time left are a prefix of each row
+                fits = self.durations[current] <= time_left[:, None]
+                n_options = fits.sum(axis=1)
+
+                # Walkers without options end their route
+                alive = n_options > 0
+                solutions, current, time_left, n_options = (
+                    solutions[alive], current[alive],
+                    time_left[alive], n_options[alive])
+                if len(solutions) == 0:
+                    break
+
+                # Pick a random connection out of the ones that fit
+                choice = (np.random.random(len(solutions)) * n_options).astype(np.int64)
+                duration = self.durations[current, choice]
+
+                covered[solutions, self.edge_ids[current, choice]] = True
+                minutes[solutions] += duration
+                time_left -= duration
+                current = self.neighbours[current, choice]
+
+                step = np.full(n, -1, dtype=np.int32)
+                step[solutions] = current
+                steps.append(step)
+
+            walks.append(np.stack(steps))
+
+        # Score all solutions at once (same formula as calculate_score)
+        fraction = covered.sum(axis=1) / self.n_connections
+        scores = fraction * 10000 - (routes_made * 100 + minutes)
+
+        return scores, walks
+
+    def get_solution(self, index: int) -> list[Route]:
+        """
+        Return solution number `index` of the last run as a list of
+        Route objects.
+        """
+        # Find the batch this solution was generated in
+        for start, walks in reversed(self.batches):
+            if index >= start:
+                break
+        column = index - start
+
+        solution = []
+        for walk in walks:
+            stations = walk[:, column]
+
+            # Walker did not get this route (solution already finished)
+            if stations[0] == -1:
+                continue
+
+            route = Route()
+            stations = [self.load.station_list[i] for i in stations if i != -1]
+            for station1, station2 in zip(stations, stations[1:]):
+                route.add_connection(station1, station2,
+                                     station1.get_connection_time(station2))
+            solution.append(route)
+
+        return solution
@@ -0,0 +1,364 @@
+# Library imports
+import random
+from functools import lru_cache
+
+# Local imports
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.classes.railnl import RailNL, UNREACHABLE
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+from parent.code.helpers.score import calculate_score
+
+
+class Chinese_Postman(Algorithm):
+    """
+    Constructor for (near) optimal start states, based on the Chinese
+    postman problem: cover every connection with as few minutes as
+    possible.
+
+    Stations with an odd number of connections are paired up with a
+    minimum weight matching (shortest travel time), and the shortest
+    paths between pairs are added as extra "deadhead" connections. The
+    resulting network has an Eulerian circuit, which is cut into routes
+    that respect the time limit. Deadhead connections at the start or end
+    of a route are left out, so cuts are preferably made there.
+
+    The output is a list of routes, so it can be used directly as
+    `start_position` for Hillclimber.
+
+    - Pre: Class is initialized for either "Holland" or "Nationaal".
+    - Post: Chinese_Postman object is created and ready to run.
+    """
+
+    # Above this number of odd stations, the matching is made greedily
+    # (and improved with pair swaps) instead of exactly
+    max_odd_stations_exact_matching = 16
+
+    def __init__(self, maprange: str = "Holland") -> None:
+        # Load RailNL data with given maprange
+        self.load = RailNL(maprange)
+        super().__init__(self.load)
+
+        self.maprange = self.load.mapname
+
+        # Stations with an odd number of connections
+        self.odd_stations: list[Station] = [
+            station for station in self.load.station_list
+            if station.amount_connecting() % 2 == 1]
+
+        # Travel time of the shortest path between every two stations
+        # (see RailNL.get_shortest_paths)
+        self.distances: list[list[int]] = self.load.get_shortest_paths()[0].tolist()
+
+    def run(self,
+            route_time_limit: int | None = None,
+            max_routes: int | None = None,
+            n_tours: int = 20) -> list[Route]:
+        """
+        Construct a solution that covers all connections.
+
+        - Pre: Chinese_Postman object is initialized.
+        - Post: returns a list of routes (i.e. a solution), the best out
+          of `n_tours` random Eulerian circuits.
+
+        Args:
+        - route_time_limit: max minutes per route. Default is 120 for
+          Holland and 180 for Nationaal.
+        - max_routes: max number of routes. Default is 7 for Holland and
+          20 for Nationaal. If splitting needs more routes, the routes
+          that contribute least to the score are left out.
+        - n_tours: number of random Eulerian circuits to try. Each
+          circuit is cut into routes optimally, the best solution is
+          returned.
+        """
+        if route_time_limit is None:
+            route_time_limit = 120 if self.maprange == "Holland" else 180
+        if max_routes is None:
+            max_routes = 7 if self.maprange == "Holland" else 20
+
+        # Pair up the odd stations and add deadhead connections
+        matching = self.match_odd_stations()
+        edges = self.build_eulerian_edges(matching)
+
+        best_solution, best_score = [], float("-inf")
+        for _ in range(n_tours):
+
+            # Every connected part of the network has its own circuit
+            solution = []
+            for circuit in self.eulerian_circuits(edges):
+                solution += self.split_circuit(circuit, route_time_limit)
+
+            solution = self.limit_number_of_routes(solution, max_routes)
+            score = calculate_score(solution, self.maprange)
+
+            if score > best_score:
+                best_solution, best_score = solution, score
+
+        self.routes = best_solution
+        return best_solution
+
+    def distance(self, station1: Station, station2: Station) -> float:
+        """
+        Return the shortest travel time between two odd stations
+        (infinite if they are not connected at all).
+        """
+        index = self.load.station_index
+        distance = self.distances[index[station1.name]][index[station2.name]]
+        return float("inf") if distance == UNREACHABLE else distance
+
+    def match_odd_stations(self) -> list[tuple[Station, Station]]:
+        """
+        Pair up all odd stations with minimal total travel time between
+        the pairs. Exact (dynamic programming over subsets) for small
+        numbers of odd stations, else greedy followed by pair swaps.
+        """
+        stations = self.odd_stations
+
+        if len(stations) <= self.max_odd_stations_exact_matching:
+            return self.exact_matching(stations)
+
+        return self.greedy_matching(stations)
+
+    def exact_matching(self, stations: list[Station]) -> list[tuple[Station, Station]]:
+        """
+        Minimum weight perfect matching with dynamic programming over
+        subsets: the first unmatched station is paired with every other
+        unmatched station in turn.
+        """
+        n = len(stations)
+
+        @lru_cache(maxsize=None)
+        def best(unmatched: int) -> tuple[float, tuple]:
+            # All stations matched
+            if unmatched == 0:
+                return 0, ()
+
+            # First unmatched station
+            first = (unmatched & -unmatched).bit_length() - 1
+            rest = unmatched & ~(1 << first)
+
+            best_cost, best_pairs = float("inf"), ()
+            for other in range(first + 1, n):
+                if rest & (1 << other):
+                    cost, pairs = best(rest & ~(1 << other))
+                    cost += self.distance(stations[first], stations[other])
+
+                    if cost < best_cost:
+                        best_cost, best_pairs = cost, ((first, other),) + pairs
+
+            return best_cost, best_pairs
+
+        _, pairs = best((1 << n) - 1)
+        return [(stations[i], stations[j]) for i, j in pairs]
+
+    def greedy_matching(self, stations: list[Station]) -> list[tuple[Station, Station]]:
+        """
+        Match closest pairs first, then keep swapping partners between
+        two pairs as long as that lowers the total travel time.
+        """
+        # Greedy: closest pairs first
+        candidate_pairs = sorted(
+            ((self.distance(a, b), a, b) for i, a in enumerate(stations)
+             for b in stations[i + 1:]), key=lambda pair: pair[0])
+
+        matched = set()
+        pairs = []
+        for _, a, b in candidate_pairs:
+            if a not in matched and b not in matched:
+                pairs.append((a, b))
+                matched.update((a, b))
+
+        # Improve: swap partners of two pairs while it helps
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(pairs)):
+                for j in range(i + 1, len(pairs)):
+                    (a, b), (c, d) = pairs[i], pairs[j]
+                    current = self.distance(a, b) + self.distance(c, d)
+
+                    if self.distance(a, c) + self.distance(b, d) < current:
+                        pairs[i], pairs[j] = (a, c), (b, d)
+                        improved = True
+                    elif self.distance(a, d) + self.distance(b, c) < current:
+                        pairs[i], pairs[j] = (a, d), (b, c)
+                        improved = True
+
+        return pairs
+
+    def build_eulerian_edges(self, matching: list[tuple[Station, Station]]
+                             ) -> list[tuple[Station, Station, int, bool]]:
+        """
+        Return all edges of the Eulerian network: every connection once
+        (required), plus the connections on the shortest path between
+        every matched pair (deadhead).
+
+        Each edge is a tuple `(station1, station2, duration, required)`.
+        """
+        edges = [(station1, station2, station1.connections[station2], True)
+                 for station1, station2 in self.load.connection_list]
+
+        for station1, station2 in matching:
+            path = [self.load.station_list[i] for i in self.load.shortest_path(
+                self.load.station_index[station1.name], self.load.station_index[station2.name])]
+
+            for a, b in zip(path, path[1:]):
+                edges.append((a, b, a.connections[b], False))
+
+        return edges
+
+    def eulerian_circuits(self, edges: list[tuple[Station, Station, int, bool]]
+                          ) -> list[list[tuple[Station, Station, int, bool]]]:
+        """
+        Find a random Eulerian circuit in every connected part of the
+        network (Hierholzer's algorithm, with neighbours in random
+        order). Every edge of a circuit is oriented in travel direction.
+        """
+        # For every station, the ids of its edges (in random order)
+        adjacency: dict[Station, list[int]] = {
+            station: [] for station in self.load.station_list}
+        for edge_id, (station1, station2, _, _) in enumerate(edges):
+            adjacency[station1].append(edge_id)
+            adjacency[station2].append(edge_id)
+        for edge_ids in adjacency.values():
+            random.shuffle(edge_ids)
+
+        used = [False] * len(edges)
+        circuits = []
+
+        for start in self.load.station_list:
+            if not adjacency[start]:
+                continue
+
+            # Hierholzer: walk until stuck, then back up and add edges to
+            # the circuit (in reverse order)
+            stack: list[tuple[Station, int | None]] = [(start, None)]
+            circuit = []
+
+            while stack:
+                station, edge_id = stack[-1]
+
+                # Drop edges that were already walked from the other side
+                while adjacency[station] and used[adjacency[station][-1]]:
+                    adjacency[station].pop()
+
+                if adjacency[station]:
+                    next_edge_id = adjacency[station].pop()
+                    used[next_edge_id] = True
+                    station1, station2, _, _ = edges[next_edge_id]
+                    other = station2 if station1 is station else station1
+                    stack.append((other, next_edge_id))
+
+                else:
+                    stack.pop()
+                    if edge_id is not None:
+                        # Orient the edge: from previous station to this one
+                        previous_station = stack[-1][0]
+                        _, _, duration, required = edges[edge_id]
+                        circuit.append((previous_station, station, duration, required))
+
+            circuit.reverse()
+            if circuit:
+                circuits.append(circuit)
+
+        return circuits
+
+    def split_circuit(self, circuit: list[tuple[Station, Station, int, bool]],
+                      route_time_limit: int) -> list[Route]:
+        """
+        Cut a circuit into routes of at most `route_time_limit` minutes,
+        minimising 100 points per route plus the minutes of all routes.
+        Deadhead edges at the start or end of a route are left out.
+
+        Solved exactly with dynamic programming for every possible
+        starting point of the circuit.
+        """
+        best_cost, best_routes = float("inf"), []
+
+        for rotation in range(len(circuit)):
+            sequence = circuit[rotation:] + circuit[:rotation]
+            cost, segments = self.split_sequence(sequence, route_time_limit)
+
+            if cost < best_cost:
+                best_cost, best_routes = cost, [
+                    self.segment_to_route(sequence[start:end])
+                    for start, end in segments]
+
+        return best_routes
+
+    def split_sequence(self, sequence: list[tuple[Station, Station, int, bool]],
+                       route_time_limit: int) -> tuple[float, list[tuple[int, int]]]:
+        """
+        Optimally cut a sequence of edges into routes (dynamic
+        programming). Returns the cost and the (start, end) index of
+        every route, with deadheads at the ends already trimmed off.
+        """
+        n = len(sequence)
+
+        # Prefix sums of minutes
+        prefix = [0] * (n + 1)
+        for i, (_, _, duration, _) in enumerate(sequence):
+            prefix[i + 1] = prefix[i] + duration
+
+        # First required edge at or after i, last required edge before j
+        next_required = [n] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            next_required[i] = i if sequence[i][3] else next_required[i + 1]
+        previous_required = [-1] * (n + 1)
+        for j in range(1, n + 1):
+            previous_required[j] = j - 1 if sequence[j - 1][3] else previous_required[j - 1]
+
+        # cost[j]: min cost of the first j edges, choice[j]: where the
+        # last segment starts
+        cost = [0.0] + [float("inf")] * n
+        choice = [0] * (n + 1)
+
+        for j in range(1, n + 1):
+            for i in range(j - 1, -1, -1):
+
+                # Segment only has deadheads: skip for free
+                if next_required[i] >= j:
+                    segment_cost = 0
+                else:
+                    minutes = prefix[previous_required[j] + 1] - prefix[next_required[i]]
+
+                    # Segments only get longer from here on
+                    if minutes > route_time_limit:
+                        break
+                    segment_cost = 100 + minutes
+
+                if cost[i] + segment_cost < cost[j]:
+                    cost[j], choice[j] = cost[i] + segment_cost, i
+
+        # Walk back through the choices to find the segments
+        segments = []
+        j = n
+        while j > 0:
+            i = choice[j]
+            if next_required[i] < j:
+                segments.append((next_required[i], previous_required[j] + 1))
+            j = i
+        segments.reverse()
+
+        return cost[n], segments
+
+    def segment_to_route(self, segment: list[tuple[Station, Station, int, bool]]) -> Route:
+        """
+        Turn a list of oriented edges into a Route object.
+        """
+        route = Route()
+        for station1, station2, duration, _ in segment:
+            route.add_connection(station1, station2, duration)
+        return route
+
+    def limit_number_of_routes(self, solution: list[Route], max_routes: int) -> list[Route]:
+        """
+        While there are more than `max_routes` routes, leave out the route
+        whose removal costs the least score.
+        """
+        while len(solution) > max_routes:
+            solution = max(
+                (solution[:i] + solution[i + 1:] for i in range(len(solution))),
+                key=lambda routes: calculate_score(routes, self.maprange))
+
+        return solution
@@ -0,0 +1,307 @@
+# External imports:
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Internal imports:
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.island_model import Migrant, from_migrant, to_migrant
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.route_repair import Route_Repair
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+from parent.code.helpers.score import calculate_score
+
+
+def geographic_partition(load: RailNL, n_regions: int) -> list[list[str]]:
+    """
+    Split the stations into `n_regions` regions by recursive coordinate
+    bisection: the region with the most stations is split at the median
+    of its widest coordinate (latitude or longitude), until there are
+    enough regions.
+
+    - Post: returns the station names of every region.
+    """
+    regions = [list(load.station_list)]
+    while len(regions) < n_regions:
+        largest = max(range(len(regions)), key=lambda i: len(regions[i]))
+        stations = regions.pop(largest)
+        if len(stations) < 2:
+            regions.append(stations)
+            break
+
+        lats = [station.lat for station in stations]
+        longs = [station.long for station in stations]
+        if max(lats) - min(lats) >= max(longs) - min(longs):
+            stations.sort(key=lambda station: station.lat)
+        else:
+            stations.sort(key=lambda station: station.long)
+
+        half = len(stations) // 2
+        regions += [stations[:half], stations[half:]]
+
+    return [[station.name for station in region] for region in regions]
+
+
+def min_cut_partition(load: RailNL, n_regions: int) -> list[list[str]]:
+    """
+    Split the stations into `n_regions` regions with few connections in
+    between, by recursive spectral bisection: the region with the most
+    stations is split at the median of the Fiedler vector (eigenvector
+    of the second smallest eigenvalue of the graph Laplacian), which
+    approximates the smallest balanced cut.
+
+    - Post: returns the station names of every region.
+    """
+    index = load.station_index
+    regions = [[station.name for station in load.station_list]]
+
+    while len(regions) < n_regions:
+        largest = max(range(len(regions)), key=lambda i: len(regions[i]))
+        names = regions.pop(largest)
+        if len(names) < 2:
+            regions.append(names)
+            break
+
+        # Laplacian of the region
+        position = {name: i for i, name in enumerate(names)}
+        laplacian = np.zeros((len(names), len(names)))
+        for station1, station2 in load.connection_list:
+            if station1.name in position and station2.name in position:
+                i, j = position[station1.name], position[station2.name]
+                laplacian[i, j] = laplacian[j, i] = -1
+        np.fill_diagonal(laplacian, -laplacian.sum(axis=1))
+
+        _, vectors = np.linalg.eigh(laplacian)
+        order = np.argsort(vectors[:, 1], kind="stable")
+        half = len(names) // 2
+        regions += [[names[i] for i in sorted(order[:half], key=lambda i: index[names[i]])],
+                    [names[i] for i in sorted(order[half:], key=lambda i: index[names[i]])]]
+
+    return regions
+
+
+def _solve_region(task: tuple[str, list[str], int, int, int, dict]) -> tuple[Migrant, float]:
+    """
+    Solve one region in a worker process: a Hillclimber on the part of
+    the map with only the stations of the region, starting from
+    `number_of_routes` random routes.
+
+    - Post: returns the routes of the region (as station names) and the
+      seconds it took.
+    """
+    maprange, names, number_of_routes, iterations, seed, run_kwargs = task
+    start_time = time.perf_counter()
+    random.seed(seed)
+    np.random.seed(seed)
+
+    region = RailNL(maprange).subgraph(names)
+    if not region.connection_list:
+        return (), time.perf_counter() - start_time
+
+    hillclimber = Hillclimber([], maprange, load=region)
+    hillclimber.original_connections_only = run_kwargs.get("original_connections_only", False)
+    routes = [route for route in (hillclimber.generate_random_route()
+                                  for _ in range(number_of_routes))
+              if len(route.stations) > 1]
+
+    hillclimber = Hillclimber(routes, maprange, load=region)
+    routes = hillclimber.run(iterations, print_every_improvement=False, **run_kwargs)
+    return to_migrant(routes), time.perf_counter() - start_time
+
+
+class Decomposition:
+    """
+    Solves a map region by region, for networks too big for a single
+    Hillclimber:
+    1. the stations are split into regions, geographically or with few
+       connections in between (see geographic_partition and
+       min_cut_partition);
+    2. every region is solved in parallel (a process per region) by a
+       Hillclimber on the part of the map inside the region, with a
+       share of the routes proportional to its connections;
+    3. the routes of all regions are put together and the connections
+       between regions are covered: two routes that end on either side
+       of such a connection are joined over it (one route less), or a
+       route is extended over it; then best routes (see Route_Repair)
+       are added as long as they are worth the 100 points of a route;
+    4. optionally, a short Hillclimber run on the whole map polishes
+       the result.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 n_regions: int = 4,
+                 partition: str = "geographic",
+                 n_workers: int | None = None) -> None:
+        """
+        - partition: "geographic" or "min_cut".
+        - n_workers: number of processes. Default is the number of CPUs
+          (at most n_regions); with 1, all regions run in this process.
+        """
+        assert partition in ("geographic", "min_cut"), "Unknown partition."
+
+        self.maprange = maprange
+        self.load = RailNL(maprange)
+        self.n_regions = n_regions
+        self.partition = partition
+        self.n_workers = min(n_workers or os.cpu_count() or 1, n_regions)
+
+        self.route_time_limit = 120 if maprange == "Holland" else 180
+        self.max_routes = 7 if maprange == "Holland" else 20
+        self.value_per_connection = 10000 / len(self.load.connection_list)
+
+        self.routes: list[Route] = []
+        self.best_score: float = 0
+
+    def run(self, iterations: int = 10000,
+            number_of_routes: int | None = None,
+            seed: int = 0,
+            polish_iterations: int = 1000,
+            **run_kwargs) -> list[Route]:
+        """
+        Partition, solve every region, stitch and polish.
+
+        Post: returns the solution. The regions are in `self.regions`,
+        the score after every step in `self.step_scores` and the seconds
+        per region and in total in `self.region_seconds` and
+        `self.seconds`.
+
+        Args:
+        - iterations: Hillclimber iterations per region.
+        - number_of_routes: routes for the whole map, shared out over
+          the regions by their number of connections (at least 1 per
+          region with connections). Default 4 (Holland) or 12
+          (Nationaal).
+        - seed: random seed; region i uses seed + i.
+        - polish_iterations: iterations of the Hillclimber on the whole
+          map after stitching (0: no polish).
+        - run_kwargs: passed on to Hillclimber.run, for the regions and
+          the polish (e.g. `simulated_annealing=True`).
+        """
+        start_time = time.perf_counter()
+        if number_of_routes is None:
+            number_of_routes = 4 if self.maprange == "Holland" else 12
+
+        if self.partition == "geographic":
+            self.regions = geographic_partition(self.load, self.n_regions)
+        else:
+            self.regions = min_cut_partition(self.load, self.n_regions)
+
+        # Share of the routes per region, by its number of connections
+        region_of = {name: region for region, names in enumerate(self.regions) for name in names}
+        internal = [0] * len(self.regions)
+        for station1, station2 in self.load.connection_list:
+            if region_of[station1.name] == region_of[station2.name]:
+                internal[region_of[station1.name]] += 1
+        budgets = [max(1, round(number_of_routes * n / len(self.load.connection_list)))
+                   for n in internal]
+
+        tasks = [(self.maprange, names, budget, iterations, seed + region, run_kwargs)
+                 for region, (names, budget) in enumerate(zip(self.regions, budgets))]
+        if self.n_workers > 1:
+            with ProcessPoolExecutor(self.n_workers) as pool:
+                outcomes = list(pool.map(_solve_region, tasks))
+        else:
+            outcomes = [_solve_region(task) for task in tasks]
+
+        self.region_seconds = [seconds for _, seconds in outcomes]
+        routes = [route for migrant, _ in outcomes for route in from_migrant(migrant, self.load)]
+        self.step_scores = {"regions": calculate_score(routes, self.maprange)}
+
+        # Cover the connections between regions
+        paths = self.stitch([route.stations for route in routes])
+        self.step_scores["stitched"] = calculate_score(
+            [route_from_path(path) for path in paths], self.maprange)
+        paths = self.repair(paths)
+        routes = [route_from_path(path) for path in paths]
+        self.step_scores["repaired"] = calculate_score(routes, self.maprange)
+
+        if polish_iterations > 0:
+            random.seed(seed + len(self.regions))
+            routes = Hillclimber(routes, self.maprange).run(
+                polish_iterations, print_every_improvement=False, **run_kwargs)
+            self.step_scores["polished"] = calculate_score(routes, self.maprange)
+
+        self.routes = routes
+        self.best_score = calculate_score(routes, self.maprange)
+        self.seconds = time.perf_counter() - start_time
+
+        print(f"Scores per step: {self.step_scores}",
+              f"({self.seconds:.1f} s, slowest region {max(self.region_seconds):.1f} s)")
+        return self.routes
+
+    def stitch(self, paths: list[list[Station]]) -> list[list[Station]]:
+        """
+        Cover uncovered connections by joining two routes over them (the
+        end of one route at one station, the start of another at the
+        other), or by extending a route over them, as long as the route
+        stays within the time limit. The move that adds the most is done
+        first, until no move adds anything.
+        """
+        paths = [list(path) for path in paths]
+
+        while True:
+            covered = {tuple(sorted((station1.name, station2.name)))
+                       for path in paths for station1, station2 in zip(path, path[1:])}
+            minutes = [sum(station1.connections[station2]
+                           for station1, station2 in zip(path, path[1:])) for path in paths]
+
+            best_gain, best_paths = 0.0, None
+            for station1, station2 in self.load.connection_list:
+                if (station1.name, station2.name) in covered:
+                    continue
+                duration = station1.connections[station2]
+
+                for u, v in ((station1, station2), (station2, station1)):
+                    # Routes that end at u (turned around if they start there)
+                    # and routes that start at v
+                    ends = [(a, path if path[-1].name == u.name else path[::-1])
+                            for a, path in enumerate(paths)
+                            if u.name in (path[0].name, path[-1].name)]
+                    starts = [(b, path if path[0].name == v.name else path[::-1])
+                              for b, path in enumerate(paths)
+                              if v.name in (path[0].name, path[-1].name)]
+
+                    for a, path_a in ends:
+                        # Extend route a over the connection
+                        gain = self.value_per_connection - duration
+                        if minutes[a] + duration <= self.route_time_limit and gain > best_gain:
+                            best_gain = gain
+                            best_paths = [path for i, path in enumerate(paths) if i != a]
+                            best_paths.append(path_a + [v])
+
+                        # Join route a and route b over the connection
+                        for b, path_b in starts:
+                            gain = self.value_per_connection - duration + 100
+                            if (a != b and gain > best_gain and minutes[a] + duration + minutes[b]
+                                    <= self.route_time_limit):
+                                best_gain = gain
+                                best_paths = [path for i, path in enumerate(paths)
+                                              if i not in (a, b)]
+                                best_paths.append(path_a + path_b)
+
+            if best_paths is None:
+                return paths
+            paths = best_paths
+
+    def repair(self, paths: list[list[Station]]) -> list[list[Station]]:
+        """
+        Add the best route given the other routes (see Route_Repair), as
+        long as it is worth the 100 points of a route and there is room.
+        """
+        route_repair = Route_Repair(self.load, self.route_time_limit)
+        paths = [list(path) for path in paths]
+
+        while len(paths) < self.max_routes:
+            covered = {self.load.connection_index[tuple(sorted((station1.name, station2.name)))]
+                       for path in paths for station1, station2 in zip(path, path[1:])}
+            path, value = route_repair.best_route(covered, minimum_value=100)
+            if not path:
+                break
+            paths.append(path)
+
+        return paths
@@ -0,0 +1,313 @@
+# Library imports
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Local imports
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.algorithms.route_catalogue import Route_Catalogue
+from parent.code.classes.route import Route
+from parent.code.helpers.score import calculate_score
+
+
+# Search node: (covered, excluded, forbidden, chosen, score, ends)
+# - covered, excluded, ends: bitmasks over connections
+# - forbidden: bitmask over catalogue routes (symmetry breaking)
+# - chosen: tuple of catalogue route indices, score: score of chosen
+Node = tuple[int, int, int, tuple[int, ...], float, int]
+
+# Solver of the worker process, and the incumbent shared by all workers
+_worker_solver: "Exact_Solver | None" = None
+_shared_best: "multiprocessing.sharedctypes.Synchronized | None" = None
+
+
+def _init_worker(maprange: str, route_time_limit: int, max_routes: int,
+                 shared_best) -> None:
+    """
+    Build the solver once per worker process (the catalogue of Holland
+    is built in a fraction of a second).
+    """
+    global _worker_solver, _shared_best
+    _worker_solver = Exact_Solver(maprange, route_time_limit, max_routes, n_workers=1)
+    _shared_best = shared_best
+
+
+def _solve_subtree(node: Node) -> dict:
+    """
+    Search one subtree in a worker process.
+    """
+    return _worker_solver.solve_subtree(node, _shared_best)
+
+
+class Exact_Solver(Algorithm):
+    """
+    Exact branch-and-bound solver for small maps (Holland), meant as an
+    oracle: it returns the optimal solution together with a certificate
+    that describes the search that proves it.
+
+    Builds on the complete Route_Catalogue (every route within the time
+    limit, repeated connections allowed). The search branches on the
+    open connection that is in the fewest routes: either one of those
+    routes covers it, or it is never covered.
+
+    - Route order symmetry: a solution is only found in one way. When
+      the routes covering a connection are tried in turn, every next
+      branch forbids the routes tried before it (solutions with those
+      routes were found in the earlier branches).
+    - Bounds: per node, the coverage bitsets give the connections that
+      can still be covered, and covering n of them costs at least the n
+      shortest durations plus the routes needed for those minutes.
+    - Parallel: the top of the tree is expanded breadth-first, and the
+      open subtrees are searched in a process pool, sharing the best
+      score found so far.
+
+    - Pre: Class is initialized for a map small enough for a complete
+      catalogue (Holland).
+    - Post: solver is ready to run.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 route_time_limit: int | None = None,
+                 max_routes: int | None = None,
+                 n_workers: int | None = None) -> None:
+        self.catalogue = Route_Catalogue(maprange, route_time_limit,
+                                         allow_repeated_connections=True,
+                                         maximal_only=False)
+        super().__init__(self.catalogue.load)
+
+        self.maprange = self.catalogue.maprange
+        self.route_time_limit = self.catalogue.route_time_limit
+        if max_routes is None:
+            max_routes = 7 if self.maprange == "Holland" else 20
+        self.max_routes = max_routes
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count() or 1
+
+        catalogue = self.catalogue
+        self.masks = catalogue.masks
+        self.minutes = [int(minutes) for minutes in catalogue.minutes]
+        self.value_per_connection = catalogue.value_per_connection
+        self.all_connections = (1 << catalogue.n_connections) - 1
+
+        # Routes containing every connection, best standalone gain first
+        standalone = [mask.bit_count() * self.value_per_connection - 100 - minutes
+                      for mask, minutes in zip(self.masks, self.minutes)]
+        self.connection_routes: list[list[int]] = [
+            sorted((route for route, mask in enumerate(self.masks) if mask >> connection & 1),
+                   key=lambda route: -standalone[route])
+            for connection in range(catalogue.n_connections)]
+
+        # First and last connection of every route
+        self.end_connections = [catalogue.end_connections(route)
+                                for route in range(len(self.masks))]
+
+        self.certificate: dict | None = None
+
+    def run(self, time_budget: float | None = None) -> list[Route]:
+        """
+        Find the optimal solution.
+
+        - Pre: solver is initialized.
+        - Post: returns the optimal solution as a list of routes (or the
+          best one found, if the time budget ran out). self.certificate
+          describes the search, see `make_certificate`.
+
+        Args:
+        - time_budget: max seconds for the search, None for no limit.
+        """
+        start_time = time.time()
+        deadline = None if time_budget is None else start_time + time_budget
+
+        # Heuristic solution as first incumbent
+        initial = self.catalogue.improve_with_swaps(
+            self.catalogue.greedy(self.max_routes), self.max_routes)
+        best_score, best_chosen = self.catalogue.objective(initial), tuple(initial)
+
+        # Expand the top of the tree until there is enough work to share
+        frontier, nodes, best_score, best_chosen = self.split(
+            (0, 0, 0, (), 0.0, 0), best_score, best_chosen, 4 * self.n_workers)
+        for node in frontier:
+            if node[4] > best_score:
+                best_score, best_chosen = node[4], node[3]
+
+        # Search the subtrees
+        if self.n_workers > 1 and len(frontier) > 1:
+            shared_best = multiprocessing.Value("d", best_score)
+            with ProcessPoolExecutor(
+                    self.n_workers, initializer=_init_worker,
+                    initargs=(self.maprange, self.route_time_limit,
+                              self.max_routes, shared_best)) as pool:
+                futures = [pool.submit(_solve_subtree, node + (deadline,))
+                           for node in frontier]
+                subtrees = [future.result() for future in futures]
+        else:
+            shared_best = multiprocessing.Value("d", best_score, lock=False)
+            subtrees = [self.solve_subtree(node + (deadline,), shared_best)
+                        for node in frontier]
+
+        for subtree in subtrees:
+            if subtree["best_score"] > best_score:
+                best_score, best_chosen = subtree["best_score"], subtree["best_chosen"]
+
+        self.routes = [self.catalogue.route_from_catalogue(route) for route in best_chosen]
+        self.certificate = self.make_certificate(
+            best_score, initial, nodes, subtrees, time.time() - start_time)
+
+        return self.routes
+
+    def upper_bound(self, node: Node) -> float:
+        """
+        Upper bound on the score of any solution in the subtree of
+        `node` (see Route_Catalogue.bound).
+        """
+        covered, excluded, _, chosen, score, _ = node
+        return self.catalogue.bound(covered, excluded, len(chosen), score, self.max_routes)
+
+    def children(self, node: Node) -> list[Node]:
+        """
+        Branch on the open connection that is in the fewest routes:
+        cover it with one of its routes, or exclude it for good.
+        """
+        covered, excluded, forbidden, chosen, score, ends = node
+
+        open_connections = self.all_connections & ~(covered | excluded)
+        if open_connections == 0 or len(chosen) == self.max_routes:
+            return []
+
+        connection = min((c for c in range(self.catalogue.n_connections)
+                          if open_connections >> c & 1),
+                         key=lambda c: len(self.connection_routes[c]))
+
+        children = []
+        for route in self.connection_routes[connection]:
+            mask = self.masks[route]
+            if forbidden >> route & 1 or mask & excluded:
+                continue
+
+            # Ends only covered by this route (else a shorter version of
+            # the route is better), and the route must gain score
+            if self.end_connections[route] & covered or mask & ends:
+                continue
+            gain = ((mask & ~covered).bit_count() * self.value_per_connection
+                    - 100 - self.minutes[route])
+            if gain <= 0:
+                continue
+
+            children.append((covered | mask, excluded, forbidden, chosen + (route,),
+                             score + gain, ends | self.end_connections[route]))
+
+            # Symmetry breaking: later branches do not use this route
+            forbidden |= 1 << route
+
+        children.append((covered, excluded | 1 << connection, forbidden,
+                         chosen, score, ends))
+        return children
+
+    def split(self, root: Node, best_score: float, best_chosen: tuple[int, ...],
+              n_subtrees: int) -> tuple[list[Node], int, float, tuple[int, ...]]:
+        """
+        Expand the tree breadth-first until there are at least
+        `n_subtrees` open nodes (or the whole tree is searched). Returns
+        the open nodes, the number of nodes expanded and the best score
+        and chosen routes seen so far (like solve_subtree, so nodes that
+        are pruned or have no children are not lost).
+        """
+        frontier = deque([root])
+        nodes = 0
+
+        while frontier and len(frontier) < n_subtrees:
+            node = frontier.popleft()
+            nodes += 1
+            if node[4] > best_score:
+                best_score, best_chosen = node[4], node[3]
+
+            if self.upper_bound(node) > best_score + 1e-9:
+                frontier.extend(self.children(node))
+
+        return list(frontier), nodes, best_score, best_chosen
+
+    def solve_subtree(self, node: tuple, shared_best) -> dict:
+        """
+        Depth-first search of the subtree below `node` (a Node plus a
+        deadline). `shared_best` holds the best score of all workers, so
+        subtrees are pruned with each other's solutions.
+
+        Returns the best solution of the subtree (if better than the
+        shared best at the time), the bound at its root, the number of
+        nodes and whether it was searched completely.
+        """
+        *node, deadline = node
+        result = {"root_bound": self.upper_bound(tuple(node)), "nodes": 0,
+                  "best_score": -math.inf, "best_chosen": (), "completed": True}
+
+        stack = [tuple(node)]
+        while stack:
+            if deadline is not None and time.time() > deadline:
+                result["completed"] = False
+                break
+
+            node = stack.pop()
+            result["nodes"] += 1
+            score = node[4]
+
+            if score > shared_best.value:
+                shared_best.value = score
+            if score > result["best_score"]:
+                result["best_score"], result["best_chosen"] = score, node[3]
+
+            if self.upper_bound(node) > shared_best.value + 1e-9:
+                # Reversed, so children are searched in branching order
+                stack.extend(reversed(self.children(node)))
+
+        return result
+
+    def make_certificate(self, best_score: float, initial: list[int], nodes: int,
+                         subtrees: list[dict], seconds: float) -> dict:
+        """
+        Describe the result and the search that proves it: the optimum
+        and its routes, the root bound, the heuristic starting score,
+        and per subtree the bound at its root, the nodes searched and
+        its best score. The optimum is proven when every subtree was
+        searched completely.
+        """
+        return {
+            "maprange": self.maprange,
+            "route_time_limit": self.route_time_limit,
+            "max_routes": self.max_routes,
+            "optimum": best_score,
+            "proven_optimal": all(subtree["completed"] for subtree in subtrees),
+            "routes": [[station.name for station in route.get_stations()]
+                       for route in self.routes],
+            "catalogue_size": len(self.catalogue),
+            "root_upper_bound": self.upper_bound((0, 0, 0, (), 0.0, 0)),
+            "initial_score": self.catalogue.objective(initial),
+            "nodes": nodes + sum(subtree["nodes"] for subtree in subtrees),
+            "subtrees": [{key: subtree[key] for key in ("root_bound", "nodes",
+                                                         "best_score", "completed")}
+                         for subtree in subtrees],
+            "seconds": seconds,
+        }
+
+    def verify(self) -> bool:
+        """
+        Check the solution against the certificate: the routes respect
+        the limits and calculate_score gives the claimed optimum.
+        """
+        assert self.certificate is not None, "Run the solver first."
+
+        return (len(self.routes) <= self.max_routes
+                and all(route.get_time() <= self.route_time_limit for route in self.routes)
+                and math.isclose(calculate_score(self.routes, self.maprange),
+                                 self.certificate["optimum"]))
+
+    def gap(self, routes: list[Route]) -> float:
+        """
+        Regression oracle: how far the score of a (heuristic) solution
+        is below the optimum. Negative means the solution beats the
+        'optimum', which points to a bug.
+        """
+        assert self.certificate is not None, "Run the solver first."
+
+        return self.certificate["optimum"] - calculate_score(routes, self.maprange)
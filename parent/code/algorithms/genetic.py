@@ -0,0 +1,298 @@
+# External imports:
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+# Internal imports:
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+
+
+# An individual: a tuple of routes, every route a tuple of station
+# indices (see RailNL.station_index). Small, so cheap to send to worker
+# processes.
+Individual = tuple[tuple[int, ...], ...]
+
+# Connections of the map of the worker process: (station index, station
+# index) in both directions -> (connection index, duration)
+_worker_edges: dict[tuple[int, int], tuple[int, int]] | None = None
+_worker_n_connections: int = 0
+
+
+def edges_of(load: RailNL) -> dict[tuple[int, int], tuple[int, int]]:
+    """
+    Connection index and duration of every pair of connected stations,
+    in both directions.
+    """
+    edges = {}
+    for index, (station1, station2) in enumerate(load.connection_list):
+        i, j = load.station_index[station1.name], load.station_index[station2.name]
+        duration = int(station1.connections[station2])
+        edges[(i, j)] = edges[(j, i)] = (index, duration)
+    return edges
+
+
+def fitness(individual: Individual,
+            edges: dict[tuple[int, int], tuple[int, int]],
+            n_connections: int) -> float:
+    """
+    Score of an individual (same formula as calculate_score).
+    """
+    covered = set()
+    minutes = 0
+    for route in individual:
+        for i, j in zip(route, route[1:]):
+            index, duration = edges[(i, j)]
+            covered.add(index)
+            minutes += duration
+
+    return len(covered) * 10000 / n_connections - 100 * len(individual) - minutes
+
+
+def _init_worker(maprange: str) -> None:
+    """
+    Load the map once per worker process.
+    """
+    global _worker_edges, _worker_n_connections
+    load = RailNL(maprange)
+    _worker_edges = edges_of(load)
+    _worker_n_connections = len(load.connection_list)
+
+
+def _worker_fitness(individual: Individual) -> float:
+    """
+    Fitness of an individual in a worker process.
+    """
+    return fitness(individual, _worker_edges, _worker_n_connections)
+
+
+class Genetic(Algorithm):
+    """Genetic algorithm to optimize train routes.
+
+    The population is seeded with Random_Greedy solutions. Every
+    generation:
+    - the best `elite_size` solutions go to the next generation as they
+      are (elitism);
+    - the others are children of two parents, picked by tournament
+      selection. A child gets every route of both parents with chance
+      1/2 (route-set crossover), after which duplicate coverage is
+      repaired: ends of routes that are ridden by other routes are
+      trimmed and routes that are left empty are removed;
+    - a child is mutated with the moves of the Hillclimber: a random
+      route is replaced by a new random route, a random route is added
+      or a random route is removed.
+
+    Fitness (the score) is evaluated per generation in one batch over a
+    process pool.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 n_workers: int = 1) -> None:
+        """
+        - n_workers: number of processes to evaluate fitness with. Default
+          1: everything runs in this process, since fitness is so cheap
+          that sending a generation to other processes costs more than
+          it saves.
+        """
+        self.maprange = maprange
+        super().__init__(RailNL(maprange))
+
+        self.route_time_limit = 120 if maprange == "Holland" else 180
+        self.max_routes = 7 if maprange == "Holland" else 20
+        self.n_workers = n_workers
+
+        self.edges = edges_of(self.load)
+        self.n_connections = len(self.load.connection_list)
+
+        # Its random routes are the mutations
+        self.hillclimber = Hillclimber([], maprange)
+        self.hillclimber.original_connections_only = False
+
+        self.best_score: float = 0
+        self.scores: list[float] = []
+
+    def run(self, generations: int = 100,
+            population_size: int = 100,
+            elite_size: int = 5,
+            tournament_size: int = 3,
+            mutation_rate: float = 0.5,
+            original_connections_only: bool = False,
+            population: list[Individual] | None = None,
+
+            log_csv: str | None = None,
+            print_every_improvement: bool = True) -> list[Route]:
+        """
+        Run the genetic algorithm for a number of generations.
+
+        Post: returns the best solution found.
+
+        Args:
+        - generations: number of generations.
+        - population_size: number of solutions per generation.
+        - elite_size: number of best solutions that survive unchanged.
+        - tournament_size: number of solutions per tournament; the best
+          one becomes a parent.
+        - mutation_rate: chance that a child is mutated.
+        - original_connections_only: if True, new random routes never
+          use the same connection twice (see Hillclimber.run).
+        - population: solutions to start with (e.g. `self.population` of
+          an earlier run, to continue it). Filled up with Random_Greedy
+          solutions.
+        - log_csv: if not None, append the best score per generation to
+          this csv file.
+        - print_every_improvement: if True, print every new best score.
+        """
+        self.hillclimber.original_connections_only = original_connections_only
+        self.scores = []
+
+        population = list(population or [])[:population_size]
+        population += [self.seed() for _ in range(population_size - len(population))]
+
+        pool = None
+        if self.n_workers > 1:
+            pool = ProcessPoolExecutor(self.n_workers, initializer=_init_worker,
+                                       initargs=(self.maprange,))
+
+        try:
+            scores = self.evaluate(population, pool)
+            best = max(range(population_size), key=lambda i: scores[i])
+            self.best, self.best_score = population[best], scores[best]
+            print(f"start score: {self.best_score}")
+
+            for generation in range(generations):
+                # Elitism: the best solutions survive
+                order = sorted(range(population_size), key=lambda i: -scores[i])
+                next_population = [population[i] for i in order[:elite_size]]
+
+                while len(next_population) < population_size:
+                    parent1 = self.tournament(population, scores, tournament_size)
+                    parent2 = self.tournament(population, scores, tournament_size)
+                    child = self.crossover(parent1, parent2)
+                    if random.random() < mutation_rate:
+                        child = self.mutate(child)
+                    next_population.append(self.repair(child))
+
+                population = next_population
+                scores = self.evaluate(population, pool)
+
+                best = max(range(population_size), key=lambda i: scores[i])
+                if scores[best] > self.best_score:
+                    self.best, self.best_score = population[best], scores[best]
+                    if print_every_improvement:
+                        print(f"generatie {generation}, score {self.best_score}")
+                self.scores.append(self.best_score)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Keep the last generation, so a next run can continue it
+        self.population, self.population_scores = population, scores
+
+        self.routes = [route_from_path([self.load.station_list[i] for i in route])
+                       for route in self.best]
+
+        if log_csv is not None:
+            append_scores_to_csv(self.scores, log_csv, custom_file_path=True)
+
+        print(f"End score: {self.best_score}")
+        return self.routes
+
+    def evaluate(self, population: list[Individual],
+                 pool: ProcessPoolExecutor | None) -> list[float]:
+        """
+        Fitness of the whole population, in one batch over the pool.
+        """
+        if pool is None:
+            return [fitness(individual, self.edges, self.n_connections)
+                    for individual in population]
+
+        chunksize = max(1, len(population) // (4 * self.n_workers))
+        return list(pool.map(_worker_fitness, population, chunksize=chunksize))
+
+    def to_individual(self, routes: list[Route]) -> Individual:
+        """
+        Turn routes into an individual.
+        """
+        return tuple(tuple(self.load.station_index[station.name] for station in route.stations)
+                     for route in routes if len(route.stations) > 1)
+
+    def seed(self) -> Individual:
+        """
+        A solution made by Random_Greedy, with a random number of routes.
+        """
+        routes = Random_Greedy(self.maprange).run(
+            starting_stations="original_stations_only_hard",
+            final_number_of_routes=random.randint(self.max_routes // 2, self.max_routes))
+        return self.repair(self.to_individual(routes))
+
+    def tournament(self, population: list[Individual], scores: list[float],
+                   tournament_size: int) -> Individual:
+        """
+        The best of `tournament_size` random solutions.
+        """
+        contestants = random.sample(range(len(population)), tournament_size)
+        return population[max(contestants, key=lambda i: scores[i])]
+
+    def crossover(self, parent1: Individual, parent2: Individual) -> Individual:
+        """
+        Every route of both parents goes to the child with chance 1/2 (at
+        most max_routes routes).
+        """
+        routes = [route for route in parent1 + parent2 if random.random() < 0.5]
+        random.shuffle(routes)
+        return tuple(routes[:self.max_routes])
+
+    def mutate(self, individual: Individual) -> Individual:
+        """
+        Replace, add or remove a random route (the moves of the
+        Hillclimber).
+        """
+        routes = list(individual)
+        move = random.choice(("replace", "add", "remove"))
+
+        if move != "add" and routes:
+            routes.pop(random.randrange(len(routes)))
+        if move != "remove" and len(routes) < self.max_routes:
+            routes.extend(self.to_individual([self.hillclimber.generate_random_route()]))
+
+        return tuple(routes)
+
+    def repair(self, individual: Individual) -> Individual:
+        """
+        Remove duplicate coverage: drop routes that are equal to another
+        route (in either direction), trim ends of routes that are ridden
+        by other routes as well, and drop routes that are left empty.
+        """
+        routes = []
+        seen = set()
+        for route in individual:
+            key = min(route, route[::-1])
+            if len(route) > 1 and key not in seen:
+                seen.add(key)
+                routes.append(route)
+
+        counts: dict[int, int] = {}
+        for route in routes:
+            for i, j in zip(route, route[1:]):
+                index = self.edges[(i, j)][0]
+                counts[index] = counts.get(index, 0) + 1
+
+        repaired = []
+        for route in routes:
+            for at_head in (True, False):
+                while len(route) > 1:
+                    end = (route[0], route[1]) if at_head else (route[-2], route[-1])
+                    index = self.edges[end][0]
+                    if counts[index] <= 1:
+                        break
+                    counts[index] -= 1
+                    route = route[1:] if at_head else route[:-1]
+
+            if len(route) > 1:
+                repaired.append(route)
+
+        return tuple(repaired)
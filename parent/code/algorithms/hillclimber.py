@@ -1,6 +1,7 @@
 # External imports:
 import random
 import copy
+from collections import Counter
 import matplotlib.pyplot as plt
 
 # Internal imports:
@@ -8,8 +9,15 @@ from parent.code.algorithms.algorithm import Algorithm
 from parent.code.helpers.score import calculate_score
 from parent.code.classes.railnl import RailNL
 from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
 from parent.code.helpers.csv_helpers import append_scores_to_csv
 from parent.code.helpers.tot_con_used import get_total_connections_used
+from parent.code.helpers.bounds import optimality_gap, upper_bound as map_upper_bound
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.hillclimber_moves import (Batch_Move, Local_Move, Move_Strategy,
+                                                      Replace_Move)
+from parent.code.classes.coverage import Coverage_Array, best_subpath, path_keys
+from parent.code.classes.elite_archive import Elite_Archive
 
 class Hillclimber(Algorithm):
     """Hillclimber algorithm to optimize train routes.
@@ -24,7 +32,8 @@ class Hillclimber(Algorithm):
         
     """
     def __init__(self, start_position: list[Route], 
-                 maprange: str = "Holland") -> None:
+                 maprange: str = "Holland",
+                 load: RailNL | None = None) -> None:
         """
         Initialize a HillClimber object.
 
@@ -40,9 +49,12 @@ class Hillclimber(Algorithm):
             start off with.
             - `maprange` `(str)`: The map to run the algorithm on 
             ("Holland" or "Nationaal")
+            - `load` `(RailNL)`: Network to make new routes on, e.g. a 
+            region of the map (see RailNL.subgraph). Default: the whole
+            map. Scores stay those of the whole map.
         """
         # Load RailNL data with given maprange
-        self.load = RailNL(maprange)
+        self.load = load if load is not None else RailNL(maprange)
         super().__init__(self.load)
         
         self.start_score = 0
@@ -50,10 +62,16 @@ class Hillclimber(Algorithm):
         self.scores = []
         self.maprange = self.load.mapname
         self.best_score = calculate_score(self.routes, self.maprange) 
+        self.route_time_limit = 120 if self.maprange == "Holland" else 180
+        self.max_routes = 7 if self.maprange == "Holland" else 20
+        self.move: Move_Strategy | None = None
 
-    def generate_random_route(self) -> Route:
+    def generate_random_route(self, first_connection: tuple[Station, Station] | None = None
+                              ) -> Route:
         """Generate a random route within the rail network.
 
+        Pre: first_connection, if given, is a pair of connected stations
+        of self.load; the route then starts by riding it.
         Post: Returns a Route object with a random set of connections.
         """
         if self.maprange == "Holland":
@@ -64,6 +82,11 @@ class Hillclimber(Algorithm):
         time_used = 0
         route = Route()
         current_station = self.load.get_random_station()
+        if first_connection is not None:
+            station1, station2 = first_connection
+            time_used = int(station1.connection_duration(station2))
+            route.add_connection(station1, station2, time_used)
+            current_station = station2
         while current_station.has_connections():
             if random.random() < 0.05:  # Stop early with 5% probability
                 break
@@ -117,6 +140,21 @@ class Hillclimber(Algorithm):
         new_routes.append(new_route)
         return new_routes
 
+    def targeted_connection(self, state: Coverage_Array,
+                            without: int | None = None) -> tuple[Station, Station] | None:
+        """Pick a connection for a new route to start with: with chance
+        1/2, a random uncovered connection (if the route at `without` 
+        were removed), in a random direction.
+
+        Post: Returns a pair of stations, or None (a random start).
+        """
+        uncovered = state.uncovered(without)
+        if len(uncovered) == 0 or random.random() < 0.5:
+            return None
+
+        station1, station2 = self.load.connection_list[random.choice(uncovered)]
+        return (station1, station2) if random.random() < 0.5 else (station2, station1)
+
     def remove_random_route(self, routes: list[Route]) -> list[Route]:
         """Remove a random route from the list of routes.
 
@@ -184,22 +222,65 @@ class Hillclimber(Algorithm):
 
         return updated_routes
 
+    def normalise_routes(self, routes: list[Route]) -> list[Route]:
+        """Replace every route by its best contiguous part given the other
+        routes (see coverage.best_subpath), one route after the other. 
+        Routes that are not worth the 100 points of a route are removed.
+
+        Post: Returns the normalised list of routes.
+        """
+        value_per_connection = 10000 / self.load.map_connections
+        counts = Counter(key for route in routes for key in path_keys(route.stations))
+        normalised = []
+
+        for route in routes:
+            path = route.stations
+            own = Counter(path_keys(path))
+            start, end, value = best_subpath(path, lambda key: counts[key] - own[key] > 0,
+                                             value_per_connection)
+            counts.subtract(own)
+
+            if value > 100:
+                part = path[start:end + 1]
+                counts.update(path_keys(part))
+                normalised.append(route if len(part) == len(path) else route_from_path(part))
+
+        return normalised
+
+
     def run(self, iterations: int, 
             simulated_annealing: bool = False, 
             cap=10**99,
             improve_routes: bool = True,
             original_connections_only: bool = False,
+            gap_threshold: float | None = None,
+            upper_bound: float | None = None,
+            local_operators: bool = False,
+            bandit_epsilon: float = 0.1,
+            batch_size: int | None = None,
+            batch_selection: str = "best",
+            batch_temperature: float = 10.0,
+            transposition_table: bool = False,
+            table_size: int = 100000,
+            elite_archive: Elite_Archive | None = None,
+            exact_repair: bool = False,
+            optimal_trimming: bool = False,
+            targeted_moves: bool = False,
+            removal_temperature: float = 100.0,
             
             log_csv: str | None = None,
             print_every_improvement: bool = True) -> list[Route]:
         """
         Run the Hillclimber optimization for a specified number of iterations.
 
-        Pre: 
-
+        Pre: the move settings can be combined as described below; 
+        otherwise a ValueError is raised (see make_move).
 
         Post: The Hillclimber algorithm runs for the specified number
-          of iterations, optimizing the routes.
+          of iterations, optimizing the routes. Returns the best 
+          solution found (also in self.routes, with its score in 
+          self.best_score); the score of the current solution per 
+          iteration is in self.scores.
 
         Args:
         
@@ -213,6 +294,65 @@ class Hillclimber(Algorithm):
         - original_connections_only (bool): if True, a route never uses 
         the same connection more than once (i.e.: never goes back to 
         a previously visited station)
+        - gap_threshold (float): if not None, stop as soon as the relative
+        gap between the score and the upper bound is at most this value
+        (0 means: stop when the solution is proven optimal).
+        - upper_bound (float): upper bound on the score to compute the 
+        gap with. Default is helpers.bounds.upper_bound for this map.
+        - elite_archive (Elite_Archive): if set, every new best score of
+        this run is published to this archive (shared with other
+        processes, see classes/elite_archive.py), and instead of 
+        stopping after `cap` iterations without change, the run 
+        restarts from a solution sampled from the archive. Default None.
+
+        Move settings (see algorithms/hillclimber_moves.py). By default,
+        the classic move (Replace_Move): a random route is replaced by a
+        new random route.
+        - local_operators (bool): if True, besides replacing a random 
+        route, cheap local moves are used (extend, trim, splice, 2-opt, 
+        merge; see algorithms/operators.py). All moves are scored with
+        delta scoring (so routes are not copied every iteration), and 
+        each iteration a bandit picks the move type with the best recent
+        improvement per CPU microsecond (Local_Move). Default False.
+        - bandit_epsilon (float): chance that the bandit picks a random
+        move type instead of the best one. Default 0.1.
+        - batch_size (int): if set, every iteration generates this many
+        candidate moves (a random route replaced by a new random route, 
+        or added if there is room) and scores them all at once over 
+        count arrays (Batch_Move, see Coverage_Array). Default None: one
+        candidate per iteration. Cannot be combined with local_operators.
+        - batch_selection (str): which candidate is tried: "best" (the 
+        highest delta, steepest ascent) or "boltzmann" (sampled with
+        weight exp(delta / batch_temperature)). Default "best".
+        - batch_temperature (float): temperature in score points for
+        "boltzmann". Default 10.
+        - transposition_table (bool): if True, scores of solutions are
+        cached by a hash that ignores route order and direction (see
+        classes/transposition_table.py), so calculate_score is only
+        called for solutions that were not seen before. Hits and misses
+        are counted in `self.move.table`. Only for the classic move (no
+        local_operators or batch_size). Default False.
+        - table_size (int): max number of cached scores (least recently
+        used are forgotten first). Default 100000.
+        - exact_repair (bool): if True, a removed route is replaced by 
+        the best route given the other routes (see 
+        algorithms/route_repair.py) instead of a random route; with
+        local_operators, this is the extra operator "repair". Cannot be
+        combined with batch_size. Default False.
+        - optimal_trimming (bool): if True (only with improve_routes), 
+        every route is replaced by its best contiguous part given the 
+        other routes (prefix sums / Kadane, see normalise_routes), 
+        instead of greedily trimming head and tail. Cannot be combined
+        with local_operators. Default False.
+        - targeted_moves (bool): if True, the route that is replaced is
+        not picked uniformly, but with weight exp(-contribution / 
+        removal_temperature), where the contribution of a route is the 
+        value of the connections only it rides minus its minutes and 
+        100 (see Coverage_Array.contribution); and half of the new 
+        routes start on an uncovered connection. Cannot be combined with
+        local_operators. Default False.
+        - removal_temperature (float): temperature in score points for
+        targeted_moves. Default 100 (the cost of a route).
 
         Data collection settings:
         - log_csv: if not None, append score per iteration to specified 
@@ -229,67 +369,166 @@ class Hillclimber(Algorithm):
         self.cap = cap
         self.original_connections_only = original_connections_only
 
+        # Upper bound for the optimality gap
+        if upper_bound is None and gap_threshold is not None:
+            upper_bound = map_upper_bound(self.maprange)
+        self.upper_bound = upper_bound
+
         if improve_routes:
-            self.routes = self.improve_routes(self.routes)
+            self.routes = (self.normalise_routes(self.routes) if optimal_trimming
+                           else self.improve_routes(self.routes))
             self.best_score = calculate_score(self.routes, self.maprange)
             print(f"improved start score: {self.best_score}")
 
-        for i in range(self.iterations):
-            # each iteration, remove a random route and add another
-            new_routes = copy.deepcopy(self.routes)
-
-            new_routes = self.remove_random_route(new_routes)
-            new_routes = self.add_random_route(new_routes)
+        # How candidates are made and scored
+        self.move = self.make_move(improve_routes, local_operators, bandit_epsilon,
+                                   batch_size, batch_selection, batch_temperature,
+                                   transposition_table, table_size, exact_repair,
+                                   optimal_trimming, targeted_moves, removal_temperature)
+        current_score = self.move.start(self.routes)
+        self.routes = self.move.routes
+
+        # Best solution of this run, kept apart from the current routes
+        # (simulated annealing and restarts move away from it). Moves 
+        # replace routes instead of changing them, so a copy of the list
+        # is enough
+        best_routes, self.best_score = list(self.routes), current_score
+
+        # Solutions are published to the elite archive, so restarting
+        # from there is always possible
+        published_score = float("-inf")
+        if elite_archive is not None:
+            elite_archive.publish(self.routes, self.best_score)
+            published_score = self.best_score
 
-            # If set, improve routes by removing redundant connections
-            if improve_routes:
-                new_routes = self.improve_routes(new_routes)
-
-            new_score = calculate_score(new_routes, self.maprange)
+        for i in range(self.iterations):
+            # If the gap to the upper bound is small enough, stop
+            if (gap_threshold is not None and 
+                optimality_gap(self.best_score, upper_bound) <= gap_threshold + 1e-9):
+                print(f"Gap to upper bound {upper_bound} below threshold")
+                break
 
+            new_score = self.move.propose(current_score)
 
             accept_new = False
-            if self.simulated_annealing == True:
+            if new_score is None:
+                # No move found
+                pass
+            elif self.simulated_annealing == True:
                 # Simulated annealing, always accept a higher or equal score
-                temperature = self.best_score / 10000
-                if random.random() < 2 ** (temperature * (new_score - self.best_score)):
+                temperature = current_score / 10000
+                if random.random() < 2 ** (temperature * (new_score - current_score)):
                     accept_new = True
             else:
-                if new_score > self.best_score:
+                if new_score > current_score:
                     accept_new = True
 
-            
             if accept_new:
-            #if new_score > self.best_score:
                 # use the new routes next iteration
-                self.routes = new_routes
-                self.best_score = new_score
-                self.scores.append(new_score)
-                
+                current_score = self.move.accept()
+                self.routes = self.move.routes
+                self.scores.append(current_score)
                 count_no_change = 0
-                if print_every_improvement:
-                    print(f"iteratie {i}, score {new_score}")
+
+                if current_score > self.best_score:
+                    best_routes, self.best_score = list(self.routes), current_score
+                    if print_every_improvement:
+                        print(f"iteratie {i}, score {current_score}")
+
+                    # Share new best scores with other runs
+                    if elite_archive is not None and current_score > published_score:
+                        elite_archive.publish(best_routes, current_score)
+                        published_score = current_score
 
             else:
                 # use the old routes next iteration
-                self.scores.append(self.best_score)
+                self.move.reject()
+                self.scores.append(current_score)
                 count_no_change += 1
 
             if self.cap < self.iterations:
                 # if there has been no change for too many iterations, stop
-                if count_no_change == self.cap:
+                if count_no_change == self.cap and elite_archive is None:
                     print("Too long no change")
                     break
 
+                # or, with an elite archive, restart the current routes 
+                # from a sampled elite (the best of this run is kept)
+                if count_no_change == self.cap:
+                    current_score = self.move.start(elite_archive.sample(self.load))
+                    self.routes = self.move.routes
+                    count_no_change = 0
+                    print(f"Too long no change, restart from elite with score {current_score}")
+
+        # The best solution is the result
+        self.routes = best_routes
         
         # When done:
         # If set, log score per iteration to csv file
         if log_csv is not None:
             append_scores_to_csv(self.scores, log_csv, custom_file_path=True)
 
+        if elite_archive is not None:
+            elite_archive.publish(self.routes, self.best_score)
+
         # Print summary
         print(f"Start score: {self.start_score}, End score: {self.best_score}")
+        self.move.report()
+        if self.upper_bound is not None:
+            self.gap = optimality_gap(self.best_score, self.upper_bound)
+            print(f"Upper bound: {self.upper_bound}, gap: {self.gap:.2%}")
 
         # And return the found solution
         return self.routes
 
+    def make_move(self, improve_routes: bool = True,
+                  local_operators: bool = False,
+                  bandit_epsilon: float = 0.1,
+                  batch_size: int | None = None,
+                  batch_selection: str = "best",
+                  batch_temperature: float = 10.0,
+                  transposition_table: bool = False,
+                  table_size: int = 100000,
+                  exact_repair: bool = False,
+                  optimal_trimming: bool = False,
+                  targeted_moves: bool = False,
+                  removal_temperature: float = 100.0) -> Move_Strategy:
+        """
+        The move strategy for the move settings of run (see
+        algorithms/hillclimber_moves.py).
+
+        - Pre: original_connections_only is set.
+        - Post: returns the move strategy. Raises a ValueError for 
+          settings that cannot be combined, or that the chosen move
+          would ignore.
+        """
+        if local_operators and batch_size is not None:
+            raise ValueError("local_operators and batch_size cannot be combined.")
+        if exact_repair and batch_size is not None:
+            raise ValueError("exact_repair and batch_size cannot be combined.")
+        if transposition_table and (local_operators or batch_size is not None):
+            raise ValueError("transposition_table only works with the classic move.")
+        if local_operators and (optimal_trimming or targeted_moves):
+            raise ValueError("optimal_trimming and targeted_moves cannot be combined "
+                             "with local_operators.")
+        if optimal_trimming and not improve_routes:
+            raise ValueError("optimal_trimming only works with improve_routes.")
+
+        if local_operators:
+            return Local_Move(self, bandit_epsilon, exact_repair)
+        if batch_size is not None:
+            return Batch_Move(self, batch_size, batch_selection, batch_temperature,
+                              improve_routes, optimal_trimming,
+                              targeted_moves, removal_temperature)
+        return Replace_Move(self, improve_routes, optimal_trimming, exact_repair,
+                            targeted_moves, removal_temperature,
+                            transposition_table, table_size)
+
+    def routes_on_this_map(self, routes: list[Route]) -> list[Route]:
+        """
+        Rebuild routes from their stations on this map, so all routes
+        share the same Station objects (and their minutes are correct).
+        """
+        return [route_from_path([self.load.station_list[self.load.station_index[station.name]]
+                                 for station in route.stations])
+                for route in routes]
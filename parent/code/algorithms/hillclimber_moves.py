@@ -0,0 +1,413 @@
+# External imports:
+import copy
+import random
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+# Internal imports:
+from parent.code.algorithms.operators import Local_Operators, Move, Operator_Bandit, route_from_path
+from parent.code.algorithms.route_repair import Route_Repair
+from parent.code.classes.coverage import Coverage, Coverage_Array, canonical_route
+from parent.code.classes.route import Route
+from parent.code.classes.transposition_table import Transposition_Table, solution_hash
+from parent.code.helpers.score import calculate_score
+
+if TYPE_CHECKING:
+    from parent.code.algorithms.hillclimber import Hillclimber
+
+
+class Move_Strategy:
+    """
+    How a Hillclimber changes its solution. Hillclimber.run is the loop
+    that is the same for every move: it asks the strategy for a candidate
+    (`propose`), decides whether it is accepted, and then tells the
+    strategy (`accept` or `reject`). The strategy keeps the current
+    routes, and whatever it needs to make and score candidates, in step.
+    """
+
+    def __init__(self, hillclimber: "Hillclimber") -> None:
+        self.hillclimber = hillclimber
+        self.routes: list[Route] = []
+
+    def start(self, routes: list[Route]) -> float:
+        """
+        Start from `routes`: at the start of a run, or on a restart.
+
+        - Post: self.routes are the current routes; returns their score.
+        """
+        self.routes = routes
+        return calculate_score(routes, self.hillclimber.maprange)
+
+    def propose(self, score: float) -> float | None:
+        """
+        Make a candidate move from the current routes (that have
+        `score`).
+
+        - Post: returns the score after the move, or None if there is no
+          move.
+        """
+        raise NotImplementedError
+
+    def accept(self) -> float:
+        """
+        Make the candidate move.
+
+        - Post: self.routes are the new routes; returns their score.
+        """
+        raise NotImplementedError
+
+    def reject(self) -> None:
+        """
+        Forget the candidate move.
+        """
+
+    def report(self) -> None:
+        """
+        Print statistics of the moves, at the end of a run.
+        """
+
+
+class Replace_Move(Move_Strategy):
+    """
+    The classic Hillclimber move: a copy of the solution with a random
+    route removed and a new random route added (or the best route, see
+    algorithms/route_repair.py), trimmed and scored with calculate_score.
+
+    With targeted_moves, the removed route is picked by its contribution
+    and half of the new routes start on an uncovered connection (see
+    Coverage_Array). With a transposition table, scores of solutions
+    that were seen before are not computed again.
+    """
+
+    def __init__(self, hillclimber: "Hillclimber",
+                 improve_routes: bool = True,
+                 optimal_trimming: bool = False,
+                 exact_repair: bool = False,
+                 targeted_moves: bool = False,
+                 removal_temperature: float = 100.0,
+                 transposition_table: bool = False,
+                 table_size: int = 100000) -> None:
+        super().__init__(hillclimber)
+        self.improve_routes = improve_routes
+        self.optimal_trimming = optimal_trimming
+        self.targeted_moves = targeted_moves
+        self.removal_temperature = removal_temperature
+
+        # Finds the best route given the other routes
+        self.route_repair = (Route_Repair(hillclimber.load, hillclimber.route_time_limit,
+                                          hillclimber.original_connections_only)
+                             if exact_repair else None)
+
+        # Cache of scores of solutions seen before
+        self.table = Transposition_Table(table_size) if transposition_table else None
+
+        # Inverted index of the current routes, for targeted moves
+        self.state: Coverage_Array | None = None
+
+    def start(self, routes: list[Route]) -> float:
+        self.routes = routes
+        if self.targeted_moves:
+            # Routes without connections are not kept in the state
+            self.routes = [route for route in routes if len(route.stations) > 1]
+            self.state = Coverage_Array(self.routes, self.hillclimber.load)
+        return self.score_routes(self.routes)
+
+    def propose(self, score: float) -> float:
+        hillclimber = self.hillclimber
+
+        # Remove a random route and add another
+        new_routes = copy.deepcopy(self.routes)
+        if self.targeted_moves:
+            new_routes = [route for route in self.replace_targeted_route(new_routes)
+                          if len(route.stations) > 1]
+        else:
+            new_routes = hillclimber.remove_random_route(new_routes)
+            if self.route_repair is not None:
+                new_routes = self.add_best_route(new_routes)
+            else:
+                new_routes = hillclimber.add_random_route(new_routes)
+
+        # If set, improve routes by removing redundant connections
+        if self.improve_routes and self.optimal_trimming:
+            new_routes = hillclimber.normalise_routes(new_routes)
+        elif self.improve_routes:
+            new_routes = hillclimber.improve_routes(new_routes)
+
+        self.new_routes = new_routes
+        self.new_score = self.score_routes(new_routes)
+        return self.new_score
+
+    def accept(self) -> float:
+        self.routes = self.new_routes
+        if self.targeted_moves:
+            self.update_state()
+        return self.new_score
+
+    def report(self) -> None:
+        if self.table is not None:
+            print(f"Transposition table: {self.table.hits} hits, {self.table.misses} misses",
+                  f"(hit rate {self.table.hit_rate():.1%})")
+
+    def score_routes(self, routes: list[Route]) -> float:
+        """
+        Score of a solution, from the transposition table if it was seen
+        before (and the table is used).
+        """
+        if self.table is None:
+            return calculate_score(routes, self.hillclimber.maprange)
+
+        key = solution_hash(routes)
+        score = self.table.get(key)
+        if score is None:
+            score = calculate_score(routes, self.hillclimber.maprange)
+            self.table.put(key, score)
+        return score
+
+    def update_state(self) -> None:
+        """
+        Apply the accepted move to the state with Coverage_Array.replace:
+        routes of the state that are no longer in the solution are 
+        removed and new routes are added, so only routes that changed
+        are indexed again. Then the routes are put in the order of the
+        state.
+        """
+        by_key: dict[tuple[str, ...], list[Route]] = {}
+        for route in self.routes:
+            by_key.setdefault(canonical_route(route.stations), []).append(route)
+
+        # Remove routes that are gone, last first (a removed route is 
+        # replaced by the last route, which is then already checked)
+        n_new = {key: len(routes) for key, routes in by_key.items()}
+        for index in reversed(range(len(self.state.paths))):
+            key = canonical_route(self.state.paths[index])
+            if n_new.get(key, 0) > 0:
+                n_new[key] -= 1
+            else:
+                self.state.replace(index, [])
+
+        for key, n in n_new.items():
+            for route in by_key[key][:n]:
+                self.state.replace(len(self.state.paths), route.stations)
+
+        self.routes = [by_key[canonical_route(path)].pop() for path in self.state.paths]
+
+    def add_best_route(self, routes: list[Route]) -> list[Route]:
+        """
+        Add the best route given the other routes (see Route_Repair), if
+        it is worth the 100 points of a route.
+
+        - Post: returns the list of routes, with the new route added.
+        """
+        load = self.hillclimber.load
+        covered = {load.connection_index[tuple(sorted((station1.name, station2.name)))]
+                   for route in routes
+                   for station1, station2 in zip(route.stations, route.stations[1:])}
+
+        path, value = self.route_repair.best_route(covered)
+        if value > 100:
+            routes.append(route_from_path(path))
+        return routes
+
+    def replace_targeted_route(self, routes: list[Route]) -> list[Route]:
+        """
+        Remove a route, picked with the removal weights of the state
+        (routes that add little first), and add a new route that starts
+        on an uncovered connection (see Hillclimber.targeted_connection),
+        or the best route with exact_repair.
+
+        - Pre: routes are in the same order as the routes of the state.
+        - Post: returns the updated list of routes.
+        """
+        removed = None
+        if len(routes) > 1:
+            removed = int(np.random.choice(
+                len(routes), p=self.state.removal_weights(self.removal_temperature)))
+            routes.pop(removed)
+
+        if self.route_repair is not None:
+            return self.add_best_route(routes)
+        routes.append(self.hillclimber.generate_random_route(
+            self.hillclimber.targeted_connection(self.state, removed)))
+        return routes
+
+
+class Batch_Move(Move_Strategy):
+    """
+    Every iteration, `batch_size` candidate moves (a random route
+    replaced by a new random route, or added if there is room) are
+    scored at once over count arrays (see Coverage_Array), and one of
+    them is tried: the best one, or sampled by Boltzmann weight.
+
+    Throughput is in `batch_report` after the run.
+    """
+
+    def __init__(self, hillclimber: "Hillclimber",
+                 batch_size: int,
+                 batch_selection: str = "best",
+                 batch_temperature: float = 10.0,
+                 improve_routes: bool = True,
+                 optimal_trimming: bool = False,
+                 targeted_moves: bool = False,
+                 removal_temperature: float = 100.0) -> None:
+        if batch_selection not in ("best", "boltzmann"):
+            raise ValueError("batch_selection should be 'best' or 'boltzmann'.")
+
+        super().__init__(hillclimber)
+        self.batch_size = batch_size
+        self.batch_selection = batch_selection
+        self.batch_temperature = batch_temperature
+        self.improve_routes = improve_routes
+        self.optimal_trimming = optimal_trimming
+        self.removal_temperature = removal_temperature if targeted_moves else None
+
+        self.steps = 0
+        self.candidates_evaluated = 0
+        self.start_time = time.perf_counter()
+
+    def start(self, routes: list[Route]) -> float:
+        self.routes = self.hillclimber.routes_on_this_map(routes)
+        self.state = Coverage_Array(self.routes, self.hillclimber.load)
+        return self.state.score()
+
+    def propose(self, score: float) -> float:
+        self.new_move, delta = self.choose_from_batch()
+        self.steps += 1
+        self.candidates_evaluated += self.batch_size
+        return score + delta
+
+    def accept(self) -> float:
+        index, new_path = self.new_move
+        self.state.replace(index, new_path)
+        if self.improve_routes and len(new_path) > 1 and self.optimal_trimming:
+            self.state.trim_optimal(index)
+        elif self.improve_routes and len(new_path) > 1:
+            self.state.trim_redundant(index)
+
+        self.routes = [route_from_path(path) for path in self.state.paths]
+        return self.state.score()
+
+    def report(self) -> None:
+        seconds = time.perf_counter() - self.start_time
+        self.batch_report = {"batch_size": self.batch_size,
+                             "steps": self.steps,
+                             "candidates": self.candidates_evaluated,
+                             "seconds": seconds,
+                             "candidates_per_second": self.candidates_evaluated / seconds,
+                             "end_score": self.hillclimber.best_score}
+        print(f"Evaluated {self.candidates_evaluated} candidates in {seconds:.1f} s",
+              f"({self.candidates_evaluated / seconds:.0f} per second)")
+
+    def choose_from_batch(self) -> tuple[tuple[int, list], float]:
+        """
+        Generate `batch_size` candidate moves: a random route replaced by
+        a new random route (or a new route added, if there is room).
+        Score them all at once and return the chosen move with its
+        delta: the best one, or sampled by Boltzmann weight.
+
+        With targeted moves, the route to replace is picked by the
+        removal weights of the state and half of the new routes start on
+        an uncovered connection.
+        """
+        hillclimber, state = self.hillclimber, self.state
+        n_routes = len(state.paths)
+        n_choices = n_routes + (n_routes < hillclimber.max_routes)
+        if self.removal_temperature is None:
+            indices = [random.randrange(n_choices) for _ in range(self.batch_size)]
+            new_paths = [hillclimber.generate_random_route().stations
+                         for _ in range(self.batch_size)]
+        else:
+            # Adding a route keeps its chance of 1 / n_choices
+            weights = np.append(state.removal_weights(self.removal_temperature)
+                                * n_routes / n_choices,
+                                [1 / n_choices] if n_choices > n_routes else [])
+            indices = np.random.choice(n_choices, size=self.batch_size, p=weights).tolist()
+            new_paths = [hillclimber.generate_random_route(
+                hillclimber.targeted_connection(state, index)).stations for index in indices]
+
+        deltas = state.batch_delta(indices, new_paths)
+
+        if self.batch_selection == "best":
+            chosen = int(np.argmax(deltas))
+        else:
+            weights = np.exp((deltas - deltas.max()) / self.batch_temperature)
+            chosen = int(np.random.choice(self.batch_size, p=weights / weights.sum()))
+
+        return (indices[chosen], new_paths[chosen]), float(deltas[chosen])
+
+
+class Local_Move(Move_Strategy):
+    """
+    Cheap local moves besides replacing a route (extend, trim, splice,
+    2-opt, merge; see algorithms/operators.py), scored with delta
+    scoring over the coverage counts, so routes are not copied every
+    iteration. Every iteration a bandit picks the move type with the
+    best recent improvement per CPU microsecond.
+    """
+
+    def __init__(self, hillclimber: "Hillclimber",
+                 bandit_epsilon: float = 0.1,
+                 exact_repair: bool = False) -> None:
+        super().__init__(hillclimber)
+        route_repair = (Route_Repair(hillclimber.load, hillclimber.route_time_limit,
+                                     hillclimber.original_connections_only)
+                        if exact_repair else None)
+        self.operators = Local_Operators(hillclimber.route_time_limit, hillclimber.max_routes,
+                                         hillclimber.generate_random_route,
+                                         hillclimber.original_connections_only,
+                                         route_repair)
+        self.bandit = Operator_Bandit(self.operators.names, epsilon=bandit_epsilon)
+
+    def start(self, routes: list[Route]) -> float:
+        self.routes = self.hillclimber.routes_on_this_map(routes)
+        self.coverage = Coverage(self.routes, self.hillclimber.load.map_connections)
+        return self.coverage.score()
+
+    def propose(self, score: float) -> float | None:
+        self.move_type = self.bandit.choose()
+        self.start_time = time.process_time_ns()
+        self.new_move: Move | None = self.operators.propose(
+            self.move_type, [route.stations for route in self.routes], self.coverage)
+        return score + self.new_move[1] if self.new_move is not None else None
+
+    def accept(self) -> float:
+        self.update_bandit(self.new_move[1])
+        self.apply_move(self.new_move)
+        return self.coverage.score()
+
+    def reject(self) -> None:
+        self.update_bandit(0)
+
+    def update_bandit(self, improvement: float) -> None:
+        """
+        Tell the bandit what the last move type gained, and the CPU time
+        it took.
+        """
+        self.bandit.update(self.move_type, improvement,
+                           (time.process_time_ns() - self.start_time) / 1000)
+
+    def apply_move(self, move: Move) -> None:
+        """
+        Apply a move of the local operators to the routes, and update
+        the coverage counts.
+        """
+        changes, _ = move
+
+        # Highest index first, so removing a route does not shift the
+        # indices of the other changes
+        for index, new_path in sorted(changes, key=lambda change: -change[0]):
+            # New route
+            if index == len(self.routes):
+                if len(new_path) > 1:
+                    self.coverage.add_path(new_path)
+                    self.routes.append(route_from_path(new_path))
+                continue
+
+            self.coverage.remove_path(self.routes[index].stations)
+
+            if len(new_path) > 1:
+                self.coverage.add_path(new_path)
+                self.routes[index] = route_from_path(new_path)
+            else:
+                self.routes.pop(index)
@@ -0,0 +1,273 @@
+# External imports:
+import multiprocessing
+import queue
+import random
+import traceback
+
+# Internal imports:
+from parent.code.algorithms.genetic import Genetic
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+from parent.code.helpers.score import calculate_score
+
+
+# A solution as it is sent between processes: routes as tuples of
+# station names
+Migrant = tuple[tuple[str, ...], ...]
+
+
+def to_migrant(routes: list[Route]) -> Migrant:
+    """
+    Turn routes into a migrant.
+    """
+    return tuple(tuple(station.name for station in route.stations)
+                 for route in routes if len(route.stations) > 1)
+
+
+def from_migrant(migrant: Migrant, load: RailNL) -> list[Route]:
+    """
+    Turn a migrant into routes on the stations of `load`.
+    """
+    return [route_from_path([load.stations[name] for name in route]) for route in migrant]
+
+
+def _run_island(island: int, settings: dict, inbox: multiprocessing.Queue,
+                outboxes: list[multiprocessing.Queue],
+                results: multiprocessing.Queue) -> None:
+    """
+    Run one island in its own process (see _island).
+
+    - Post: puts (island, best score, best solution, log) on `results`,
+      or (island, None, None, traceback) if the island raised an error.
+    """
+    try:
+        results.put((island, *_island(island, settings, inbox, outboxes)))
+    except Exception:
+        results.put((island, None, None, traceback.format_exc()))
+
+
+def _island(island: int, settings: dict, inbox: multiprocessing.Queue,
+            outboxes: list[multiprocessing.Queue]) -> tuple[float, Migrant, dict]:
+    """
+    Every epoch, run the algorithm of the island for some iterations,
+    send the best solution to the neighbours and take in the migrants
+    that arrived (if they are better).
+
+    - Post: returns the best score, the best solution and the log. The
+      log has the score of every iteration and, per epoch, the best
+      score and the number of migrants received and accepted.
+    """
+    random.seed(settings["seed"] + island)
+    maprange, algorithm = settings["maprange"], settings["algorithm"]
+    n_islands = len(outboxes)
+
+    log = {"scores": [], "epochs": []}
+
+    if algorithm == "genetic":
+        genetic = Genetic(maprange, n_workers=1)
+        load = genetic.load
+        population = None
+    else:
+        load = RailNL(maprange)
+        routes = Random_Greedy(maprange).run(
+            starting_stations="original_stations_only_hard",
+            final_number_of_routes=settings["number_of_routes"])
+
+    for epoch in range(settings["epochs"]):
+        # Run the island for a while
+        if algorithm == "genetic":
+            best_routes = genetic.run(generations=settings["iterations"],
+                                      population=population,
+                                      print_every_improvement=False,
+                                      **settings["run_kwargs"])
+            population = genetic.population
+            best_score = genetic.best_score
+            log["scores"] += genetic.scores
+        else:
+            hillclimber = Hillclimber(routes, maprange)
+            best_routes = hillclimber.run(settings["iterations"],
+                                          print_every_improvement=False,
+                                          **settings["run_kwargs"])
+            best_score = hillclimber.best_score
+            log["scores"] += hillclimber.scores
+        routes = from_migrant(to_migrant(best_routes), load)
+
+        # Send the best solution: to the next island (ring), or to a
+        # random other island
+        if n_islands > 1:
+            if settings["topology"] == "ring":
+                target = (island + 1) % n_islands
+            else:
+                target = random.choice([other for other in range(n_islands) if other != island])
+            outboxes[target].put((best_score, to_migrant(routes)))
+
+        # Take in the migrants that arrived (without waiting for them)
+        received = accepted = 0
+        while True:
+            try:
+                migrant_score, migrant = inbox.get(timeout=settings["migration_timeout"])
+            except queue.Empty:
+                break
+            received += 1
+
+            migrant_routes = from_migrant(migrant, load)
+            if algorithm == "genetic":
+                # Replace the worst solution of the population
+                worst = min(range(len(population)), key=lambda i: genetic.population_scores[i])
+                population[worst] = genetic.to_individual(migrant_routes)
+                genetic.population_scores[worst] = migrant_score
+                accepted += 1
+            elif migrant_score > best_score:
+                routes, best_score = migrant_routes, migrant_score
+                accepted += 1
+
+            if settings["topology"] == "random":
+                continue
+            break
+
+        log["epochs"].append({"epoch": epoch, "best_score": best_score,
+                              "received": received, "accepted": accepted})
+
+    if algorithm == "genetic":
+        best = max(range(len(population)), key=lambda i: genetic.population_scores[i])
+        routes = [route_from_path([load.station_list[i] for i in route])
+                  for route in population[best]]
+    return calculate_score(routes, maprange), to_migrant(routes), log
+
+
+class Island_Model:
+    """
+    Runs several islands (Hillclimbers or genetic algorithms) in
+    parallel worker processes. Every epoch (a number of iterations or
+    generations), each island sends its best solution to another island
+    over a multiprocessing queue:
+    - "ring": island i sends to island i + 1 (the last to the first);
+    - "random": every island sends to a random other island.
+
+    A Hillclimber island continues from a migrant if it is better than
+    its own solution; a genetic island puts the migrant in place of the
+    worst solution of its population. This way the islands share their
+    progress instead of all repeating the same random search.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 n_islands: int = 4,
+                 algorithm: str = "hillclimber",
+                 topology: str = "ring") -> None:
+        """
+        - algorithm: "hillclimber" or "genetic".
+        - topology: "ring" or "random".
+        """
+        assert algorithm in ("hillclimber", "genetic"), "Unknown algorithm."
+        assert topology in ("ring", "random"), "Unknown topology."
+
+        self.maprange = maprange
+        self.n_islands = n_islands
+        self.algorithm = algorithm
+        self.topology = topology
+
+        self.routes: list[Route] = []
+        self.best_score: float = 0
+        self.island_logs: list[dict] = []
+
+    def run(self, epochs: int = 10,
+            iterations: int = 1000,
+            number_of_routes: int | None = None,
+            seed: int = 0,
+            migration_timeout: float = 0.1,
+            log_dir: str | None = None,
+            **run_kwargs) -> list[Route]:
+        """
+        Run all islands for a number of epochs.
+
+        Post: returns the best solution of all islands. Per-island logs
+        are in `self.island_logs` (index = island). If an island fails
+        (an error, or its process dies), the other islands are stopped
+        and a RuntimeError is raised.
+
+        Args:
+        - epochs: number of migrations.
+        - iterations: iterations (Hillclimber) or generations (genetic)
+          per epoch.
+        - number_of_routes: routes of the Random_Greedy start solution of
+          a Hillclimber island. Default 4 (Holland) or 12 (Nationaal).
+        - seed: random seed; island i uses seed + i.
+        - migration_timeout: seconds an island waits for a migrant after
+          an epoch, before it continues without.
+        - log_dir: if not None, the scores of island i are appended to
+          `{log_dir}/island_{i}.csv` (same format as log.csv).
+        - run_kwargs: passed on to Hillclimber.run or Genetic.run, e.g.
+          `local_operators=True` or `population_size=50`.
+        """
+        if number_of_routes is None:
+            number_of_routes = 4 if self.maprange == "Holland" else 12
+
+        settings = {"maprange": self.maprange, "algorithm": self.algorithm,
+                    "topology": self.topology, "epochs": epochs,
+                    "iterations": iterations, "number_of_routes": number_of_routes,
+                    "seed": seed, "migration_timeout": migration_timeout,
+                    "run_kwargs": run_kwargs}
+
+        inboxes = [multiprocessing.Queue() for _ in range(self.n_islands)]
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_run_island,
+                                             args=(island, settings, inboxes[island],
+                                                   inboxes, results))
+                     for island in range(self.n_islands)]
+        for process in processes:
+            process.start()
+
+        try:
+            outcomes = self.collect(results, processes)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        self.island_logs = [log for _, _, _, log in outcomes]
+        self.island_scores = [score for _, score, _, _ in outcomes]
+        _, self.best_score, best, _ = max(outcomes, key=lambda outcome: outcome[1])
+        self.routes = from_migrant(best, RailNL(self.maprange))
+
+        if log_dir is not None:
+            for island, log in enumerate(self.island_logs):
+                append_scores_to_csv(log["scores"], f"{log_dir}/island_{island}.csv",
+                                     custom_file_path=True)
+
+        print(f"Island scores: {self.island_scores}, best: {self.best_score}")
+        return self.routes
+
+    def collect(self, results: multiprocessing.Queue,
+                processes: list[multiprocessing.Process],
+                poll_seconds: float = 1.0) -> list[tuple]:
+        """
+        Wait for the result of every island, checking every 
+        `poll_seconds` that the islands that did not report yet are 
+        still running.
+
+        - Post: returns the outcomes sorted by island. Raises a 
+          RuntimeError if an island raised an error or its process 
+          ended without a result.
+        """
+        outcomes = {}
+        while len(outcomes) < len(processes):
+            try:
+                island, score, best, log = results.get(timeout=poll_seconds)
+            except queue.Empty:
+                for island, process in enumerate(processes):
+                    if (island not in outcomes and not process.is_alive()
+                            and results.empty()):
+                        raise RuntimeError(f"Island {island} stopped without a result "
+                                           f"(exit code {process.exitcode}).")
+                continue
+
+            if score is None:
+                raise RuntimeError(f"Island {island} failed:\n{log}")
+            outcomes[island] = (island, score, best, log)
+
+        return [outcomes[island] for island in sorted(outcomes)]
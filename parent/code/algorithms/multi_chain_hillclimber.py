@@ -0,0 +1,303 @@
+# External imports:
+import random
+
+import numpy as np
+
+# Internal imports:
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+from parent.code.helpers.bounds import optimality_gap, upper_bound as map_upper_bound
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+
+
+class Multi_Chain_Hillclimber:
+    """
+    Runs M independent Hillclimber chains in lockstep, with the state of
+    all chains in NumPy arrays (chain x route x connection counts,
+    minutes per route, which routes exist), so one iteration of all
+    chains is a handful of array operations instead of M Python loops.
+
+    The move is the move of the Hillclimber: a random route of a chain
+    is replaced by a new random route (or a route is added, if there is
+    room; a new route without connections removes the route). New routes
+    are drawn from a pool of random routes (made with
+    Hillclimber.generate_random_route), of which a few are replaced by
+    fresh ones every iteration. With improve_routes, the head and tail
+    of the new route are trimmed as long as their connections are ridden
+    by other routes too.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 n_chains: int = 100,
+                 start_states: list[list[Route]] | None = None,
+                 seed: int | None = None) -> None:
+        """
+        - start_states: a start solution per chain. Default: Random_Greedy
+          solutions with 4 (Holland) or 12 (Nationaal) routes.
+        - seed: random seed. The start states and the pool routes use the
+          global generators of `random` and NumPy, so those are seeded
+          too.
+        """
+        self.maprange = maprange
+        self.load = RailNL(maprange)
+        self.n_chains = n_chains
+        self.rng = np.random.default_rng(seed)
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed % 2**32)
+
+        self.max_routes = 7 if maprange == "Holland" else 20
+        self.n_connections = len(self.load.connection_list)
+        self.value_per_connection = 10000 / self.n_connections
+
+        # Its random routes are the new routes of the moves
+        self.hillclimber = Hillclimber([], maprange)
+        self.hillclimber.original_connections_only = False
+
+        if start_states is None:
+            random_greedy = Random_Greedy(maprange)
+            start_states = [random_greedy.run(
+                starting_stations="original_stations_only_hard",
+                final_number_of_routes=4 if maprange == "Holland" else 12)
+                for _ in range(n_chains)]
+        assert len(start_states) == n_chains, "Give one start state per chain."
+
+        # State of all chains
+        shape = (n_chains, self.max_routes)
+        self.paths: list[list[list[Station]]] = [[[] for _ in range(self.max_routes)]
+                                                 for _ in range(n_chains)]
+        self.vectors = np.zeros(shape + (self.n_connections,), dtype=np.int16)
+        self.minutes = np.zeros(shape, dtype=np.int32)
+        self.active = np.zeros(shape, dtype=bool)
+
+        for chain, routes in enumerate(start_states):
+            paths = [[self.load.stations[station.name] for station in route.stations]
+                     for route in routes if len(route.stations) > 1]
+            for slot, path in enumerate(paths[:self.max_routes]):
+                self.set_slot(chain, slot, path)
+
+        self.counts = self.vectors.sum(axis=1, dtype=np.int16)
+        self.current_scores = self.scores_of_state()
+
+    def set_slot(self, chain: int, slot: int, path: list[Station]) -> None:
+        """
+        Put a route in a slot of a chain (an empty path empties the slot).
+        Does not update the counts of the chain.
+        """
+        self.paths[chain][slot] = path
+        self.vectors[chain, slot] = 0
+        self.minutes[chain, slot] = 0
+        for station1, station2 in zip(path, path[1:]):
+            self.vectors[chain, slot, self.edge_index(station1, station2)] += 1
+            self.minutes[chain, slot] += int(station1.connections[station2])
+        self.active[chain, slot] = len(path) > 1
+
+    def edge_index(self, station1: Station, station2: Station) -> int:
+        """
+        Index of the connection between two stations.
+        """
+        key = tuple(sorted((station1.name, station2.name)))
+        return self.load.connection_index[key]
+
+    def scores_of_state(self) -> np.ndarray:
+        """
+        Score of every chain (same formula as calculate_score).
+        """
+        return (np.count_nonzero(self.counts, axis=1) * self.value_per_connection
+                - 100 * self.active.sum(axis=1) - self.minutes.sum(axis=1))
+
+    def make_pool(self, pool_size: int) -> None:
+        """
+        Fill the pool of random routes: their paths, connection indices
+        per step (padded with 0), cumulative minutes and count vectors.
+        """
+        max_length = max(station.amount_connecting() for station in self.load.station_list)
+        route_time_limit = 120 if self.maprange == "Holland" else 180
+        min_duration = min(int(duration) for station in self.load.station_list
+                           for duration in station.connections.values())
+        self.pool_length = route_time_limit // min_duration + max_length
+
+        self.pool_paths: list[list[Station]] = [[] for _ in range(pool_size)]
+        self.pool_edges = np.zeros((pool_size, self.pool_length), dtype=np.int32)
+        self.pool_cumulative = np.zeros((pool_size, self.pool_length + 1), dtype=np.int32)
+        self.pool_n_edges = np.zeros(pool_size, dtype=np.int32)
+        self.pool_vectors = np.zeros((pool_size, self.n_connections), dtype=np.int16)
+
+        for index in range(pool_size):
+            self.refresh_pool_route(index)
+
+    def refresh_pool_route(self, index: int) -> None:
+        """
+        Replace a route of the pool by a new random route.
+        """
+        path = self.hillclimber.generate_random_route().stations
+        edges = [self.edge_index(station1, station2) for station1, station2 in zip(path, path[1:])]
+        durations = [int(station1.connections[station2]) for station1, station2 in zip(path, path[1:])]
+
+        self.pool_paths[index] = path
+        self.pool_n_edges[index] = len(edges)
+        self.pool_edges[index] = 0
+        self.pool_edges[index, :len(edges)] = edges
+        self.pool_cumulative[index] = 0
+        self.pool_cumulative[index, 1:len(edges) + 1] = np.cumsum(durations, dtype=np.int32)
+        self.pool_cumulative[index, len(edges) + 1:] = self.pool_cumulative[index, len(edges)]
+        self.pool_vectors[index] = np.bincount(edges, minlength=self.n_connections)
+
+    def run(self, iterations: int,
+            simulated_annealing: bool = False,
+            cap=10**99,
+            improve_routes: bool = True,
+            original_connections_only: bool = False,
+            gap_threshold: float | None = None,
+            upper_bound: float | None = None,
+            pool_size: int = 4096,
+            pool_refresh: int = 8,
+
+            log_csv: str | None = None,
+            print_every_improvement: bool = False) -> list[list[Route]]:
+        """
+        Run all chains for a number of iterations.
+
+        Post: returns the solution of every chain. The best one is in
+        `self.routes` and `self.best_score`, the scores of every chain
+        per iteration in `self.scores` (iterations x chains).
+
+        Args (same as Hillclimber.run, per chain):
+        - iterations, simulated_annealing, cap, improve_routes,
+          original_connections_only, gap_threshold, upper_bound. A chain
+          stops after `cap` iterations without change, or once its gap
+          is at most `gap_threshold`; the others go on.
+        - pool_size: number of random routes to draw new routes from.
+        - pool_refresh: number of pool routes replaced every iteration.
+        - log_csv: if not None, the scores of every chain are appended
+          to this csv file as a column each (like log.csv of an
+          autorun, one column per run).
+        - print_every_improvement: if True, print the best score of all
+          chains whenever it improves.
+        """
+        self.hillclimber.original_connections_only = original_connections_only
+        if upper_bound is None and gap_threshold is not None:
+            upper_bound = map_upper_bound(self.maprange)
+        self.upper_bound = upper_bound
+
+        self.make_pool(pool_size)
+        chains = np.arange(self.n_chains)
+        running = np.ones(self.n_chains, dtype=bool)
+        stopped_at = np.full(self.n_chains, iterations)
+        count_no_change = np.zeros(self.n_chains, dtype=np.int64)
+        scores = np.zeros((iterations, self.n_chains))
+        best_of_all = self.current_scores.max()
+        self.start_scores = self.current_scores.copy()
+
+        for i in range(iterations):
+            if not running.any():
+                stopped_at = np.minimum(stopped_at, i)
+                break
+
+            # Slot to change per chain: one of the routes, or the first
+            # empty slot if there is room
+            n_routes = self.active.sum(axis=1)
+            n_choices = n_routes + (n_routes < self.max_routes)
+            order = np.argsort(~self.active, axis=1, kind="stable")
+            slots = order[chains, (self.rng.random(self.n_chains) * n_choices).astype(int)]
+
+            old_vectors = self.vectors[chains, slots]
+            old_minutes = self.minutes[chains, slots]
+            old_active = self.active[chains, slots]
+
+            # New route per chain, as the part [head, tail) of its steps
+            picks = self.rng.integers(pool_size, size=self.n_chains)
+            edges = self.pool_edges[picks]
+            head = np.zeros(self.n_chains, dtype=np.int32)
+            tail = self.pool_n_edges[picks].copy()
+            counts_after = self.counts - old_vectors + self.pool_vectors[picks]
+
+            # Trim head and tail while their connection is ridden elsewhere
+            if improve_routes:
+                for end in ("head", "tail"):
+                    trimming = np.ones(self.n_chains, dtype=bool)
+                    for _ in range(self.pool_length):
+                        position = head if end == "head" else tail - 1
+                        edge = edges[chains, np.clip(position, 0, self.pool_length - 1)]
+                        trimming &= (head < tail) & (counts_after[chains, edge] > 1)
+                        if not trimming.any():
+                            break
+                        counts_after[chains[trimming], edge[trimming]] -= 1
+                        if end == "head":
+                            head += trimming
+                        else:
+                            tail -= trimming
+
+            new_minutes = (self.pool_cumulative[picks, tail] - self.pool_cumulative[picks, head])
+            new_active = tail > head
+            covered_change = (np.count_nonzero(counts_after, axis=1)
+                              - np.count_nonzero(self.counts, axis=1))
+            new_scores = (self.current_scores + covered_change * self.value_per_connection
+                          - 100 * (new_active.astype(int) - old_active)
+                          - (new_minutes - old_minutes))
+
+            # Accept per chain, with the rule of Hillclimber.run
+            if simulated_annealing:
+                temperature = self.current_scores / 10000
+                with np.errstate(over="ignore"):
+                    chance = np.power(2.0, temperature * (new_scores - self.current_scores))
+                accept = self.rng.random(self.n_chains) < chance
+            else:
+                accept = new_scores > self.current_scores
+            accept &= running
+
+            for chain in np.flatnonzero(accept):
+                slot, pick = slots[chain], picks[chain]
+                self.paths[chain][slot] = (self.pool_paths[pick][head[chain]:tail[chain] + 1]
+                                           if new_active[chain] else [])
+            self.vectors[accept, slots[accept]] = (counts_after - self.counts + old_vectors)[accept]
+            self.minutes[accept, slots[accept]] = new_minutes[accept]
+            self.active[accept, slots[accept]] = new_active[accept]
+            self.counts[accept] = counts_after[accept]
+            self.current_scores[accept] = new_scores[accept]
+
+            count_no_change[accept] = 0
+            count_no_change[~accept] += 1
+            scores[i] = self.current_scores
+
+            if print_every_improvement and self.current_scores.max() > best_of_all:
+                best_of_all = self.current_scores.max()
+                print(f"iteratie {i}, score {best_of_all}")
+
+            # Stop chains without change for too long, or with a small gap
+            done = np.zeros(self.n_chains, dtype=bool)
+            if cap < iterations:
+                done |= count_no_change >= cap
+            if gap_threshold is not None:
+                done |= (np.array([optimality_gap(score, upper_bound) for score in self.current_scores])
+                         <= gap_threshold + 1e-9)
+            stopped_at[running & done] = i + 1
+            running &= ~done
+
+            # Fresh routes in the pool
+            for index in self.rng.integers(pool_size, size=pool_refresh):
+                self.refresh_pool_route(index)
+
+        self.scores = scores[:stopped_at.max()]
+        solutions = [[route_from_path(path) for path in chain_paths if len(path) > 1]
+                     for chain_paths in self.paths]
+        best_chain = int(np.argmax(self.current_scores))
+        self.routes, self.best_score = solutions[best_chain], float(self.current_scores[best_chain])
+
+        # Log the scores of every chain until it stopped, as a column
+        if log_csv is not None:
+            for chain in range(self.n_chains):
+                append_scores_to_csv(self.scores[:stopped_at[chain], chain], log_csv,
+                                     custom_file_path=True)
+
+        print(f"Best start score: {self.start_scores.max()}, best end score: {self.best_score}",
+              f"(mean {self.current_scores.mean():.1f} over {self.n_chains} chains)")
+        if self.upper_bound is not None:
+            self.gap = optimality_gap(self.best_score, self.upper_bound)
+            print(f"Upper bound: {self.upper_bound}, gap: {self.gap:.2%}")
+
+        return solutions
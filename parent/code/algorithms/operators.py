@@ -0,0 +1,346 @@
+# External imports:
+import math
+import random
+from collections import Counter
+from typing import Callable
+
+# Internal imports:
+from parent.code.algorithms.route_repair import Route_Repair
+from parent.code.classes.coverage import Coverage, connection_key, path_keys, path_minutes
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+
+
+# A move: the routes that change (index, new list of stations; an empty
+# list removes the route, an index past the last route adds one) and the
+# score change
+Move = tuple[list[tuple[int, list[Station]]], float]
+
+
+def route_from_path(path: list[Station]) -> Route:
+    """
+    Turn a list of stations into a Route object.
+    """
+    route = Route()
+    for station1, station2 in zip(path, path[1:]):
+        route.add_connection(station1, station2, station1.connections[station2])
+    return route
+
+
+class Local_Operators:
+    """
+    Cheap local moves on a solution, evaluated with delta scoring (see
+    Coverage). Every operator looks at one or two routes and returns the
+    best move it finds, or None.
+
+    - "replace": replace a random route by a new random route (the move
+      of Hillclimber), or add one if there is room for another route;
+      redundant ends of the new route are trimmed.
+    - "extend": add one connection at the head or tail of a route.
+    - "trim": remove the first or last connection of a route.
+    - "splice": two routes through the same station swap their tails,
+      after which redundant connections at the new ends are trimmed.
+    - "two_opt": reverse a part of a route, where the connections allow
+      that (two connections are swapped for two others).
+    - "merge": join two routes that end at the same station (or at
+      connected stations) into one, saving the 100 points of a route.
+    - "repair" (only with a Route_Repair): replace a random route by the
+      best route given the other routes (see algorithms/route_repair.py).
+    """
+
+    names = ("replace", "extend", "trim", "splice", "two_opt", "merge")
+
+    def __init__(self, route_time_limit: int,
+                 max_routes: int,
+                 route_generator: Callable[[], Route],
+                 original_connections_only: bool = False,
+                 route_repair: Route_Repair | None = None) -> None:
+        """
+        - route_generator: function that returns a new random route (for
+          "replace"), e.g. Hillclimber.generate_random_route.
+        - route_repair: if given, the "repair" operator is used too.
+        """
+        self.route_time_limit = route_time_limit
+        self.max_routes = max_routes
+        self.route_generator = route_generator
+        self.original_connections_only = original_connections_only
+        self.route_repair = route_repair
+        if route_repair is not None:
+            self.names = Local_Operators.names + ("repair",)
+
+    def propose(self, name: str, paths: list[list[Station]],
+                coverage: Coverage) -> Move | None:
+        """
+        Let operator `name` propose a move for the solution with routes
+        `paths` (lists of stations).
+        """
+        return getattr(self, name)(paths, coverage)
+
+    def random_route(self, paths: list[list[Station]], min_length: int = 2) -> int | None:
+        """
+        Index of a random route with at least `min_length` stations.
+        """
+        candidates = [i for i, path in enumerate(paths) if len(path) >= min_length]
+        return random.choice(candidates) if candidates else None
+
+    def replace(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Replace a random route by a new random route. If there is room,
+        the index can also be one past the last route: then the new route
+        is added.
+        """
+        n_choices = len(paths) + (len(paths) < self.max_routes)
+        if n_choices == 0:
+            return None
+
+        index = random.randrange(n_choices)
+        path = paths[index] if index < len(paths) else []
+        new_path = self.route_generator().stations
+        if len(new_path) < 2:
+            return None
+
+        # Counts after the replacement, then trim the ends of the new
+        # route that are ridden elsewhere as well
+        counts = coverage.counts.copy()
+        counts.subtract(path_keys(path))
+        counts.update(path_keys(new_path))
+        new_path = self.trim_redundant(new_path, counts)
+
+        return [(index, new_path)], coverage.delta([path], [new_path])
+
+    def repair(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Replace a random route by the best route given the other routes
+        (or remove it, if no route is worth its 100 points).
+        """
+        index = self.random_route(paths)
+        if index is None:
+            return None
+
+        path = paths[index]
+        counts = coverage.counts.copy()
+        counts.subtract(path_keys(path))
+        connection_index = self.route_repair.load.connection_index
+        covered = {connection_index[key] for key, count in counts.items() if count > 0}
+
+        # Only a route better than the current one (or than none) helps
+        new_path, _ = self.route_repair.best_route(
+            covered, max(100, 100 - coverage.delta([path], [])))
+        if not new_path:
+            return None
+        return [(index, new_path)], coverage.delta([path], [new_path])
+
+    def extend(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Extend a random route with the best connection at its head or
+        tail that fits within the time limit.
+        """
+        index = self.random_route(paths)
+        if index is None:
+            return None
+
+        path = paths[index]
+        time_left = self.route_time_limit - path_minutes(path)
+        used_keys = set(path_keys(path))
+        best = None
+
+        for at_head in (True, False):
+            end = path[0] if at_head else path[-1]
+            connections = end.connections_sorted
+
+            for i in range(end.count_connections_within(time_left)):
+                next_station, duration, key = connections[i]
+                if self.original_connections_only and key in used_keys:
+                    continue
+
+                gain = (coverage.value_per_connection if key not in coverage.counts else 0) - duration
+                if best is None or gain > best[0]:
+                    new_path = [next_station] + path if at_head else path + [next_station]
+                    best = (gain, new_path)
+
+        if best is None:
+            return None
+
+        return [(index, best[1])], best[0]
+
+    def trim(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Remove the first or last connection of a random route, whichever
+        is better.
+        """
+        index = self.random_route(paths)
+        if index is None:
+            return None
+
+        path = paths[index]
+        best = None
+        for new_path in (path[1:], path[:-1]):
+            delta = coverage.delta([path], [new_path])
+            if best is None or delta > best[1]:
+                best = ([(index, new_path)], delta)
+
+        return best
+
+    def trim_redundant(self, path: list[Station], counts: Counter) -> list[Station]:
+        """
+        Remove connections at the head and tail of a route that are also
+        ridden elsewhere (count above one). Updates `counts`.
+        """
+        for at_head in (True, False):
+            while len(path) > 1:
+                key = (connection_key(path[0], path[1]) if at_head
+                       else connection_key(path[-2], path[-1]))
+                if counts[key] <= 1:
+                    break
+                counts[key] -= 1
+                path = path[1:] if at_head else path[:-1]
+
+        return path
+
+    def splice(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Pick a station of a random route, and another route through the
+        same station. The routes swap their parts after that station
+        (if both stay within the time limit), then redundant ends are
+        trimmed.
+        """
+        index = self.random_route(paths)
+        if index is None:
+            return None
+
+        path = paths[index]
+        position = random.randrange(len(path))
+        station = path[position]
+
+        crossings = [(other, other_position)
+                     for other, other_path in enumerate(paths) if other != index
+                     for other_position, other_station in enumerate(other_path)
+                     if other_station is station]
+        if not crossings:
+            return None
+        other, other_position = random.choice(crossings)
+        other_path = paths[other]
+
+        new_path = path[:position + 1] + other_path[other_position + 1:]
+        new_other_path = other_path[:other_position + 1] + path[position + 1:]
+        if (path_minutes(new_path) > self.route_time_limit
+                or path_minutes(new_other_path) > self.route_time_limit):
+            return None
+
+        # Counts after the swap (the same connections, in other routes),
+        # then trim the ends that are ridden elsewhere as well
+        counts = coverage.counts.copy()
+        new_path = self.trim_redundant(new_path, counts)
+        new_other_path = self.trim_redundant(new_other_path, counts)
+
+        delta = coverage.delta([path, other_path], [new_path, new_other_path])
+        return [(index, new_path), (other, new_other_path)], delta
+
+    def two_opt(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Best 2-opt move inside a random route: reverse the part from
+        position i to j, which replaces the connections before i and
+        after j by connections from i - 1 to j and from i to j + 1 (these
+        must exist; at the ends of the route only one is needed).
+        """
+        index = self.random_route(paths, min_length=4)
+        if index is None:
+            return None
+
+        path = paths[index]
+        n = len(path)
+        best = None
+
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                # Reversing the whole route changes nothing
+                if i == 0 and j == n - 1:
+                    continue
+                if i > 0 and path[j] not in path[i - 1].connections:
+                    continue
+                if j < n - 1 and path[j + 1] not in path[i].connections:
+                    continue
+
+                new_path = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                if path_minutes(new_path) > self.route_time_limit:
+                    continue
+
+                delta = coverage.delta([path], [new_path])
+                if best is None or delta > best[1]:
+                    best = ([(index, new_path)], delta)
+
+        return best
+
+    def merge(self, paths: list[list[Station]], coverage: Coverage) -> Move | None:
+        """
+        Best merge of two routes: if the end of one route is the start of
+        the other (in either direction), or connected to it, join them
+        into one route within the time limit.
+        """
+        minutes = [path_minutes(path) for path in paths]
+        best = None
+
+        for i, path in enumerate(paths):
+            for j in range(i + 1, len(paths)):
+                other_path = paths[j]
+                if len(path) < 2 or len(other_path) < 2:
+                    continue
+                if minutes[i] + minutes[j] > self.route_time_limit:
+                    continue
+
+                for first in (path, path[::-1]):
+                    for second in (other_path, other_path[::-1]):
+                        if first[-1] is second[0]:
+                            merged = first + second[1:]
+                        elif second[0] in first[-1].connections:
+                            merged = first + second
+                        else:
+                            continue
+
+                        if path_minutes(merged) > self.route_time_limit:
+                            continue
+
+                        delta = coverage.delta([path, other_path], [merged])
+                        if best is None or delta > best[1]:
+                            best = ([(i, merged), (j, [])], delta)
+
+        return best
+
+
+class Operator_Bandit:
+    """
+    Picks operators by their recent improvement per CPU microsecond
+    (epsilon-greedy): usually the operator with the best rate, sometimes
+    a random one. Rates are exponential moving averages, so they follow
+    the search as the easy improvements run out. Operators that were not
+    tried yet come first.
+    """
+
+    def __init__(self, names: tuple[str, ...], epsilon: float = 0.1,
+                 decay: float = 0.05) -> None:
+        self.names = names
+        self.epsilon = epsilon
+        self.decay = decay
+        self.rates: dict[str, float] = {name: math.inf for name in names}
+        self.uses: dict[str, int] = {name: 0 for name in names}
+
+    def choose(self) -> str:
+        """
+        Pick the next operator.
+        """
+        if random.random() < self.epsilon:
+            return random.choice(self.names)
+
+        return max(self.names, key=lambda name: self.rates[name])
+
+    def update(self, name: str, improvement: float, microseconds: float) -> None:
+        """
+        Add the result of using operator `name` once.
+        """
+        rate = max(improvement, 0) / max(microseconds, 1)
+
+        if self.uses[name] == 0:
+            self.rates[name] = rate
+        else:
+            self.rates[name] = (1 - self.decay) * self.rates[name] + self.decay * rate
+        self.uses[name] += 1
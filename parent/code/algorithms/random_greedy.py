@@ -2,18 +2,22 @@
 import random
 import copy
 import numpy as np
+from typing import Iterator
 
 # Local imports
 from parent.code.algorithms.algorithm import Algorithm
 from parent.code.classes.railnl import RailNL
+from parent.code.classes.indexed_pool import IndexedPool
 from parent.code.classes.route import Route
 from parent.code.classes.station_class import Station
 
 
 class Random_Greedy(Algorithm):
     """
-    Initialize fresh Random_Greedy algorithm class with given maprange.
-    NOTE: make sure to reinitialize the class each time you run the algorithm.
+    Initialize Random_Greedy algorithm class with given maprange.
+    The object can be run as often as you like: tracking of used
+    connections and stations is reset at the start of every run, so the
+    network is only loaded once (see `reset` and `generate`).
 
     - Pre: Class of this method is initialized for either "Holland" or 
     "Nationaal" maprange.
@@ -23,12 +27,91 @@ class Random_Greedy(Algorithm):
         # Load RailNL data with given maprange
         self.load = RailNL(maprange)
         super().__init__(self.load)
-        
+
+        # Precompute templates for the tracking structures, so every 
+        # reset only has to copy them (instead of rebuilding them from 
+        # the RailNL object)
+        # (connection_list has a fixed order, so runs are reproducible
+        # with a fixed random seed)
+        connections: dict[tuple[str, str], tuple["Station", "Station"]] = dict()
+        for connection in self.load.connection_list:
+
+            # Save the names of the stations in this connection in a tuple
+            station_names_as_tuple = tuple(sorted([connection[0].name, 
+                                                   connection[1].name]))
+
+            # Add the connection to the dict with the station name tuple as key
+            connections[station_names_as_tuple] = connection
+
+        # Indexed pools give O(1) membership, removal and random choice
+        self.connection_template = IndexedPool(connections)
+        self.station_template = IndexedPool(
+            {station: station for station in self.load.stations.values()})
+
+        # Start off with fresh tracking structures
+        self.reset()
+
+
+    def reset(self) -> None:
+        """
+        Reset the tracking of used connections and stations, so the
+        algorithm can run again without reloading the network.
+
+        - Post: all connections and stations are marked as unused again.
+          Runs in O(E) by copying the precomputed templates.
+        """
+        self.used_connections: dict = dict()
+        self.unused_connections: IndexedPool = self.connection_template.copy()
+
+        self.unused_stations: IndexedPool = self.station_template.copy()
+        self.used_stations: list = list()
+
+
+    def mark_routes_as_used(self, routes: list[Route]) -> None:
+        """
+        Reset the tracking, then mark the connections and stations of
+        existing routes as used. Afterwards `create_a_route` builds a
+        route that extends this partial solution (e.g. to repair it).
+
+        - Pre: routes are made on the same map (they may come from
+          another RailNL object, stations are matched by name).
+        """
+        self.reset()
+
+        for route in routes:
+            for station_name in {name for connection in route.connections_used
+                                 for name in connection[:2]}:
+                station = self.load.station_list[self.load.station_index[station_name]]
+                if station in self.unused_stations:
+                    self.used_stations.append(self.unused_stations.pop(station))
+
+            for station1_name, station2_name, _ in route.connections_used:
+                self.set_as_used(None, None,
+                                 tuple(sorted([station1_name, station2_name])))
+
+
+    def generate(self, n: int, **run_kwargs) -> Iterator[list[Route]]:
+        """
+        Generate `n` solutions with the same object, by calling the run
+        method `n` times. Tracking structures are reset between runs.
+
+        - Pre: `run_kwargs` are valid keyword arguments for the run 
+          method.
+        - Post: yields `n` solutions (lists of routes), one at a time.
+
+        Example usage: 
+        `for solution in Random_Greedy("Holland").generate(1000): ...`
+        """
+        for _ in range(n):
+            yield self.run(**run_kwargs)
+
 
     def run(self,
             # Options per connection:
             # How to pick the next connection in the route
             next_connection_choice: str = "random", 
+            beam_width: int = 3,
+            beam_depth: int = 3,
             
             # Options for starting station per route:
             starting_stations: str = "fully_random", 
@@ -47,11 +130,10 @@ class Random_Greedy(Algorithm):
         options. Meant for running random-based tests and comparing
         various subsets of the total state space.
 
-        NOTE: make sure to reinitialize the class when running multiple
-        times.
+        Can be called multiple times on the same object: tracking of used
+        connections and stations is reset at the start of each run.
 
-        - Pre: run method is called on a fresh Random_Greedy object 
-        (i.e. this is the first time run is called on this object).
+        - Pre: Random_Greedy object is initialized with a valid maprange.
         
         - Post: Returns a list of routes (i.e. a solution).
 
@@ -61,8 +143,16 @@ class Random_Greedy(Algorithm):
         route):
         
         - next_connection_choice: Specify how to pick the next connection 
-        in the route. Options: "random" (default), or "shortest" for a
-        greedy approach to connections.
+        in the route. Options: "random" (default), "shortest" for a
+        greedy approach to connections, or "beam" for a lookahead: a beam
+        search over the next `beam_depth` connections picks the first
+        connection of the best partial route (scored by new connections
+        minus minutes). Routes end when no partial route within the
+        lookahead scores positive.
+
+        - beam_width, beam_depth: number of partial routes kept per 
+        level and number of connections looked ahead, for "beam" only.
+        Time per step grows with width x depth. Default 3 and 3.
         
 
         Options for starting station per route:
@@ -122,6 +212,11 @@ class Random_Greedy(Algorithm):
             original_connections_only = True
 
 
+        # Settings for "beam" are used deep inside create_a_route, so 
+        # save them on the object instead of passing them down
+        self.beam_width: int = beam_width
+        self.beam_depth: int = beam_depth
+
         # Check for correct input
         starting_station_list = self.check_input(final_number_of_routes, 
                         route_time_limit, next_connection_choice, 
@@ -190,8 +285,8 @@ class Random_Greedy(Algorithm):
 
 
         # Check for correct input for next_connection_choice
-        assert next_connection_choice in ["random", "shortest"], """
-        next_connection_choice must be set to 'random' or 'shortest'."""
+        assert next_connection_choice in ["random", "shortest", "beam"], """
+        next_connection_choice must be set to 'random', 'shortest' or 'beam'."""
 
         # Check for correct input for starting_stations
         assert starting_stations in ["fully_random",
@@ -347,25 +442,9 @@ class Random_Greedy(Algorithm):
         starting stations will be kept track of as well.
         """
         
-        # 1. Setup tracking of used connections:
-        self.used_connections: dict = dict()
-        
-        self.unused_connections: dict = dict()
-        for connection in self.load.connections:
-
-            # Save the names of the stations in this connection in a tuple
-            station_names_as_tuple = tuple(sorted([connection[0].name, 
-                                                   connection[1].name]))
-
-            # Add the connection to the dict with the station name tuple as key
-            self.unused_connections[station_names_as_tuple] = connection
-
-
-        # 2. Setup tracking of used stations:
-
-        # Internal list of stations
-        self.unused_stations: list = list(self.load.stations.values()) 
-        self.used_stations: list = list()
+        # 1. and 2. Setup tracking of used connections and stations 
+        # (copied from the precomputed templates)
+        self.reset()
 
 
         # 3. If starting_stations is set to "original_stations_only_soft",
@@ -463,11 +542,11 @@ class Random_Greedy(Algorithm):
 
             # Plan A: pick a random unused station
             if len(self.unused_stations) > 0:
-                current_station = random.choice(self.unused_stations)
+                current_station = self.unused_stations.random_choice()
             
             # Plan B: pick station with an unused connection
             else:
-                random_unused_connection = random.choice(list(self.unused_connections.values()))
+                random_unused_connection = self.unused_connections.random_choice()
                 random_index = random.choice([0, 1])
                 
                 current_station = random_unused_connection[random_index]   
@@ -502,6 +581,10 @@ class Random_Greedy(Algorithm):
             
         # Create a new route
         route = Route()
+
+        # Keep track of the connections in this route, so checking
+        # whether a connection is used in this route is O(1)
+        route_connection_keys: set[tuple[str, str]] = set()
         
         # While time is less than time_limit_this_route
         # i.e. for each connection in this route
@@ -509,33 +592,32 @@ class Random_Greedy(Algorithm):
             
             # First: move this station to used stations
             # (if already moved do nothing)
-            try:
-                index = self.unused_stations.index(current_station)
-                self.used_stations.append(self.unused_stations.pop(index))
-            except ValueError:
-                pass
+            if current_station in self.unused_stations:
+                self.used_stations.append(self.unused_stations.pop(current_station))
             
 
-            # Set next station (method depends on many parameters)
+            # Set next connection (method depends on many parameters)
             # Function returns "break" if no next station is possible
-            next_station: "Station" | str = self.set_next_station(
+            next_connection: tuple["Station", int, tuple[str, str]] | str = (
+                                            self.set_next_station(
                                             current_station,
                                             route,
                                             next_connection_choice,
                                             original_connections_only,
                                             chance_of_early_route_end,
-                                            time_limit_this_route)
-            if next_station == "break":
+                                            time_limit_this_route,
+                                            route_connection_keys))
+            if next_connection == "break":
                 break
             
+            next_station, duration, connection_key = next_connection
 
             # Add the connection to the route
-            route.add_connection(current_station, 
-                                    next_station, 
-                                    current_station.get_connection_time(next_station))
+            route.add_connection(current_station, next_station, duration)
+            route_connection_keys.add(connection_key)
 
             # Move the connection to used connections
-            self.set_as_used(current_station, next_station)
+            self.set_as_used(current_station, next_station, connection_key)
 
             # Set the next station as the current station
             current_station = next_station
@@ -549,70 +631,169 @@ class Random_Greedy(Algorithm):
                          next_connection_choice: str, 
                          original_connections_only: bool,
                          chance_of_early_route_end: bool,
-                         time_limit_this_route: int) -> "Station":
+                         time_limit_this_route: int,
+                         route_connection_keys: set[tuple[str, str]]
+                         ) -> tuple["Station", int, tuple[str, str]] | str:
         """
-        Choose the next station for the route, depending on the
-        parameters given.
+        Choose the next connection for the route, depending on the
+        parameters given. Returns a tuple of the next station, the 
+        duration and the connection key, or "break" if the route should
+        end here. `route_connection_keys` are the keys of the 
+        connections already in the route.
+
+        Uses the connections of the current station that are presorted 
+        by duration, so no list is copied, shuffled or sorted per step.
         """
         
-        # Get connections of current station, sorted by duration
-        # This is a queue of possible connections, with the shortest connection first
-        connections = current_station.get_connections()
-
-        # If chance_of_early_route_end is set to True, add a chance to 
-        # end the route early. This is done by adding a connection to the
-        # current station with a duration of 0 which when found will end 
-        # the route. connections must only contain tuples with station 
-        # and duration, otherwise bugs.
-        if chance_of_early_route_end:
-            connections.append(tuple([current_station, 0]))
-
-        # Randomize the order of the connections (to add random choice next connection)
-        # Only if the next_connection_choice is set to "random"
+        # Connections of current station, sorted by duration
+        connections = current_station.connections_sorted
+        time_left = time_limit_this_route - route.time
+
+        # Connections are sorted by duration, so the connections that fit
+        # within the time limit are the first n_fitting connections
+        n_fitting = current_station.count_connections_within(time_left)
+
         if next_connection_choice == "random":
-            random.shuffle(connections)
-        # If set to "shortest", sort by duration
+            
+            # Number of connections that can be chosen
+            if original_connections_only:
+                n_options = sum(1 for i in range(n_fitting) 
+                                if connections[i][2] not in route_connection_keys)
+            else:
+                n_options = n_fitting
+
+            # If chance_of_early_route_end is set to True, ending the 
+            # route here is one extra option (chosen with equal chance)
+            if chance_of_early_route_end:
+                choice = random.randrange(n_options + 1)
+                if choice == n_options:
+                    return "break"
+            
+            # If there are no options left, end this route
+            elif n_options == 0:
+                return "break"
+
+            else:
+                choice = random.randrange(n_options)
+
+            # Find the chosen connection (skipping used connections)
+            if not original_connections_only:
+                return connections[choice]
+            
+            for i in range(n_fitting):
+                if connections[i][2] not in route_connection_keys:
+                    if choice == 0:
+                        return connections[i]
+                    choice -= 1
+
+        # If set to "beam": look ahead to find the best connection
+        elif next_connection_choice == "beam":
+            return self.beam_search(current_station, 
+                                    time_left, 
+                                    self.beam_width, 
+                                    self.beam_depth,
+                                    route_connection_keys)
+
+        # If set to "shortest": take the shortest connection that fits
         else:
-            # Sort list by duration
-            connections.sort(key=lambda x: x[1])
-
-        # If arg. original_connections_only set to True
-        if original_connections_only:
-            # Pop used connections from queue (until unused connection is found)
-            while len(connections) > 0 and route.is_connection_used(current_station, connections[0][0]):
-                connections.pop(0)
-        
-        # If adding this connection would exceed the time limit, remove this connection
-        while len(connections) > 0 and route.time + connections[0][1] > time_limit_this_route:
-            connections.pop(0)
+            
+            # The early route end option is a connection with duration 0,
+            # so it comes first. With original_connections_only it counts
+            # as used (and is skipped) when the route already visits the
+            # current station, i.e. when the route has connections.
+            if chance_of_early_route_end and (not original_connections_only
+                                              or len(route.connections_used) == 0):
+                return "break"
+
+            # Cursor over the fitting connections, skipping used ones
+            for i in range(n_fitting):
+                if (not original_connections_only 
+                    or connections[i][2] not in route_connection_keys):
+                    return connections[i]
 
         # If there are no unused connections left, end this route
-        if len(connections) == 0:
-            return "break"
+        return "break"
 
-        # For chance_of_early_route_end, check if connection with duration of 0 is next
-        # This means the route will end here
-        if chance_of_early_route_end:
-            # If the connection has a duration of 0, end the route
-            if connections[0][1] == 0:
-                return "break"
 
+    def beam_search(self, current_station: "Station",
+                    time_left: int,
+                    beam_width: int,
+                    beam_depth: int,
+                    route_connection_keys: set[tuple[str, str]]
+                    ) -> tuple["Station", int, tuple[str, str]] | str:
+        """
+        Look ahead `beam_depth` connections from the current station and
+        return the first connection of the best partial route found, or
+        "break" if no partial route scores positive.
+
+        Partial routes are scored like the score function: each
+        connection that is not yet used in the solution is worth 
+        10000 / (number of connections), and every minute costs one 
+        point. Only the `beam_width` best partial routes are extended to
+        the next level. Connections already in this route (their keys in
+        `route_connection_keys`) are skipped (like 
+        original_connections_only).
+        """
+        value_per_connection = 10000 / len(self.connection_template)
+
+        # A partial route is a tuple of: score, time used, first 
+        # connection, last station and connection keys used
+        beam = [(0.0, 0, None, current_station, ())]
+        best_score, best_first_connection = 0.0, None
+
+        for _ in range(beam_depth):
+            candidates = []
+
+            # Extend every partial route with every connection that fits
+            for score, time_used, first_connection, station, keys in beam:
+                connections = station.connections_sorted
+                
+                for i in range(station.count_connections_within(time_left - time_used)):
+                    next_station, duration, key = connections[i]
+
+                    # Never use a connection twice in the same route
+                    if key in route_connection_keys or key in keys:
+                        continue
+
+                    # Coverage is only gained for unused connections
+                    gain = value_per_connection if key in self.unused_connections else 0
+
+                    candidates.append((score + gain - duration,
+                                       time_used + duration,
+                                       first_connection or connections[i],
+                                       next_station,
+                                       keys + (key,)))
+
+            if len(candidates) == 0:
+                break
+
+            # Keep the best partial routes
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            beam = candidates[:beam_width]
+
+            if beam[0][0] > best_score:
+                best_score, best_first_connection = beam[0][0], beam[0][2]
+
+        # End the route if there is nothing to gain within the lookahead
+        if best_first_connection is None:
+            return "break"
 
-        # First connection in queue is the next station
-        next_station = connections[0][0]
-        return next_station
+        return best_first_connection
 
 
     def set_as_used(self, current_station: "Station", 
-                    next_station: "Station") -> None:
+                    next_station: "Station",
+                    connection_key: tuple[str, str] | None = None) -> None:
         """
         Takes two stations and moves the connection between them from
         unused to used connections. Order of the stations does not
-        matter, connections are handled alphabetically.
+        matter, connections are handled alphabetically. The connection
+        key can be passed if it is already known.
         """
         
         # Extract dictionary key for the connection
-        connection_key = tuple(sorted([current_station.name, next_station.name]))
+        if connection_key is None:
+            connection_key = tuple(sorted([current_station.name, next_station.name]))
 
         # If key is currently set as unused: set as used
         if connection_key in self.unused_connections:
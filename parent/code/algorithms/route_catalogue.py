@@ -0,0 +1,466 @@
+# Library imports
+import math
+import sys
+import time
+import numpy as np
+
+# Local imports
+from parent.code.algorithms.algorithm import Algorithm
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+from parent.code.helpers.bounds import prefix_bound
+
+
+class Route_Catalogue(Algorithm):
+    """
+    Precomputed catalogue of routes, combined with a set cover solver.
+
+    On initialization, every route up to the time limit is enumerated
+    with a bounded depth-first search from every station. Routes are
+    stored compactly: as a bitmask of the connections they cover plus
+    their minutes (for every bitmask only the fastest route is kept).
+
+    The run method then picks the set of routes with the highest score:
+    greedy first, then local swaps, then (optionally) branch-and-bound.
+    With a complete catalogue of Holland (allow_repeated_connections=True,
+    maximal_only=False), branch-and-bound proves optimality (9210) in
+    about a minute.
+
+    - Pre: Class is initialized for either "Holland" or "Nationaal".
+    - Post: catalogue is built and ready to run.
+    """
+
+    def __init__(self, maprange: str = "Holland",
+                 route_time_limit: int | None = None,
+                 allow_repeated_connections: bool = False,
+                 maximal_only: bool = True) -> None:
+        """
+        Build the route catalogue.
+
+        Args:
+        - maprange: "Holland" or "Nationaal".
+        - route_time_limit: max minutes per route. Default is 120 for
+          Holland and 180 for Nationaal.
+        - allow_repeated_connections: if True, routes may use the same
+          connection more than once (needed for a complete catalogue,
+          but much larger; only feasible on Holland).
+        - maximal_only: if True, only keep routes that cannot be extended
+          within the time limit. Shorter routes can only beat them by
+          saving minutes on connections that other routes cover already,
+          so this is a good pruning for large maps. Set to False for a
+          complete catalogue.
+        """
+        # Load RailNL data with given maprange
+        self.load = RailNL(maprange)
+        super().__init__(self.load)
+
+        self.maprange = self.load.mapname
+        if route_time_limit is None:
+            route_time_limit = 120 if self.maprange == "Holland" else 180
+        self.route_time_limit = route_time_limit
+        self.allow_repeated_connections = allow_repeated_connections
+        self.maximal_only = maximal_only
+
+        self.n_connections: int = len(self.load.connection_list)
+        self.value_per_connection: float = 10000 / self.n_connections
+
+        # Bit of every connection key, duration of every connection
+        self.connection_bit: dict[tuple[str, str], int] = {
+            key: 1 << index for key, index in self.load.connection_index.items()}
+        self.durations: list[int] = [station1.connections[station2]
+                                     for station1, station2 in self.load.connection_list]
+
+        # Enumerate routes: masks[i] and minutes[i] describe route i
+        self.build_catalogue(maximal_only)
+        self.coverage: "np.ndarray | None" = None
+
+    def build_catalogue(self, maximal_only: bool) -> None:
+        """
+        Enumerate all routes with a depth-first search from every
+        station. A partial route is pruned when the same station was
+        already reached with the same covered connections in less or
+        equal time (nothing new can be found from there).
+
+        - Post: self.masks (list of int bitmasks) and self.minutes (numpy
+          array) contain every route in the catalogue. With repeated
+          connections, self.paths contains the stations of every route.
+        """
+        # Best time per (station, mask) label
+        best_time: dict[tuple[Station, int], int] = {}
+
+        # Fastest route per mask (and its stations, with repeated
+        # connections)
+        mask_minutes: dict[int, int] = {}
+        mask_path: dict[int, tuple[Station, ...]] = {}
+        path: list[Station] = []
+
+        def search(station: Station, mask: int, minutes: int) -> None:
+            label = (station, mask)
+            if best_time.get(label, math.inf) <= minutes:
+                return
+            best_time[label] = minutes
+            path.append(station)
+
+            extended = False
+            for next_station, duration, key in station.connections_sorted:
+                # Connections are sorted on duration
+                if minutes + duration > self.route_time_limit:
+                    break
+
+                bit = self.connection_bit[key]
+                if mask & bit and not self.allow_repeated_connections:
+                    continue
+
+                extended = True
+                search(next_station, mask | bit, minutes + duration)
+
+            # Save this route (if it is the fastest for these connections)
+            if mask and (not extended or not maximal_only):
+                if minutes < mask_minutes.get(mask, math.inf):
+                    mask_minutes[mask] = minutes
+                    if self.allow_repeated_connections:
+                        mask_path[mask] = tuple(path)
+
+            path.pop()
+
+        # Routes can get quite long, so the recursion limit is raised
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(recursion_limit, 10000))
+        try:
+            for station in self.load.station_list:
+                search(station, 0, 0)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.masks: list[int] = list(mask_minutes.keys())
+        self.minutes: "np.ndarray[int]" = np.array(list(mask_minutes.values()),
+                                                   dtype=np.int32)
+        self.paths: dict[int, tuple[Station, ...]] = mask_path
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def get_coverage(self) -> "np.ndarray[bool]":
+        """
+        Return the catalogue as a boolean matrix (route x connection),
+        for vectorised evaluation. Built on first call.
+        """
+        if self.coverage is None:
+            columns = []
+
+            # Unpack the bitmasks 64 connections at a time
+            for offset in range(0, self.n_connections, 64):
+                words = np.array([mask >> offset & 0xFFFFFFFFFFFFFFFF
+                                  for mask in self.masks], dtype=np.uint64)
+                bits = np.arange(min(64, self.n_connections - offset), dtype=np.uint64)
+                columns.append((words[:, None] >> bits) & np.uint64(1))
+
+            self.coverage = np.hstack(columns).astype(bool)
+
+        return self.coverage
+
+    def objective(self, chosen: list[int]) -> float:
+        """
+        Score of a set of catalogue routes (same formula as
+        calculate_score).
+        """
+        covered = 0
+        for i in chosen:
+            covered |= self.masks[i]
+
+        return (covered.bit_count() * self.value_per_connection
+                - 100 * len(chosen) - int(self.minutes[chosen].sum()))
+
+    def run(self, max_routes: int | None = None,
+            local_search: bool = True,
+            branch_and_bound: bool = False,
+            time_budget: float = 60.0) -> list[Route]:
+        """
+        Pick the set of catalogue routes with the highest score.
+
+        - Pre: catalogue is built.
+        - Post: returns the best found solution as a list of routes.
+          self.best_score contains its score, self.upper_bound a bound
+          on the best possible score with these routes, and
+          self.proven_optimal whether the solution is proven optimal.
+
+        Args:
+        - max_routes: max number of routes. Default is 7 for Holland and
+          20 for Nationaal.
+        - local_search: if True, improve the greedy solution with swaps.
+        - branch_and_bound: if True, search for the optimum with
+          branch-and-bound, starting from the best solution so far.
+        - time_budget: max seconds for branch-and-bound.
+        """
+        if max_routes is None:
+            max_routes = 7 if self.maprange == "Holland" else 20
+
+        chosen = self.greedy(max_routes)
+        if local_search:
+            chosen = self.improve_with_swaps(chosen, max_routes)
+
+        self.best_score: float = self.objective(chosen)
+        self.upper_bound: float = self.bound(0, 0, 0, 0.0, max_routes)
+        self.proven_optimal: bool = self.best_score >= self.upper_bound
+
+        if branch_and_bound and not self.proven_optimal:
+            chosen, completed = self.branch_and_bound(chosen, max_routes, time_budget)
+            self.best_score = self.objective(chosen)
+
+            # A complete search proves optimality
+            if completed:
+                self.proven_optimal = True
+                self.upper_bound = self.best_score
+
+        self.routes = [self.route_from_catalogue(i) for i in chosen]
+        return self.routes
+
+    def greedy(self, max_routes: int) -> list[int]:
+        """
+        Repeatedly add the route with the highest gain in score (newly
+        covered connections minus minutes and route cost), as long as
+        that gain is positive.
+        """
+        coverage = self.get_coverage()
+        uncovered = np.ones(self.n_connections, dtype=bool)
+        chosen: list[int] = []
+
+        while len(chosen) < max_routes and uncovered.any():
+            gains = (coverage[:, uncovered].sum(axis=1) * self.value_per_connection
+                     - 100 - self.minutes)
+            best = int(np.argmax(gains))
+
+            if gains[best] <= 0:
+                break
+
+            chosen.append(best)
+            uncovered &= ~coverage[best]
+
+        return chosen
+
+    def improve_with_swaps(self, chosen: list[int], max_routes: int) -> list[int]:
+        """
+        Local search: remove routes that cost more than they add, and
+        replace every route by the best route in the catalogue given the
+        other routes (or add a route, if there is room), until no move
+        improves the score.
+        """
+        coverage = self.get_coverage()
+        chosen = list(chosen)
+        improved = True
+
+        while improved:
+            improved = False
+
+            # Number of chosen routes covering every connection
+            counts = coverage[chosen].sum(axis=0)
+
+            for position, route in enumerate(chosen):
+                # Connections that are uncovered without this route
+                without = counts - coverage[route]
+                uncovered = without == 0
+
+                # Value of this route, and of the best replacement
+                current_gain = (coverage[route, uncovered].sum() * self.value_per_connection
+                                - 100 - self.minutes[route])
+                gains = (coverage[:, uncovered].sum(axis=1) * self.value_per_connection
+                         - 100 - self.minutes)
+                best = int(np.argmax(gains))
+
+                # Remove the route if it costs more than it adds
+                if current_gain < 0 and gains[best] <= 0:
+                    chosen.pop(position)
+                    improved = True
+                    break
+
+                # Or replace it by a better one
+                if gains[best] > current_gain + 1e-9:
+                    chosen[position] = best
+                    improved = True
+                    break
+
+            # Add a route if there is room and it helps
+            if not improved and len(chosen) < max_routes:
+                uncovered = coverage[chosen].sum(axis=0) == 0
+                gains = (coverage[:, uncovered].sum(axis=1) * self.value_per_connection
+                         - 100 - self.minutes)
+                best = int(np.argmax(gains))
+
+                if gains[best] > 1e-9:
+                    chosen.append(best)
+                    improved = True
+
+        return chosen
+
+    def bound(self, covered: int, excluded: int, n_routes: int,
+              score: float, max_routes: int) -> float:
+        """
+        Upper bound on the score that can be reached from a partial
+        solution (`covered` connections, `n_routes` routes, current
+        `score`), when connections in `excluded` will never be covered.
+
+        Every newly covered connection costs at least its own duration,
+        and new routes are needed for at least all those minutes (see
+        helpers.bounds.prefix_bound).
+        """
+        available = [duration for connection, duration in enumerate(self.durations)
+                     if not (covered | excluded) >> connection & 1]
+
+        return score + prefix_bound(available, self.route_time_limit,
+                                    max_routes - n_routes, self.value_per_connection)
+
+    def branch_and_bound(self, chosen: list[int], max_routes: int,
+                         time_budget: float) -> tuple[list[int], bool]:
+        """
+        Depth-first branch-and-bound. In every node, the uncovered
+        connection that is in the fewest catalogue routes is either
+        covered by one of those routes, or excluded for good. Nodes whose
+        upper bound (see `bound`) is not better than the best solution so
+        far are pruned.
+
+        Routes are only added when they gain score. With a complete
+        catalogue (not maximal_only), the first and last connection of
+        every route must also be covered by that route only: otherwise
+        the same route without that connection (which is also in the
+        catalogue) would be better.
+
+        Returns the best solution found, and whether the search was
+        completed within `time_budget` seconds (i.e. the solution is
+        proven optimal for this catalogue).
+        """
+        # Routes containing every connection, best standalone gain first
+        standalone = np.array([mask.bit_count() for mask in self.masks]) \
+            * self.value_per_connection - 100 - self.minutes
+        coverage = self.get_coverage()
+        connection_routes = [
+            sorted(np.flatnonzero(coverage[:, connection]).tolist(),
+                   key=lambda route: -standalone[route])
+            for connection in range(self.n_connections)]
+
+        # First and last connection of every route (as bitmask)
+        if self.maximal_only:
+            end_connections = [0] * len(self.masks)
+        else:
+            end_connections = [self.end_connections(route) for route in range(len(self.masks))]
+
+        best = {"score": self.objective(chosen), "chosen": list(chosen)}
+        deadline = time.time() + time_budget
+        all_connections = (1 << self.n_connections) - 1
+
+        def search(covered: int, excluded: int, current: list[int],
+                   score: float, ends: int = 0) -> None:
+            if time.time() > deadline:
+                raise TimeoutError
+
+            if score > best["score"]:
+                best["score"], best["chosen"] = score, list(current)
+
+            if len(current) == max_routes:
+                return
+            if self.bound(covered, excluded, len(current), score, max_routes) <= best["score"]:
+                return
+
+            # Branch on the open connection with the fewest routes
+            open_connections = all_connections & ~(covered | excluded)
+            if open_connections == 0:
+                return
+            connection = min((c for c in range(self.n_connections)
+                              if open_connections >> c & 1),
+                             key=lambda c: len(connection_routes[c]))
+
+            for route in connection_routes[connection]:
+                mask = self.masks[route]
+                if mask & excluded:
+                    continue
+
+                # Ends must not overlap with the other routes
+                if end_connections[route] & covered or mask & ends:
+                    continue
+
+                gain = ((mask & ~covered).bit_count() * self.value_per_connection
+                        - 100 - int(self.minutes[route]))
+                if gain <= 0:
+                    continue
+
+                current.append(route)
+                search(covered | mask, excluded, current, score + gain,
+                       ends | end_connections[route])
+                current.pop()
+
+            # Or never cover this connection
+            search(covered, excluded | 1 << connection, current, score, ends)
+
+        try:
+            search(0, 0, [], 0.0)
+            completed = True
+        except TimeoutError:
+            completed = False
+
+        return best["chosen"], completed
+
+    def stations_of(self, index: int) -> list[Station]:
+        """
+        Return the stations of catalogue route `index`, in order.
+        """
+        mask = self.masks[index]
+
+        if self.allow_repeated_connections:
+            return list(self.paths[mask])
+
+        return self.trail_from_mask(mask)
+
+    def end_connections(self, index: int) -> int:
+        """
+        Return the first and last connection of catalogue route `index`
+        as a bitmask.
+        """
+        stations = self.stations_of(index)
+        first = tuple(sorted([stations[0].name, stations[1].name]))
+        last = tuple(sorted([stations[-2].name, stations[-1].name]))
+        return self.connection_bit[first] | self.connection_bit[last]
+
+    def route_from_catalogue(self, index: int) -> Route:
+        """
+        Turn catalogue route `index` into a Route object.
+        """
+        stations = self.stations_of(index)
+
+        route = Route()
+        for station1, station2 in zip(stations, stations[1:]):
+            route.add_connection(station1, station2, station1.connections[station2])
+        return route
+
+    def trail_from_mask(self, mask: int) -> list[Station]:
+        """
+        Find the order of stations of a route that uses every connection
+        in `mask` exactly once (an Euler trail, Hierholzer's algorithm).
+        """
+        connections = [self.load.connection_list[c] for c in range(self.n_connections)
+                       if mask >> c & 1]
+
+        adjacency: dict[Station, list[tuple[Station, int]]] = {}
+        for index, (station1, station2) in enumerate(connections):
+            adjacency.setdefault(station1, []).append((station2, index))
+            adjacency.setdefault(station2, []).append((station1, index))
+
+        # Start at a station with an odd number of connections, if any
+        start = next((station for station, neighbours in adjacency.items()
+                      if len(neighbours) % 2 == 1), connections[0][0])
+
+        used = [False] * len(connections)
+        stack, trail = [start], []
+        while stack:
+            station = stack[-1]
+            while adjacency[station] and used[adjacency[station][-1][1]]:
+                adjacency[station].pop()
+
+            if adjacency[station]:
+                next_station, index = adjacency[station].pop()
+                used[index] = True
+                stack.append(next_station)
+            else:
+                trail.append(stack.pop())
+
+        trail.reverse()
+        return trail
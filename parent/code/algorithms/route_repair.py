@@ -0,0 +1,219 @@
+# Internal imports:
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.station_class import Station
+
+
+class Route_Repair:
+    """
+    Best single route given the coverage of the other routes (an
+    orienteering problem): the route within the time limit with the most
+    value, where value = newly covered connections * 10000 / E - minutes.
+
+    Exact depth-first search over the order in which new (uncovered)
+    connections are ridden:
+    - the best route starts and ends with a new connection (otherwise
+      dropping the first or last connection is better), and between two
+      new connections it takes a shortest path (any other way takes at
+      least as long). So every step of the search rides a shortest path
+      to a new connection, then the connection itself;
+    - two partial routes at the same station that covered the same new
+      connections: only the faster one is continued (memo over station
+      and covered signature, keeping the least time);
+    - a partial route is cut off when even riding every new connection
+      it can still reach in time (by shortest-path distance) can not
+      beat the best route found.
+
+    With original_connections_only, routes whose shortest paths ride a
+    connection twice are skipped, so then the result is not always the
+    best route.
+
+    `max_nodes` limits the search; if it is reached the best route found
+    so far is returned and `self.exact` is False.
+    """
+
+    def __init__(self, load: RailNL, route_time_limit: int,
+                 original_connections_only: bool = False,
+                 max_nodes: int = 20000) -> None:
+        self.load = load
+        self.route_time_limit = route_time_limit
+        self.original_connections_only = original_connections_only
+        self.max_nodes = max_nodes
+
+        self.n_connections = len(load.connection_list)
+        self.value_per_connection = 10000 / load.map_connections
+
+        # Both ends and the minutes of every connection
+        self.ends = [(load.station_index[station1.name], load.station_index[station2.name])
+                     for station1, station2 in load.connection_list]
+        self.durations = [int(station1.connections[station2])
+                          for station1, station2 in load.connection_list]
+
+        # Minutes of the shortest path between every two stations
+        self.distances = load.get_shortest_paths()[0].tolist()
+        self.exact = True
+        self.nodes = 0
+
+    def best_route(self, covered: set[int],
+                   minimum_value: float = 0.0) -> tuple[list[Station], float]:
+        """
+        Best route given the connections `covered` by the other routes
+        (connection indices, see RailNL.connection_index).
+
+        - Post: returns the route as a list of stations and its value
+          (without the 100 points a route costs). An empty list (value
+          `minimum_value`) if no route has a higher value than
+          `minimum_value`. A higher minimum (e.g. the value of the route
+          that is replaced) makes the search much faster.
+        """
+        uncovered = [edge for edge in range(self.n_connections)
+                     if edge not in covered
+                     and self.durations[edge] <= self.route_time_limit
+                     and self.durations[edge] < self.value_per_connection]
+
+        # Shortest connections first: most value per minute
+        uncovered.sort(key=lambda edge: self.durations[edge])
+        self.uncovered = uncovered
+        self.bit = {edge: 1 << position for position, edge in enumerate(uncovered)}
+
+        # Least minutes every new connection takes: riding it, and getting
+        # there from the end of another new connection (after the first,
+        # every new connection of a route is reached from an earlier one,
+        # or from where the route is now)
+        self.weight = {}
+        for edge in uncovered:
+            approach = min((self.distances[station][end]
+                            for other in uncovered if other != edge
+                            for station in self.ends[other] for end in self.ends[edge]),
+                           default=self.route_time_limit)
+            self.weight[edge] = self.durations[edge] + approach
+
+        # Most value per minute first (for the bound)
+        self.by_ratio = sorted(uncovered, key=lambda edge: -(self.value_per_connection
+                                                             - self.durations[edge])
+                                                           / max(self.weight[edge], 1))
+
+        self.best: tuple[float, list[tuple[int, int]]] = (minimum_value, [])
+        self.memo: dict[tuple[int, int], int] = {}
+        self.exact = True
+        self.nodes = 0
+
+        for edge in uncovered:
+            for start, end in (self.ends[edge], self.ends[edge][::-1]):
+                self.search(end, self.durations[edge], self.bit[edge], [(start, end)])
+
+        if not self.best[1]:
+            return [], minimum_value
+        path = self.path_of(self.best[1])
+        return path, self.value_of(path)
+
+    def bound(self, station: int, minutes: int, mask: int) -> float:
+        """
+        Most value that can still be added: every new connection that
+        can be reached and ridden within the time left, at the value of
+        the connection minus its own minutes. Each takes the minutes to
+        ride it plus the least minutes to get there from another new
+        connection or from here (fractional knapsack over the time left,
+        in a fixed order of value per minute).
+        """
+        time_left = self.route_time_limit - minutes
+        capacity = time_left
+        distances = self.distances[station]
+        bound = 0.0
+
+        for edge in self.by_ratio:
+            if mask & self.bit[edge]:
+                continue
+            i, j = self.ends[edge]
+            duration = self.durations[edge]
+            reach = min(distances[i], distances[j])
+            if reach + duration > time_left:
+                continue
+
+            # The first next connection may be reached from here
+            weight = min(self.weight[edge], reach + duration)
+            gain = self.value_per_connection - duration
+            if weight <= capacity:
+                bound += gain
+                capacity -= weight
+            else:
+                return bound + gain * capacity / max(weight, 1)
+        return bound
+
+    def search(self, station: int, minutes: int, mask: int,
+               sequence: list[tuple[int, int]]) -> None:
+        """
+        Depth-first search from a partial route that ends at `station`
+        after `minutes`, with the new connections in `mask` (bits of
+        self.uncovered) ridden in the order of `sequence`.
+        """
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            self.exact = False
+            return
+
+        value = bin(mask).count("1") * self.value_per_connection - minutes
+        if value > self.best[0]:
+            # With original connections only, the shortest paths in
+            # between may not ride a connection twice
+            if not self.original_connections_only or self.is_original(sequence):
+                self.best = (value, list(sequence))
+
+        # Only continue the fastest partial route per station and signature
+        if self.memo.get((station, mask), self.route_time_limit + 1) <= minutes:
+            return
+        self.memo[(station, mask)] = minutes
+
+        if value + self.bound(station, minutes, mask) <= self.best[0]:
+            return
+
+        # Next new connection: shortest path to one of its ends, then ride it
+        distances = self.distances[station]
+        moves = []
+        for edge in self.uncovered:
+            if mask & self.bit[edge]:
+                continue
+            for start, end in (self.ends[edge], self.ends[edge][::-1]):
+                cost = distances[start] + self.durations[edge]
+                if minutes + cost <= self.route_time_limit:
+                    moves.append((cost, start, end, edge))
+
+        for cost, start, end, edge in sorted(moves):
+            sequence.append((start, end))
+            self.search(end, minutes + cost, mask | self.bit[edge], sequence)
+            sequence.pop()
+
+    def path_of(self, sequence: list[tuple[int, int]]) -> list[Station]:
+        """
+        Stations of a route that rides the connections of `sequence` in
+        order, with shortest paths in between.
+        """
+        if not sequence:
+            return []
+
+        path = [sequence[0][0]]
+        for start, end in sequence:
+            # Take the shortest path to the start of the next connection
+            path += self.load.shortest_path(path[-1], start)[1:]
+            path.append(end)
+
+        return [self.load.station_list[station] for station in path]
+
+    def is_original(self, sequence: list[tuple[int, int]]) -> bool:
+        """
+        Whether the route of `sequence` rides every connection only once.
+        """
+        path = self.path_of(sequence)
+        keys = [tuple(sorted((station1.name, station2.name)))
+                for station1, station2 in zip(path, path[1:])]
+        return len(keys) == len(set(keys))
+
+    def value_of(self, path: list[Station]) -> float:
+        """
+        Value of a route: its new connections (counted once) minus its
+        minutes.
+        """
+        new = {self.load.connection_index[tuple(sorted((station1.name, station2.name)))]
+               for station1, station2 in zip(path, path[1:])} & set(self.uncovered)
+        minutes = sum(int(station1.connections[station2])
+                      for station1, station2 in zip(path, path[1:]))
+        return len(new) * self.value_per_connection - minutes
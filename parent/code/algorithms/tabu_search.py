@@ -0,0 +1,215 @@
+# External imports:
+import random
+from collections import OrderedDict
+
+import numpy as np
+
+# Internal imports:
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.operators import route_from_path
+from parent.code.classes.coverage import Coverage_Array, canonical_route
+from parent.code.classes.route import Route
+from parent.code.helpers.bounds import optimality_gap, upper_bound as map_upper_bound
+from parent.code.helpers.csv_helpers import append_scores_to_csv
+from parent.code.helpers.score import calculate_score
+
+
+class Tabu_List:
+    """
+    Routes that are tabu, by canonical route (see canonical_route): a
+    route stays tabu for `tenure` iterations, and at most `size` routes
+    are kept (the oldest are forgotten first).
+    """
+
+    def __init__(self, tenure: int, size: int) -> None:
+        self.tenure = tenure
+        self.size = size
+        self.expires: OrderedDict[tuple[str, ...], int] = OrderedDict()
+
+    def add(self, route: tuple[str, ...], iteration: int) -> None:
+        """
+        Make a route tabu from this iteration on.
+        """
+        self.expires.pop(route, None)
+        self.expires[route] = iteration + self.tenure
+        while len(self.expires) > self.size:
+            self.expires.popitem(last=False)
+
+    def is_tabu(self, route: tuple[str, ...], iteration: int) -> bool:
+        """
+        Whether a route is still tabu in this iteration.
+        """
+        return self.expires.get(route, -1) > iteration
+
+
+class Tabu_Search(Hillclimber):
+    """Tabu search to optimize train routes.
+
+    Same move as the Hillclimber: a random route is replaced by a new
+    random route (or a route is added, if there is room). Every
+    iteration a neighbourhood of such moves is scored (with delta
+    scoring, see Coverage_Array) and the best move that is not tabu is
+    made, also if it is worse. Routes that were just removed may not
+    come back, and routes that were just added may not be removed, for
+    `tenure` iterations. A tabu move is still allowed if it gives a new
+    best score (aspiration). This way the search does not cycle between
+    the same few solutions.
+
+    Same constructor and run arguments as Hillclimber, so it can replace
+    Hillclimber in autorun_hillclimber.
+    """
+
+    def run(self, iterations: int,
+            simulated_annealing: bool = False,
+            cap=10**99,
+            improve_routes: bool = True,
+            original_connections_only: bool = False,
+            gap_threshold: float | None = None,
+            upper_bound: float | None = None,
+            tenure: int = 10,
+            tabu_size: int = 50,
+            neighbourhood_size: int = 16,
+
+            log_csv: str | None = None,
+            print_every_improvement: bool = True) -> list[Route]:
+        """
+        Run tabu search for a specified number of iterations.
+
+        Post: returns the best solution found.
+
+        Args:
+
+        Algorithm settings (same as Hillclimber.run):
+        - iterations, cap, improve_routes, original_connections_only,
+          gap_threshold, upper_bound. `cap` counts iterations without a
+          new best score. `simulated_annealing` is ignored: tabu search
+          always makes the best allowed move.
+
+        Tabu settings:
+        - tenure: number of iterations a removed or added route stays
+          tabu.
+        - tabu_size: max number of routes on the tabu list.
+        - neighbourhood_size: number of moves scored per iteration.
+
+        Data collection settings (same as Hillclimber.run):
+        - log_csv, print_every_improvement. The score of the current
+          solution is logged every iteration.
+        """
+        self.iterations = iterations
+        self.cap = cap
+        self.original_connections_only = original_connections_only
+        max_routes = 7 if self.maprange == "Holland" else 20
+
+        self.start_score = self.best_score
+        print(f"start score: {self.start_score}")
+
+        # Upper bound for the optimality gap
+        if upper_bound is None and gap_threshold is not None:
+            upper_bound = map_upper_bound(self.maprange)
+        self.upper_bound = upper_bound
+
+        if improve_routes:
+            self.routes = self.improve_routes(self.routes)
+            print(f"improved start score: {calculate_score(self.routes, self.maprange)}")
+
+        self.routes = self.routes_on_this_map(self.routes)
+        current = Coverage_Array(self.routes, self.load)
+        current_score = current.score()
+        self.best_score = current_score
+        best_paths = list(current.paths)
+
+        self.tabu_list = Tabu_List(tenure, tabu_size)
+        self.tabu_rejections = 0
+        self.aspirations = 0
+
+        count_no_change = 0
+        for i in range(self.iterations):
+            # If the gap to the upper bound is small enough, stop
+            if (gap_threshold is not None and
+                optimality_gap(self.best_score, upper_bound) <= gap_threshold + 1e-9):
+                print(f"Gap to upper bound {upper_bound} below threshold")
+                break
+
+            # Score the neighbourhood
+            n_choices = len(current.paths) + (len(current.paths) < max_routes)
+            indices = [random.randrange(n_choices) for _ in range(neighbourhood_size)]
+            new_paths = [self.generate_random_route().stations for _ in range(neighbourhood_size)]
+            deltas = current.batch_delta(indices, new_paths)
+
+            # Best move that is not tabu, or that gives a new best score
+            move = self.choose_move(current, indices, new_paths, deltas, current_score, i)
+
+            if move is not None:
+                index, new_path, removed = move
+                current.replace(index, new_path)
+                n_routes = len(current.paths)
+                if improve_routes and len(new_path) > 1:
+                    current.trim_redundant(index)
+                current_score = current.score()
+
+                # The removed route may not come back, the added route
+                # may not be removed (unless trimming removed it already)
+                if removed is not None:
+                    self.tabu_list.add(removed, i)
+                if len(new_path) > 1 and len(current.paths) == n_routes:
+                    self.tabu_list.add(canonical_route(current.paths[index]), i)
+
+            if current_score > self.best_score:
+                self.best_score = current_score
+                best_paths = list(current.paths)
+                count_no_change = 0
+                if print_every_improvement:
+                    print(f"iteratie {i}, score {current_score}")
+            else:
+                count_no_change += 1
+
+            self.scores.append(current_score)
+
+            # If there has been no new best for too many iterations, stop
+            if self.cap < self.iterations and count_no_change == self.cap:
+                print("Too long no change")
+                break
+
+        self.routes = [route_from_path(path) for path in best_paths]
+
+        # When done:
+        # If set, log score per iteration to csv file
+        if log_csv is not None:
+            append_scores_to_csv(self.scores, log_csv, custom_file_path=True)
+
+        # Print summary
+        print(f"Start score: {self.start_score}, End score: {self.best_score}")
+        print(f"Tabu moves skipped: {self.tabu_rejections}, aspirations: {self.aspirations}")
+        if self.upper_bound is not None:
+            self.gap = optimality_gap(self.best_score, self.upper_bound)
+            print(f"Upper bound: {self.upper_bound}, gap: {self.gap:.2%}")
+
+        return self.routes
+
+    def choose_move(self, current: Coverage_Array, indices: list[int],
+                    new_paths: list[list], deltas: np.ndarray, current_score: float,
+                    iteration: int) -> tuple[int, list, tuple[str, ...] | None] | None:
+        """
+        The best move of the neighbourhood that is not tabu, or that
+        gives a new best score (aspiration). Move k replaces the route at
+        `indices[k]` by `new_paths[k]` and changes the score by 
+        `deltas[k]`.
+
+        - Post: returns (index, new path, canonical removed route), or
+          None if all moves are tabu.
+        """
+        for k in sorted(range(len(indices)), key=lambda k: -deltas[k]):
+            index, new_path = indices[k], new_paths[k]
+            removed = canonical_route(current.paths[index]) if index < len(current.paths) else None
+            added = canonical_route(new_path) if len(new_path) > 1 else None
+
+            if ((removed is not None and self.tabu_list.is_tabu(removed, iteration))
+                    or (added is not None and self.tabu_list.is_tabu(added, iteration))):
+                if current_score + deltas[k] <= self.best_score:
+                    self.tabu_rejections += 1
+                    continue
+                self.aspirations += 1
+
+            return index, new_path, removed
+
+        return None
@@ -1,19 +1,29 @@
+import contextlib
+import io
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 from parent.code.classes.route import Route
+from parent.code.classes.railnl import RailNL
 from parent.code.algorithms.random_greedy import Random_Greedy
 from parent.code.algorithms.hillclimber import Hillclimber
 from parent.code.helpers.csv_helpers import write_solution_to_csv, append_single_score_to_csv
 from parent.code.helpers.score import calculate_score
+from parent.code.helpers.bounds import optimality_gap, upper_bound
+from parent.code.classes.elite_archive import Elite_Archive
+from parent.code.algorithms.island_model import Migrant, from_migrant, to_migrant
 
 
 # This function sets parameters for the start state and execution of the
 # Hillclimber algorithm. Feel free to adjust these parameters to your
 # liking.
-def run_hillclimber(maprange: str, project_dir: str, demo_mode: bool) -> list[Route]:
+def autorun_settings(maprange: str) -> tuple[dict, dict]:
     """
-    Set a start state, run the Hillclimber algorithm and return the
-    solution.
+    Parameters of the start state (Random_Greedy.run) and of the
+    Hillclimber (Hillclimber.run) per map, as keyword arguments.
     """
     # Set Hillclimber parameters based on maprange
     if maprange == "Holland":
@@ -38,33 +48,170 @@ def run_hillclimber(maprange: str, project_dir: str, demo_mode: bool) -> list[Ro
         improve_routes = True
         original_connections_only = True
         
+    # How Random_Greedy picks connections for the start state: "random"
+    # (what our settings were tuned with), or "beam" for much stronger 
+    # start states (see Random_Greedy.run, also for beam width / depth)
+    next_connection_choice = "random"
+
+    start_state_settings = {"next_connection_choice": next_connection_choice,
+                            "starting_stations": "original_stations_only_hard",
+                            "final_number_of_routes": final_number_of_routes,
+                            "route_time_limit": route_time_limit}
+    hillclimber_settings = {"iterations": iterations,
+                            "simulated_annealing": True,
+                            "cap": cap,
+                            "improve_routes": improve_routes,
+                            "original_connections_only": original_connections_only}
+    return start_state_settings, hillclimber_settings
+
+
+def run_hillclimber(maprange: str, 
+                    project_dir: str, 
+                    demo_mode: bool,
+                    start_state_generator: Random_Greedy | None = None,
+                    gap_threshold: float | None = 0.0,
+                    algorithm_class: type[Hillclimber] = Hillclimber,
+                    elite_archive: Elite_Archive | None = None,
+                    start_state: list[Route] | None = None
+                    ) -> list[Route]:
+    """
+    Set a start state, run the Hillclimber algorithm and return the
+    solution. If `start_state_generator` is given, that Random_Greedy
+    object is reused to create the start state (instead of loading the 
+    map again). The run stops early once the gap to the upper bound is
+    at most `gap_threshold` (see Hillclimber.run). `algorithm_class` is
+    Hillclimber or a drop-in alternative with the same arguments (e.g.
+    ALNS, or ACO, which is made with its `from_start_state`). If
+    `start_state` is given (e.g. a screened start state, see
+    screen_start_states), the run starts from it. Otherwise, if
+    `elite_archive` is given and not empty, the run starts from a
+    solution sampled from the archive instead of a Random_Greedy start
+    state. The run publishes its improvements to the archive
+    (Hillclimber only).
+    """
+    start_state_settings, hillclimber_settings = autorun_settings(maprange)
+
     # If demo mode is enabled, reduce the number of iterations drastically
     if demo_mode:
-        iterations = 600
+        hillclimber_settings["iterations"] = 600
 
     # Set a start state based on our found heuristics
-    start_state: list[Route] = Random_Greedy(maprange).run(
-                    starting_stations="original_stations_only_hard",
-                    final_number_of_routes = final_number_of_routes,
-                    route_time_limit = route_time_limit)
+    if start_state_generator is None:
+        start_state_generator = Random_Greedy(maprange)
+    
+    if start_state is None and elite_archive is not None:
+        start_state = elite_archive.sample(start_state_generator.load)
+    if start_state is None:
+        start_state = start_state_generator.run(**start_state_settings)
+
+    # Only pass the archive on if it is used (other algorithm classes do
+    # not have this argument)
+    archive_argument = {} if elite_archive is None else {"elite_archive": elite_archive}
 
     # Run the Hillclimber algorithm and save solution, also log progress
-    hillclimber_alg = Hillclimber(start_state, maprange)
-    solution: list[Route] = hillclimber_alg.run(iterations = iterations,
-                                log_csv=f"{project_dir}/log.csv",
-                                simulated_annealing=True,
-                                cap = cap,
-                                improve_routes = improve_routes,
-                                original_connections_only = original_connections_only)
+    if hasattr(algorithm_class, "from_start_state"):
+        hillclimber_alg = algorithm_class.from_start_state(start_state, maprange)
+    else:
+        hillclimber_alg = algorithm_class(start_state, maprange)
+    solution: list[Route] = hillclimber_alg.run(log_csv=f"{project_dir}/log.csv",
+                                gap_threshold = gap_threshold,
+                                **hillclimber_settings,
+                                **archive_argument)
 
     return solution
 
 
+# Random_Greedy of the screening worker process
+_screen_generator: Random_Greedy | None = None
+
+
+def _screen_worker(task: tuple[str, Migrant | None, int, int]) -> tuple[Migrant, float]:
+    """
+    One candidate of screen_start_states in a worker process: make a
+    start state (if `migrant` is None), then continue it with a short
+    Hillclimber burst of `iterations` iterations, without printing.
+
+    - Post: returns the candidate after the burst and its score.
+    """
+    global _screen_generator
+    maprange, migrant, iterations, seed = task
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+
+    start_state_settings, hillclimber_settings = autorun_settings(maprange)
+    if _screen_generator is None or _screen_generator.load.mapname != maprange:
+        _screen_generator = Random_Greedy(maprange)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if migrant is None:
+            routes = _screen_generator.run(**start_state_settings)
+        else:
+            routes = from_migrant(migrant, _screen_generator.load)
+
+        hillclimber_settings["iterations"] = iterations
+        hillclimber = Hillclimber(routes, maprange)
+        routes = hillclimber.run(print_every_improvement=False, **hillclimber_settings)
+
+    return to_migrant(routes), calculate_score(routes, maprange)
+
+
+def screen_start_states(maprange: str,
+                        n_keep: int,
+                        n_candidates: int = 256,
+                        burst_iterations: int = 50,
+                        eta: int = 2,
+                        n_workers: int | None = None,
+                        seed: int | None = None
+                        ) -> list[list[Route]]:
+    """
+    Pick promising start states by successive halving: make
+    `n_candidates` start states (with the settings of autorun_settings),
+    give every candidate a Hillclimber burst of `burst_iterations`
+    iterations, keep the best 1 / `eta` and give those a burst `eta`
+    times as long (continuing where they were), and so on until at most
+    `n_keep` candidates are left. Every round costs about the same 
+    number of iterations, so most of the work goes to the best 
+    candidates. Candidates are run in parallel over `n_workers` 
+    processes (default: the number of CPUs). Candidate i of round r
+    uses random seed `seed` + r * n_candidates + i (default: a random
+    `seed`).
+
+    - Post: returns the `n_keep` best candidates (after their bursts),
+      best first.
+    """
+    seed = seed if seed is not None else random.randrange(2**31)
+    candidates: list[Migrant | None] = [None] * max(n_candidates, n_keep)
+    iterations = burst_iterations
+    round_number = 0
+
+    with ProcessPoolExecutor(n_workers) as pool:
+        while True:
+            tasks = [(maprange, candidate, iterations, seed + round_number * n_candidates + i)
+                     for i, candidate in enumerate(candidates)]
+            outcomes = sorted(pool.map(_screen_worker, tasks), key=lambda outcome: -outcome[1])
+            print(f"Screening round {round_number}: {len(candidates)} candidates,",
+                  f"{iterations} iterations each, best {outcomes[0][1]},",
+                  f"median {outcomes[len(outcomes) // 2][1]}")
+
+            if len(outcomes) <= n_keep:
+                break
+            candidates = [migrant for migrant, _ in outcomes[:max(n_keep, len(outcomes) // eta)]]
+            iterations *= eta
+            round_number += 1
+
+    load = RailNL(maprange)
+    return [from_migrant(migrant, load) for migrant, _ in outcomes[:n_keep]]
+
+
 def autorun_hillclimber(n_runs: int, 
                         project_name: str,
                         maprange: str = "Holland", 
                         allow_overwrite: bool = False,
-                        demo_mode: bool = False
+                        demo_mode: bool = False,
+                        gap_threshold: float | None = 0.0,
+                        algorithm_class: type[Hillclimber] = Hillclimber,
+                        elite_archive: str | None = None,
+                        screening_candidates: int | None = None
                         ):
     """
     Run the Hillclimber algorithm for a specified number of runs, and
@@ -87,6 +234,32 @@ def autorun_hillclimber(n_runs: int,
             algorithm in demo mode (for testing purposes). If true, the
             number of iterations per run is drastically reduced.
             Defaults to False.
+
+        - gap_threshold (float, optional): Stop a run early once the
+            relative gap between its score and the upper bound of the map
+            is at most this value (0: stop when proven optimal, None: 
+            never stop early). The gap of every run is reported. Defaults
+            to 0.
+
+        - algorithm_class (optional): Hillclimber (default) or a drop-in
+            alternative with the same arguments, like ALNS or ACO (for
+            ACO, every iteration is one ant, so log.csv can be compared
+            row by row with Hillclimber runs).
+
+        - elite_archive (str, optional): Path of a shared elite archive
+            (SQLite file, see classes/elite_archive.py). Runs start from
+            a solution in the archive (if there is one), publish their
+            improvements to it and restart from an elite after `cap`
+            iterations without change. Use the same path for autoruns 
+            in different terminals to let them share their best 
+            solutions. Defaults to None (no archive).
+
+        - screening_candidates (int, optional): If set, the start states
+            are screened first (see screen_start_states): this many
+            candidate start states get short Hillclimber bursts, and by
+            successive halving only the best `n_runs` get a full run.
+            If screening fails, run 0 is logged to runs_with_error.csv 
+            and every run gets a new start state. Defaults to None (a new Random_Greedy start state per run).
     """
 
     # Input check
@@ -110,9 +283,35 @@ def autorun_hillclimber(n_runs: int,
 
 
     # Print message that the autorun is starting
-    print(f"Starting {n_runs} runs of Hillclimber algorithm on {maprange} map.")
+    print(f"Starting {n_runs} runs of {algorithm_class.__name__} algorithm on {maprange} map.")
     print("")
 
+    # Load the map once to generate all start states
+    start_state_generator = Random_Greedy(maprange)
+
+    # Screen start states, so full runs only go to promising ones
+    start_states: list[list[Route] | None] = [None] * n_runs
+    if screening_candidates is not None:
+        # If screening fails, log it as run 0 and use new start states
+        try:
+            start_states = screen_start_states(maprange, n_runs, screening_candidates,
+                                               burst_iterations=20 if demo_mode else 50)
+        except Exception as e:
+            print(f"\nError occurred while screening start states:")
+            print(repr(e))
+            print(f"\nProceeding without screening.\n")
+
+            append_single_score_to_csv(0, 
+                                       f"{project_dir}/runs_with_error.csv", 
+                                       custom_file_path=True)
+
+    # Shared archive of the best solutions of all runs
+    archive = Elite_Archive(elite_archive, maprange) if elite_archive is not None else None
+
+    # Upper bound on the score, to report the gap of every run
+    bound: float = upper_bound(maprange)
+    best_score: float = float("-inf")
+
     # For the specified number of runs, run the Hillclimber algorithm
     for run_number in range(1, n_runs + 1):
         
@@ -124,11 +323,22 @@ def autorun_hillclimber(n_runs: int,
             # Run the Hillclimber algorithm
             solution: list[Route] = run_hillclimber(maprange, 
                                                     project_dir, 
-                                                    demo_mode)
+                                                    demo_mode,
+                                                    start_state_generator,
+                                                    gap_threshold,
+                                                    algorithm_class,
+                                                    archive,
+                                                    start_states[run_number - 1])
 
             # Write the produced solution to a csv file
             write_run_to_csv(solution, maprange, project_dir)
 
+            # Report the gap to the upper bound
+            score: float = calculate_score(solution, maprange)
+            best_score = max(best_score, score)
+            print(f"\nScore {score}, upper bound {bound},",
+                  f"gap {optimality_gap(score, bound):.2%}")
+
             # Print succes message seperated by empty lines
             print(
             f"\nRun {run_number} of {n_runs} of project {project_name}", 
@@ -148,6 +358,11 @@ def autorun_hillclimber(n_runs: int,
 
             continue
 
+    # Summary: best score over all runs and its gap
+    if best_score > float("-inf"):
+        print(f"Best score of this autorun: {best_score},",
+              f"gap to upper bound {optimality_gap(best_score, bound):.2%}")
+
 
 def create_project(project_name: str, 
                    project_dir: str, 
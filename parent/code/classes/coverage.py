@@ -0,0 +1,414 @@
+from collections import Counter
+from typing import Callable
+
+import numpy as np
+
+from parent.code.classes.route import Route
+from parent.code.classes.station_class import Station
+
+
+def connection_key(station1: Station, station2: Station) -> tuple[str, str]:
+    """
+    Key of the connection between two stations: the alphabetically
+    sorted tuple of their names (so both directions get the same key).
+    """
+    if station1.name < station2.name:
+        return (station1.name, station2.name)
+    return (station2.name, station1.name)
+
+
+def path_keys(path: list[Station]) -> list[tuple[str, str]]:
+    """
+    Keys of the connections of a route, given as a list of stations.
+    """
+    return [connection_key(station1, station2) for station1, station2 in zip(path, path[1:])]
+
+
+def path_minutes(path: list[Station]) -> int:
+    """
+    Total duration of a route, given as a list of stations.
+    """
+    return sum(station1.connections[station2] for station1, station2 in zip(path, path[1:]))
+
+
+def best_subpath(path: list[Station], covered_elsewhere: Callable[[tuple[str, str]], bool],
+                 value_per_connection: float) -> tuple[int, int, float]:
+    """
+    Best contiguous part of a route, given which connections the other
+    routes cover: the part `path[start:end + 1]` with the highest value,
+    where value = connections only this part covers * value_per_connection
+    - minutes (without the 100 points of the route itself).
+
+    With prefix sums: if the route rides every connection once, the gain
+    of every connection is fixed and the best part is the maximum
+    subarray (Kadane, O(L)). Otherwise, a connection only counts the
+    first time within the part, so every start is tried with a running
+    set of connections (O(L^2)).
+
+    - Post: returns (start, end, value); (0, 0, 0.0) if no part has a
+      positive value.
+    """
+    keys = path_keys(path)
+    minutes = [station1.connections[station2] for station1, station2 in zip(path, path[1:])]
+    new = [not covered_elsewhere(key) for key in keys]
+    best = (0, 0, 0.0)
+
+    if len(set(keys)) == len(keys):
+        # Kadane: best part ending at every connection
+        start, value = 0, 0.0
+        for k, key in enumerate(keys):
+            gain = value_per_connection * new[k] - minutes[k]
+            if value <= 0:
+                start, value = k, 0.0
+            value += gain
+            if value > best[2]:
+                best = (start, k + 1, value)
+        return best
+
+    # Prefix sums of minutes, and a running set of new connections
+    prefix = [0]
+    for duration in minutes:
+        prefix.append(prefix[-1] + duration)
+
+    for start in range(len(keys)):
+        seen: set[tuple[str, str]] = set()
+        for k in range(start, len(keys)):
+            if new[k]:
+                seen.add(keys[k])
+            value = len(seen) * value_per_connection - (prefix[k + 1] - prefix[start])
+            if value > best[2]:
+                best = (start, k + 1, value)
+    return best
+
+
+def canonical_route(path: list[Station]) -> tuple[str, ...]:
+    """
+    Canonical form of a route: the station names in the direction that
+    sorts first, so a route and its reverse get the same key.
+    """
+    names = tuple(station.name for station in path)
+    return min(names, names[::-1])
+
+
+class Coverage:
+    """
+    Keeps track of how often every connection is ridden in a solution
+    (over all routes), together with the total minutes and number of
+    routes. This way the score change of a move (some routes replaced,
+    removed or shortened) is computed from the changed routes only,
+    without calling calculate_score on the whole solution.
+
+    Routes are given as lists of stations (`route.stations`).
+    """
+
+    def __init__(self, routes: list[Route], n_connections: int) -> None:
+        """
+        Count the connections of all routes.
+
+        - Pre: `n_connections` is the number of connections of the map.
+        """
+        self.value_per_connection: float = 10000 / n_connections
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self.minutes: int = 0
+        self.n_routes: int = 0
+
+        for route in routes:
+            self.add_path(route.stations)
+
+    def covered(self) -> int:
+        """
+        Number of connections ridden at least once.
+        """
+        return len(self.counts)
+
+    def score(self) -> float:
+        """
+        Score of the solution (same formula as calculate_score).
+        """
+        return (self.covered() * self.value_per_connection
+                - 100 * self.n_routes - self.minutes)
+
+    def add_path(self, path: list[Station]) -> None:
+        """
+        Add a route to the solution.
+        """
+        self.counts.update(path_keys(path))
+        self.minutes += path_minutes(path)
+        self.n_routes += 1
+
+    def remove_path(self, path: list[Station]) -> None:
+        """
+        Remove a route from the solution.
+        """
+        self.counts.subtract(path_keys(path))
+        for key in set(path_keys(path)):
+            if self.counts[key] <= 0:
+                del self.counts[key]
+        self.minutes -= path_minutes(path)
+        self.n_routes -= 1
+
+    def delta(self, old_paths: list[list[Station]],
+              new_paths: list[list[Station]]) -> float:
+        """
+        Score change when the routes `old_paths` are replaced by
+        `new_paths` (new paths with less than two stations are left out,
+        i.e. the route is removed).
+        """
+        new_paths = [path for path in new_paths if len(path) > 1]
+
+        change: Counter[tuple[str, str]] = Counter()
+        for path in new_paths:
+            change.update(path_keys(path))
+        for path in old_paths:
+            change.subtract(path_keys(path))
+
+        covered_change = 0
+        for key, difference in change.items():
+            before = self.counts.get(key, 0)
+            if before == 0 and difference > 0:
+                covered_change += 1
+            elif before > 0 and before + difference == 0:
+                covered_change -= 1
+
+        minutes_change = (sum(path_minutes(path) for path in new_paths)
+                          - sum(path_minutes(path) for path in old_paths))
+        routes_change = len(new_paths) - len(old_paths)
+
+        return (covered_change * self.value_per_connection
+                - 100 * routes_change - minutes_change)
+
+
+class Coverage_Array:
+    """
+    Array version of Coverage, for evaluating many candidate moves at
+    once: the counts per connection are a NumPy array (indexed like
+    RailNL.connection_list), and every route is a count vector.
+
+    A candidate move replaces the route at some index by a new route (an
+    index one past the last route adds the route instead). The score
+    change of K candidates is computed in one vectorised pass over a
+    (K x connections) array.
+
+    It also keeps an inverted index from every connection to the routes
+    that ride it, and per route the number of connections only that
+    route rides, updated with every replace. So the contribution of a
+    route (what removing it costs) and the uncovered connections are
+    known without a pass over the solution.
+    """
+
+    def __init__(self, routes: list[Route], load) -> None:
+        """
+        - Pre: `load` is the RailNL object of the map (or a region of
+          it, see RailNL.subgraph; scores stay those of the whole map).
+        """
+        self.connection_index: dict[tuple[str, str], int] = load.connection_index
+        self.n_connections: int = len(load.connection_list)
+        self.value_per_connection: float = 10000 / load.map_connections
+
+        self.paths: list[list[Station]] = [list(route.stations) for route in routes]
+        self.vectors: list[np.ndarray] = [self.vector(path) for path in self.paths]
+        self.minutes: list[int] = [path_minutes(path) for path in self.paths]
+        self.counts: np.ndarray = (np.sum(self.vectors, axis=0) if self.vectors
+                                   else np.zeros(self.n_connections, dtype=np.int32))
+
+        # Inverted index, by route id (the index of a route changes when
+        # another route is removed, its id does not)
+        self.routes_of: list[set[int]] = [set() for _ in range(self.n_connections)]
+        self.unique: dict[int, int] = {}
+        self.next_id = 0
+        self.ids: list[int] = [self.index_route(vector) for vector in self.vectors]
+        self.position: dict[int, int] = {route_id: index
+                                         for index, route_id in enumerate(self.ids)}
+
+    def vector(self, path: list[Station]) -> np.ndarray:
+        """
+        Count vector of a route: how often it rides every connection.
+        """
+        vector = np.zeros(self.n_connections, dtype=np.int32)
+        for key in path_keys(path):
+            vector[self.connection_index[key]] += 1
+        return vector
+
+    def score(self) -> float:
+        """
+        Score of the solution (same formula as calculate_score).
+        """
+        return (np.count_nonzero(self.counts) * self.value_per_connection
+                - 100 * len(self.paths) - sum(self.minutes))
+
+    def batch_delta(self, indices: list[int],
+                    new_paths: list[list[Station]]) -> np.ndarray:
+        """
+        Score change of K candidate moves at once: candidate k replaces
+        the route at `indices[k]` by `new_paths[k]` (or adds it, if the
+        index is one past the last route; a path without connections
+        removes the route).
+        """
+        n_routes = len(self.paths)
+        new_vectors = np.array([self.vector(path) for path in new_paths])
+        new_minutes = np.array([path_minutes(path) for path in new_paths])
+
+        # Vectors and minutes of the routes that are replaced (zero for
+        # added routes)
+        old_vectors = np.zeros_like(new_vectors)
+        old_minutes = np.zeros(len(indices), dtype=np.int64)
+        replaced = np.flatnonzero(np.array(indices) < n_routes)
+        if len(replaced) > 0:
+            old_vectors[replaced] = np.array(self.vectors)[np.array(indices)[replaced]]
+            old_minutes[replaced] = np.array(self.minutes)[np.array(indices)[replaced]]
+
+        # Connections covered after every candidate move
+        covered_after = np.count_nonzero(self.counts + new_vectors - old_vectors, axis=1)
+        covered_change = covered_after - np.count_nonzero(self.counts)
+
+        # A new path without connections only removes a route
+        routes_change = (np.array([len(path) > 1 for path in new_paths], dtype=int)
+                         - (np.array(indices) < n_routes))
+        return (covered_change * self.value_per_connection
+                - 100 * routes_change - (new_minutes - old_minutes))
+
+    def replace(self, index: int, path: list[Station]) -> None:
+        """
+        Replace the route at `index` by `path`, or add it if the index is
+        one past the last route. A path with less than two stations
+        removes the route: the last route then takes its place, so only
+        the position of that route changes.
+        """
+        if index < len(self.paths):
+            self.counts -= self.vectors[index]
+            self.unindex_route(self.ids[index], self.vectors[index])
+            del self.position[self.ids[index]]
+
+            if len(path) < 2:
+                # Move the last route into the gap
+                last = len(self.paths) - 1
+                for values in (self.paths, self.vectors, self.minutes, self.ids):
+                    values[index] = values[last]
+                    values.pop()
+                if index < last:
+                    self.position[self.ids[index]] = index
+                return
+
+        if len(path) > 1:
+            vector = self.vector(path)
+            self.counts += vector
+            route_id = self.index_route(vector)
+            if index < len(self.paths):
+                self.paths[index], self.vectors[index] = list(path), vector
+                self.minutes[index], self.ids[index] = path_minutes(path), route_id
+            else:
+                self.paths.append(list(path))
+                self.vectors.append(vector)
+                self.minutes.append(path_minutes(path))
+                self.ids.append(route_id)
+            self.position[route_id] = index
+
+    def index_route(self, vector: np.ndarray) -> int:
+        """
+        Add a route (its count vector) to the inverted index.
+
+        - Post: returns the id of the route.
+        """
+        route_id = self.next_id
+        self.next_id += 1
+        self.unique[route_id] = 0
+
+        for connection in np.flatnonzero(vector):
+            routes = self.routes_of[connection]
+            if not routes:
+                self.unique[route_id] += 1
+            elif len(routes) == 1:
+                # The other route does not ride it alone anymore
+                self.unique[next(iter(routes))] -= 1
+            routes.add(route_id)
+        return route_id
+
+    def unindex_route(self, route_id: int, vector: np.ndarray) -> None:
+        """
+        Remove a route (its id and count vector) from the inverted index.
+        """
+        for connection in np.flatnonzero(vector):
+            routes = self.routes_of[connection]
+            routes.discard(route_id)
+            if len(routes) == 1:
+                # The route that is left now rides it alone
+                self.unique[next(iter(routes))] += 1
+        del self.unique[route_id]
+
+    def routes_covering(self, connection: int) -> list[int]:
+        """
+        Indices of the routes that ride a connection (index as in
+        RailNL.connection_list).
+        """
+        return [self.position[route_id] for route_id in self.routes_of[connection]]
+
+    def unique_coverage(self, index: int) -> int:
+        """
+        Number of connections only the route at `index` rides.
+        """
+        return self.unique[self.ids[index]]
+
+    def contribution(self, index: int) -> float:
+        """
+        What the route at `index` adds to the score: the value of the
+        connections only it rides, minus its minutes and the 100 points
+        of a route. Removing the route changes the score by minus this.
+        """
+        return (self.unique_coverage(index) * self.value_per_connection
+                - 100 - self.minutes[index])
+
+    def uncovered(self, without: int | None = None) -> np.ndarray:
+        """
+        Indices of the connections no route rides (if the route at
+        `without` is removed, if given).
+        """
+        if without is None or without >= len(self.paths):
+            return np.flatnonzero(self.counts == 0)
+        return np.flatnonzero(self.counts == self.vectors[without])
+
+    def removal_weights(self, temperature: float) -> np.ndarray:
+        """
+        Chance to pick every route for removal: exp(-contribution /
+        temperature), normalised, so routes that add little are picked
+        more often.
+        """
+        contributions = np.array([self.contribution(index) for index in range(len(self.paths))])
+        weights = np.exp(-(contributions - contributions.min()) / temperature)
+        return weights / weights.sum()
+
+    def trim_optimal(self, index: int) -> None:
+        """
+        Replace the route at `index` by its best contiguous part given
+        the other routes (see best_subpath), or remove it if no part is
+        worth the 100 points of a route.
+        """
+        path = self.paths[index]
+        elsewhere = self.counts - self.vectors[index]
+        start, end, value = best_subpath(
+            path, lambda key: elsewhere[self.connection_index[key]] > 0,
+            self.value_per_connection)
+
+        if value <= 100:
+            self.replace(index, [])
+        elif end - start < len(path) - 1:
+            self.replace(index, path[start:end + 1])
+
+    def trim_redundant(self, index: int) -> None:
+        """
+        Remove connections at the head and tail of the route at `index`
+        that are also ridden elsewhere.
+        """
+        path = self.paths[index]
+        counts = self.counts.copy()
+
+        for at_head in (True, False):
+            while len(path) > 1:
+                key = (connection_key(path[0], path[1]) if at_head
+                       else connection_key(path[-2], path[-1]))
+                if counts[self.connection_index[key]] <= 1:
+                    break
+                counts[self.connection_index[key]] -= 1
+                path = path[1:] if at_head else path[:-1]
+
+        if len(path) < len(self.paths[index]):
+            self.replace(index, path)
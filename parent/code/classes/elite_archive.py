@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+
+from parent.code.classes.coverage import canonical_route
+from parent.code.classes.railnl import RailNL
+from parent.code.classes.route import Route
+
+
+def solution_digest(routes: list[Route]) -> str:
+    """
+    Key of a solution in the archive that does not depend on the order
+    of the routes or the direction of each route. Unlike solution_hash
+    (see transposition_table.py), which uses the built-in hash() that
+    differs per interpreter, it is the same in every process and run.
+    """
+    names = sorted("\x1f".join(canonical_route(route.stations))
+                   for route in routes if len(route.stations) > 1)
+    return hashlib.blake2b("\x1e".join(names).encode(), digest_size=16).hexdigest()
+
+
+class Elite_Archive:
+    """
+    Archive of the best solutions found, shared by all processes on one
+    machine: a SQLite database in WAL mode (readers never block, writers
+    wait for each other), keyed by solution_digest, so the same solution
+    is stored once however its routes are ordered or directed.
+
+    Every process opens its own connection (connections can not be
+    shared between processes), so an Elite_Archive object can be passed
+    to worker processes.
+    """
+
+    def __init__(self, path: str, maprange: str = "Holland",
+                 max_size: int = 100) -> None:
+        """
+        - path: file of the database (created if it does not exist).
+        - max_size: number of solutions kept per map; when the archive
+          is full, the worst solution is removed.
+        """
+        self.path = path
+        self.maprange = maprange
+        self.max_size = max_size
+        self.connection: sqlite3.Connection | None = None
+        self.pid: int | None = None
+
+        # Score a solution needs to get in (known once the archive is full)
+        self.threshold = float("-inf")
+
+        with self.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS elites (
+                                      hash TEXT PRIMARY KEY,
+                                      maprange TEXT NOT NULL,
+                                      score REAL NOT NULL,
+                                      routes TEXT NOT NULL,
+                                      created REAL NOT NULL)""")
+            connection.execute("CREATE INDEX IF NOT EXISTS elites_score "
+                               "ON elites (maprange, score)")
+
+    def __getstate__(self) -> dict:
+        # Connections are not sent to other processes
+        return {**self.__dict__, "connection": None, "pid": None}
+
+    def __len__(self) -> int:
+        return self.connect().execute(
+            "SELECT COUNT(*) FROM elites WHERE maprange = ?", (self.maprange,)).fetchone()[0]
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Connection of this process (opened on first use).
+        """
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA busy_timeout=60000")
+            self.pid = os.getpid()
+        return self.connection
+
+    def publish(self, routes: list[Route], score: float) -> bool:
+        """
+        Add a solution, if it is not in the archive yet and good enough
+        to get in.
+
+        - Post: returns True if the solution was added.
+        """
+        if score <= self.threshold:
+            return False
+
+        key = solution_digest(routes)
+        stations = json.dumps([[station.name for station in route.stations]
+                               for route in routes if len(route.stations) > 1])
+
+        connection = self.connect()
+        with connection:
+            # Take the write lock at once, so the count below is exact
+            connection.execute("BEGIN IMMEDIATE")
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO elites VALUES (?, ?, ?, ?, ?)",
+                (key, self.maprange, score, stations, time.time()))
+            added = cursor.rowcount == 1
+
+            # Remove the worst solutions if the archive is too full
+            connection.execute(
+                """DELETE FROM elites WHERE maprange = ? AND hash NOT IN (
+                       SELECT hash FROM elites WHERE maprange = ?
+                       ORDER BY score DESC LIMIT ?)""",
+                (self.maprange, self.maprange, self.max_size))
+
+            count, worst = connection.execute(
+                "SELECT COUNT(*), MIN(score) FROM elites WHERE maprange = ?",
+                (self.maprange,)).fetchone()
+            if count >= self.max_size:
+                self.threshold = worst
+
+        return added and score >= worst
+
+    def best(self) -> tuple[float, list[list[str]]] | None:
+        """
+        Best score in the archive and its routes (as station names), or
+        None if the archive is empty.
+        """
+        row = self.connect().execute(
+            "SELECT score, routes FROM elites WHERE maprange = ? "
+            "ORDER BY score DESC LIMIT 1", (self.maprange,)).fetchone()
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def sample(self, load: RailNL) -> list[Route] | None:
+        """
+        A random solution from the archive, better solutions more likely
+        (chance proportional to 1 / rank). Its routes are built on the
+        stations of `load`. None if the archive is empty.
+        """
+        rows = self.connect().execute(
+            "SELECT routes FROM elites WHERE maprange = ? ORDER BY score DESC",
+            (self.maprange,)).fetchall()
+        if not rows:
+            return None
+
+        weights = [1 / rank for rank in range(1, len(rows) + 1)]
+        names = json.loads(random.choices(rows, weights=weights)[0][0])
+
+        routes = []
+        for route_names in names:
+            route = Route()
+            for name1, name2 in zip(route_names, route_names[1:]):
+                station1, station2 = load.stations[name1], load.stations[name2]
+                route.add_connection(station1, station2, station1.connections[station2])
+            routes.append(route)
+        return routes
@@ -0,0 +1,100 @@
+from random import randrange
+from typing import Any, Hashable
+
+
+class IndexedPool:
+    """
+    Pool of key-value pairs with O(1) membership test, removal and
+    random sampling. Items are stored in a list; removing an item swaps
+    the last item into its place (swap-remove), and a dict keeps track
+    of the position of every key.
+    """
+
+    def __init__(self, items: dict[Hashable, Any] | None = None) -> None:
+        """
+        Initialize a pool, optionally filled with the items of a dict.
+
+        - Post: pool contains all key-value pairs of `items` (if given).
+        """
+        self.key_list: list[Hashable] = []
+        self.value_list: list[Any] = []
+        self.positions: dict[Hashable, int] = {}
+
+        if items is not None:
+            self.key_list = list(items.keys())
+            self.value_list = list(items.values())
+            self.positions = {key: i for i, key in enumerate(self.key_list)}
+
+    def __len__(self) -> int:
+        return len(self.key_list)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.positions
+
+    def __repr__(self) -> str:
+        return f"IndexedPool({self.key_list})"
+
+    def copy(self) -> "IndexedPool":
+        """
+        Return a shallow copy of this pool in O(n), without rehashing
+        the keys one by one.
+        """
+        pool = IndexedPool()
+        pool.key_list = self.key_list.copy()
+        pool.value_list = self.value_list.copy()
+        pool.positions = self.positions.copy()
+        return pool
+
+    def add(self, key: Hashable, value: Any) -> None:
+        """
+        Add a key-value pair to the pool (or overwrite the value of an
+        existing key).
+        """
+        if key in self.positions:
+            self.value_list[self.positions[key]] = value
+            return
+
+        self.positions[key] = len(self.key_list)
+        self.key_list.append(key)
+        self.value_list.append(value)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the value of `key`. Raises KeyError if key is not in the
+        pool.
+        """
+        return self.value_list[self.positions[key]]
+
+    def pop(self, key: Hashable) -> Any:
+        """
+        Remove `key` from the pool in O(1) and return its value.
+        Raises KeyError if key is not in the pool.
+        """
+        index = self.positions.pop(key)
+        value = self.value_list[index]
+
+        # Move the last item into the freed position
+        last_key = self.key_list.pop()
+        last_value = self.value_list.pop()
+        if index < len(self.key_list):
+            self.key_list[index] = last_key
+            self.value_list[index] = last_value
+            self.positions[last_key] = index
+
+        return value
+
+    def random_choice(self) -> Any:
+        """
+        Return the value of a uniformly random item in O(1). Raises
+        IndexError if the pool is empty.
+        """
+        if len(self.value_list) == 0:
+            raise IndexError("Cannot choose from an empty pool.")
+
+        return self.value_list[randrange(len(self.value_list))]
+
+    def values(self) -> list[Any]:
+        """
+        Return a list of all values in the pool (in no particular order).
+        """
+        return list(self.value_list)
@@ -1,8 +1,22 @@
 from random import choice
-from os.path import abspath, join, dirname
+from os import makedirs, replace, getpid
+from os.path import abspath, join, dirname, exists
+import hashlib
+import heapq
+import numpy as np
+
 from parent.code.classes.station_class import Station
 
 parent_path = abspath(join(dirname(__file__), '../..'))
+cache_path = join(parent_path, "data", "cache")
+
+# Distance between stations that are not connected at all (half the
+# int32 maximum, so two of them can still be added)
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+# Maps with more stations use Dijkstra from every station instead of
+# Floyd-Warshall (n^3 work, n^2 memory per step)
+FLOYD_WARSHALL_MAX_STATIONS = 500
 
 class RailNL:
     """Class containing all stations and their connections."""
@@ -24,6 +38,19 @@ class RailNL:
         self.load_stations(f"{parent_path}/data/Stations{maprange}.csv")
         self.load_connections(f"{parent_path}/data/Connecties{maprange}.csv")
 
+        # Number stations and connections, so they can be used as array
+        # indices (CSR adjacency is built lazily, see `get_csr`)
+        self.index_stations_and_connections()
+        self.csr: tuple["np.ndarray", ...] | None = None
+
+        # Connections of the whole map, which set the value of a 
+        # connection in the score (also in a subgraph, see `subgraph`)
+        self.map_connections: int = len(self.connection_list)
+
+        # All-pairs shortest paths, computed lazily (see 
+        # `get_shortest_paths`)
+        self.shortest_paths: tuple["np.ndarray", "np.ndarray"] | None = None
+
     def load_stations(self, filepath: str) -> None:
         """
         Load stations from data file into self.stations.
@@ -129,4 +156,235 @@ class RailNL:
         - Post: Returns a set of tuples, where each tuple contains two 
           connected Station objects.
         """
-        return set(map(tuple, self.connections))
\ No newline at end of file
+        return set(map(tuple, self.connections))
+
+    def index_stations_and_connections(self) -> None:
+        """
+        Give every station and every connection a fixed integer index.
+
+        - Post: self.station_list and self.connection_list contain all
+          stations and connections in a fixed order, self.station_index
+          and self.connection_index map station names and alphabetically
+          sorted station name tuples to these indices.
+        """
+        self.station_list: list["Station"] = list(self.stations.values())
+        self.station_index: dict[str, int] = {
+            station.name: index for index, station in enumerate(self.station_list)}
+
+        # Sort connections on station names, so the order is the same 
+        # every time the map is loaded
+        self.connection_list: list[tuple["Station", "Station"]] = sorted(
+            self.connections, key=lambda connection: (connection[0].name, 
+                                                      connection[1].name))
+        self.connection_index: dict[tuple[str, str], int] = {
+            (connection[0].name, connection[1].name): index 
+            for index, connection in enumerate(self.connection_list)}
+
+    def get_csr(self) -> tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        Return the adjacency of the network in CSR (compressed sparse 
+        row) format. Built on first call and cached afterwards.
+
+        - Post: returns the tuple `(indptr, indices, durations, 
+          edge_ids)`. The neighbours of station i are 
+          `indices[indptr[i]:indptr[i + 1]]`, sorted by duration 
+          (shortest connection first). `durations` and `edge_ids` give
+          the duration and connection index of each of these entries.
+        """
+        if self.csr is None:
+            indptr = np.zeros(len(self.station_list) + 1, dtype=np.int32)
+            indices, durations, edge_ids = [], [], []
+
+            for i, station in enumerate(self.station_list):
+                # Sort neighbours on duration (shortest first)
+                neighbours = sorted(station.connections.items(), 
+                                    key=lambda item: item[1])
+                
+                for neighbour, duration in neighbours:
+                    indices.append(self.station_index[neighbour.name])
+                    durations.append(duration)
+                    edge_ids.append(self.connection_index[
+                        tuple(sorted([station.name, neighbour.name]))])
+                
+                indptr[i + 1] = len(indices)
+
+            self.csr = (indptr, 
+                        np.array(indices, dtype=np.int32), 
+                        np.array(durations, dtype=np.int32), 
+                        np.array(edge_ids, dtype=np.int32))
+
+        return self.csr
+
+    def get_shortest_paths(self, use_cache: bool = True
+                           ) -> tuple["np.ndarray", "np.ndarray"]:
+        """
+        Return the travel time of the shortest path between every two
+        stations, and the stations on these paths. Computed on first 
+        call (Floyd-Warshall for small maps, Dijkstra from every station
+        over the CSR arrays for large maps) and cached afterwards, also 
+        on disk in `parent/data/cache` so the next load of the same 
+        network does not compute them again.
+
+        - Post: returns the tuple `(distances, predecessors)`, indexed 
+          by station index (see `index_stations_and_connections`). 
+          `distances[i, j]` (int32) is the number of minutes from 
+          station i to station j (UNREACHABLE if there is no path), 
+          `predecessors[i, j]` (int16 or int32) the station before j on
+          the shortest path from i to j (-1 if i == j or unreachable).
+        """
+        if self.shortest_paths is not None:
+            return self.shortest_paths
+
+        file_path = join(cache_path, f"shortest_paths_{self.mapname}_{self.network_hash()}.npz")
+        if use_cache and exists(file_path):
+            with np.load(file_path) as cached:
+                self.shortest_paths = (cached["distances"], cached["predecessors"])
+            return self.shortest_paths
+
+        if len(self.station_list) <= FLOYD_WARSHALL_MAX_STATIONS:
+            self.shortest_paths = self.floyd_warshall()
+        else:
+            self.shortest_paths = self.dijkstra_all_pairs()
+
+        # Write to a temporary file first, so processes that load the 
+        # same map at the same time never read half a file
+        if use_cache:
+            makedirs(cache_path, exist_ok=True)
+            temporary_path = f"{file_path}.{getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                np.savez(file, distances=self.shortest_paths[0],
+                         predecessors=self.shortest_paths[1])
+            replace(temporary_path, file_path)
+
+        return self.shortest_paths
+
+    def network_hash(self) -> str:
+        """
+        Short hash of all connections and their durations, so cached
+        shortest paths of a changed network are not used.
+        """
+        text = ";".join(f"{station1.name},{station2.name},{station1.connections[station2]}"
+                        for station1, station2 in self.connection_list)
+        return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+    def predecessor_dtype(self) -> type:
+        """
+        Smallest integer type that holds every station index (and -1).
+        """
+        return np.int16 if len(self.station_list) < np.iinfo(np.int16).max else np.int32
+
+    def floyd_warshall(self) -> tuple["np.ndarray", "np.ndarray"]:
+        """
+        All-pairs shortest paths with Floyd-Warshall, one NumPy step per
+        intermediate station (see `get_shortest_paths`).
+        """
+        n = len(self.station_list)
+        indptr, indices, durations, _ = self.get_csr()
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+
+        distances = np.full((n, n), UNREACHABLE, dtype=np.int32)
+        np.minimum.at(distances, (rows, indices), durations)
+        np.fill_diagonal(distances, 0)
+
+        predecessors = np.where(distances < UNREACHABLE, np.arange(n)[:, None], -1)
+        np.fill_diagonal(predecessors, -1)
+
+        for k in range(n):
+            via = distances[:, k, None] + distances[None, k, :]
+            shorter = via < distances
+            distances = np.where(shorter, via, distances)
+            predecessors = np.where(shorter, predecessors[k][None, :], predecessors)
+
+        return distances, predecessors.astype(self.predecessor_dtype())
+
+    def dijkstra_all_pairs(self) -> tuple["np.ndarray", "np.ndarray"]:
+        """
+        All-pairs shortest paths with Dijkstra from every station, over
+        the CSR arrays (see `get_shortest_paths`).
+        """
+        n = len(self.station_list)
+        indptr, indices, durations, _ = self.get_csr()
+        indptr, indices, durations = indptr.tolist(), indices.tolist(), durations.tolist()
+
+        distances = np.full((n, n), UNREACHABLE, dtype=np.int32)
+        predecessors = np.full((n, n), -1, dtype=self.predecessor_dtype())
+
+        for source in range(n):
+            distance = [UNREACHABLE] * n
+            previous = [-1] * n
+            distance[source] = 0
+            queue = [(0, source)]
+
+            while queue:
+                minutes, station = heapq.heappop(queue)
+
+                # Skip outdated queue entries
+                if minutes > distance[station]:
+                    continue
+
+                for entry in range(indptr[station], indptr[station + 1]):
+                    neighbour = indices[entry]
+                    new_distance = minutes + durations[entry]
+                    if new_distance < distance[neighbour]:
+                        distance[neighbour] = new_distance
+                        previous[neighbour] = station
+                        heapq.heappush(queue, (new_distance, neighbour))
+
+            distances[source] = distance
+            predecessors[source] = previous
+
+        return distances, predecessors
+
+    def shortest_path(self, source: int, target: int) -> list[int]:
+        """
+        Station indices on the shortest path from station `source` to 
+        station `target` (both included).
+
+        - Post: raises ValueError if target can not be reached from
+          source.
+        """
+        distances, predecessors = self.get_shortest_paths()
+        if distances[source, target] == UNREACHABLE:
+            raise ValueError(f"No path from station {source} to station {target}.")
+
+        path = [target]
+        while path[-1] != source:
+            previous = int(predecessors[source, path[-1]])
+            if previous < 0:
+                raise ValueError(f"No path from station {source} to station {target}.")
+            path.append(previous)
+
+        path.reverse()
+        return path
+
+    def subgraph(self, names: list[str]) -> "RailNL":
+        """
+        Return the part of the network with only the stations in `names`
+        and the connections between them (new Station objects, so the
+        original network is not changed).
+
+        - Post: returns a RailNL object with the same mapname (so route 
+          time limits and scores are those of the whole map), indexed 
+          like a loaded map. `map_connections` stays the number of
+          connections of the whole map.
+        """
+        names = set(names)
+        region = RailNL.__new__(RailNL)
+        region.mapname = self.mapname
+        region.stations = {name: Station(name, self.stations[name].lat, self.stations[name].long)
+                           for name in self.stations if name in names}
+        region.connections = set()
+
+        for station1, station2 in self.connection_list:
+            if station1.name in region.stations and station2.name in region.stations:
+                stat1_o, stat2_o = region.stations[station1.name], region.stations[station2.name]
+                duration = station1.connections[station2]
+                stat1_o.add_connection(stat2_o, duration)
+                stat2_o.add_connection(stat1_o, duration)
+                region.connections.add((stat1_o, stat2_o))
+
+        region.index_stations_and_connections()
+        region.map_connections = self.map_connections
+        region.csr = None
+        region.shortest_paths = None
+        return region
@@ -1,3 +1,6 @@
+from bisect import bisect_right
+
+
 class Station:
     """Station class containing location and connections."""
 
@@ -7,6 +10,14 @@ class Station:
         self.long = long
         self.connections: dict["Station", int] = {}
 
+        # Connections presorted by duration (shortest first), kept up to
+        # date by add_connection. Each entry is a tuple of the connected
+        # station, the duration and the connection key (alphabetically 
+        # sorted station names). Durations are also kept in a separate
+        # list, so they can be searched with bisect.
+        self.connections_sorted: list[tuple["Station", int, tuple[str, str]]] = []
+        self.durations_sorted: list[int] = []
+
     def __repr__(self):
         """
         Return string representation of Station object.
@@ -20,10 +31,23 @@ class Station:
         - Pre: other is a valid Station object, and duration is a
           positive integer.
         - Post: The connection is added to the connections 
-                dictionary of this station.
-        """
+                dictionary of this station, and to the list of 
+                connections sorted by duration.
+        """
+        # If this connection already exists, replace it
+        if other in self.connections:
+            index = [entry[0] for entry in self.connections_sorted].index(other)
+            self.connections_sorted.pop(index)
+            self.durations_sorted.pop(index)
+
         self.connections[other] = duration
 
+        # Insert in sorted position (after connections of equal duration)
+        index = bisect_right(self.durations_sorted, duration)
+        key = tuple(sorted([self.name, other.name]))
+        self.connections_sorted.insert(index, (other, duration, key))
+        self.durations_sorted.insert(index, duration)
+
     def has_connection(self, station: "Station") -> bool:
         """
         Check if this station is connected to another station. Return 
@@ -89,6 +113,13 @@ class Station:
         # Return list
         return connections
     
+    def count_connections_within(self, time_left: int) -> int:
+        """
+        Return the number of connections with a duration of at most 
+        `time_left`. These are the first entries of connections_sorted.
+        """
+        return bisect_right(self.durations_sorted, time_left)
+
     def get_connections_sorted(self):
         """
         NOTE: Legacy function. Only used by old greedy.py.
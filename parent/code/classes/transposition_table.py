@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+from parent.code.classes.coverage import canonical_route
+from parent.code.classes.route import Route
+
+
+def solution_hash(routes: list[Route]) -> int:
+    """
+    Hash of a solution that does not depend on the order of the routes
+    or the direction of each route (Zobrist-style: the sum of the hashes
+    of the canonical routes, modulo 2**64, so two equal routes do not
+    cancel out like they would with XOR).
+    """
+    return sum(hash(canonical_route(route.stations)) for route in routes) % 2**64
+
+
+class Transposition_Table:
+    """
+    Bounded cache of scores of solutions that were seen before, keyed by
+    solution_hash. When the table is full, the least recently used
+    solution is forgotten (LRU).
+
+    Counts hits and misses, so the hit rate can be reported.
+    """
+
+    def __init__(self, max_size: int = 100000) -> None:
+        self.max_size = max_size
+        self.scores: OrderedDict[int, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def get(self, key: int) -> float | None:
+        """
+        Cached score of a solution, or None if it was not seen (or was
+        forgotten).
+        """
+        score = self.scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.scores.move_to_end(key)
+        return score
+
+    def put(self, key: int, score: float) -> None:
+        """
+        Store the score of a solution.
+        """
+        self.scores[key] = score
+        self.scores.move_to_end(key)
+        if len(self.scores) > self.max_size:
+            self.scores.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        """
+        Fraction of lookups that found a cached score.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
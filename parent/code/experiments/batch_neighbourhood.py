@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.random_greedy import Random_Greedy
+
+
+def compare_batch_sizes(maprange: str = "Holland",
+                        batch_sizes: tuple[int, ...] = (1, 16, 128),
+                        candidates: int = 100000,
+                        runs: int = 3,
+                        batch_selection: str = "best") -> list[dict]:
+    """
+    Throughput / quality trade-off of batch neighbourhood evaluation in
+    the Hillclimber: for every batch size K, run the Hillclimber `runs`
+    times with the same total number of candidate moves (so
+    `candidates / K` steps), from the same Random_Greedy start states.
+
+    Post: returns and prints one row per run, with the batch size, the
+    number of steps, candidates per second, seconds and end score.
+    """
+    number_of_routes = 4 if maprange == "Holland" else 12
+    rows = []
+
+    for run in range(runs):
+        random.seed(run)
+        start_state = Random_Greedy(maprange).run(
+            starting_stations="original_stations_only_hard",
+            final_number_of_routes=number_of_routes)
+
+        for batch_size in batch_sizes:
+            random.seed(run)
+            np.random.seed(run)
+            hillclimber = Hillclimber(start_state, maprange)
+            hillclimber.run(candidates // batch_size,
+                            original_connections_only=True,
+                            batch_size=batch_size,
+                            batch_selection=batch_selection,
+                            print_every_improvement=False)
+            rows.append({"run": run, **hillclimber.move.batch_report})
+
+    print("K, steps, candidates/s, seconds, end score")
+    for row in rows:
+        print(f"{row['batch_size']}, {row['steps']}, {row['candidates_per_second']:.0f}, "
+              f"{row['seconds']:.1f}, {row['end_score']:.0f}")
+
+    return rows
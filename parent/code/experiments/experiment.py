@@ -6,10 +6,13 @@ from parent.code.classes.route import Route
 from parent.code.algorithms.algorithm import Algorithm
 from parent.code.helpers.score import calculate_score
 from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.algorithms.batch_random_greedy import Batch_Random_Greedy
 
 class Experiment:
 
-    def __init__(self, maprange: str = "Holland", algorithm_class: "Algorithm" = Random_Greedy) -> None:
+    def __init__(self, maprange: str = "Holland", 
+                 algorithm_class: "Algorithm" = Random_Greedy,
+                 use_batch: bool = True) -> None:
         
         """
         Initialize experiment object with given algorithm and maprange.
@@ -18,12 +21,16 @@ class Experiment:
         (default: "Holland" or "Nationaal" for full map).
         - algorithm_class: name of algorithm class to run the experiment
         on.
+        - use_batch: if True (default), Random_Greedy experiments that 
+        Batch_Random_Greedy supports (fully random walks) are run with
+        that vectorised version, which is much faster.
         """
         self.maprange: str = maprange
         self.algorithm_class: "Algorithm" = algorithm_class
+        self.use_batch: bool = use_batch
         
 
-    def run_experiment(self, iterations: int, **algorithm_kwargs) -> float:
+    def run_experiment(self, iterations: int, /, **algorithm_kwargs) -> float:
         """
         Runs algorithm N times, and returns the scores in a numpy array.
         
@@ -36,23 +43,39 @@ class Experiment:
         Args:
             - iterations (int): number of times to run the algorithm.
             - **algorithm_kwargs: keyword arguments for the algorithm's 
-            run method.
+            run method (`iterations` is positional-only here, so an
+            algorithm's own `iterations`, e.g. of ACO, can be passed).
         """
         
         print(f"Running {self.algorithm_class.__name__} algorithm", 
               f"{iterations} times on {self.maprange} map...")
 
+        # Fully random walks can be generated all at once
+        if (self.use_batch and self.algorithm_class is Random_Greedy
+            and Batch_Random_Greedy.supports(**algorithm_kwargs)):
+            
+            self.scores = Batch_Random_Greedy(self.maprange).run(
+                                        iterations, **algorithm_kwargs)
+            
+            print(f"Experiment finished! Mean score: {np.mean(self.scores)}")
+            return self.scores
+
         # Scores are saved in numpy array, way faster than list!
         # Space in memory is reserved and filled with NaNs
         self.scores: "np.ndarray[float]" = np.full(iterations, np.nan)
         
-        for i in range(iterations):
-            
-            # Initialize algorithm
-            algorithm_instance = self.algorithm_class(self.maprange)
+        # Algorithms that can be reused (e.g. Random_Greedy) are 
+        # initialized only once, so the map is not reloaded every run
+        if hasattr(self.algorithm_class, "generate"):
+            solutions = self.algorithm_class(self.maprange).generate(
+                                            iterations, **algorithm_kwargs)
+        else:
+            solutions = (self.algorithm_class(self.maprange).run(**algorithm_kwargs)
+                         for _ in range(iterations))
 
-            # Run and calculate score
-            solution: list[Route] = algorithm_instance.run(**algorithm_kwargs)
+        for i, solution in enumerate(solutions):
+            
+            # Calculate score of this run
             score: float = calculate_score(solution, self.maprange)
 
             # Add score to array at correct positions
@@ -0,0 +1,210 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from scipy.sparse import coo_matrix
+
+from parent.code.classes.railnl import RailNL, UNREACHABLE
+
+
+def default_limits(maprange: str,
+                   route_time_limit: int | None,
+                   max_routes: int | None) -> tuple[int, int]:
+    """
+    Fill in the default time limit and max number of routes of a map.
+    """
+    if route_time_limit is None:
+        route_time_limit = 120 if maprange == "Holland" else 180
+    if max_routes is None:
+        max_routes = 7 if maprange == "Holland" else 20
+
+    return route_time_limit, max_routes
+
+
+def prefix_bound(durations: list[int],
+                 route_time_limit: int,
+                 routes_left: int,
+                 value_per_connection: float,
+                 max_connections: int | None = None) -> float:
+    """
+    Upper bound on the score that can be gained by covering some (at
+    most `max_connections`) of the connections with the given
+    `durations`, with at most `routes_left` new routes.
+
+    Covering n connections costs at least the n shortest durations, and
+    at least enough routes for those minutes.
+    """
+    best_extra = 0.0
+    total_minutes = 0
+
+    for n, duration in enumerate(sorted(durations)[:max_connections], start=1):
+        total_minutes += duration
+        routes_needed = math.ceil(total_minutes / route_time_limit)
+        if routes_needed > routes_left:
+            break
+
+        extra = n * value_per_connection - total_minutes - 100 * routes_needed
+        best_extra = max(best_extra, extra)
+
+    return best_extra
+
+
+def minimum_deadhead_minutes(load: RailNL, n_routes: int) -> float:
+    """
+    Minimum number of extra minutes (connections ridden more than once)
+    needed to cover every connection with `n_routes` routes.
+
+    Every station with an odd number of connections has to be the end of
+    a route, or be paired up with another odd station by riding the
+    connections in between twice. So: pair up all but 2 * `n_routes` odd
+    stations with minimal total travel time (solved exactly as an
+    integer program).
+    """
+    odd_stations = [station for station in load.station_list
+                    if station.amount_connecting() % 2 == 1]
+    n_pairs = (len(odd_stations) - 2 * n_routes) // 2
+    if n_pairs <= 0:
+        return 0
+
+    # Every possible pair of odd stations (if connected at all)
+    odd = [load.station_index[station.name] for station in odd_stations]
+    distances = load.get_shortest_paths()[0][np.ix_(odd, odd)]
+    pairs = [(i, j) for i in range(len(odd_stations))
+             for j in range(i + 1, len(odd_stations))
+             if distances[i, j] < UNREACHABLE]
+    costs = np.array([distances[i, j] for i, j in pairs], dtype=float)
+
+    # Every station in at most one pair, exactly `n_pairs` pairs
+    rows = [station for pair in pairs for station in pair]
+    columns = [column for column in range(len(pairs)) for _ in range(2)]
+    incidence = coo_matrix((np.ones(len(rows)), (rows, columns)),
+                           shape=(len(odd_stations), len(pairs)))
+    constraints = [LinearConstraint(incidence, 0, 1),
+                   LinearConstraint(np.ones((1, len(pairs))), n_pairs, n_pairs)]
+
+    result = milp(costs, constraints=constraints, integrality=np.ones(len(pairs)),
+                  bounds=Bounds(0, 1))
+
+    # Not possible to pair up that many stations
+    if not result.success:
+        return math.inf
+
+    return round(result.fun)
+
+
+def minimum_cover_minutes(load: RailNL, n_routes: int) -> float:
+    """
+    Minimum total minutes of `n_routes` routes that together cover every
+    connection: every connection once, plus the minimal deadhead minutes.
+    """
+    total = sum(station1.connections[station2]
+                for station1, station2 in load.connection_list)
+
+    return total + minimum_deadhead_minutes(load, n_routes)
+
+
+def minimum_routes(load: RailNL, route_time_limit: int) -> int:
+    """
+    Minimum number of routes needed to cover every connection within
+    `route_time_limit` minutes per route (a lower bound: the minutes of
+    the cheapest cover have to fit in the routes).
+    """
+    n_routes = 1
+    while minimum_cover_minutes(load, n_routes) > n_routes * route_time_limit:
+        n_routes += 1
+
+    return n_routes
+
+
+def lp_upper_bound(catalogue, max_routes: int) -> float:
+    """
+    LP relaxation of picking routes from a Route_Catalogue: routes may be
+    chosen fractionally, a connection counts as covered as far as the
+    routes containing it are chosen.
+
+    Only an upper bound for the whole map if the catalogue is complete
+    (Route_Catalogue with allow_repeated_connections=True and
+    maximal_only=False); else it bounds the catalogue's solutions.
+    """
+    coverage = catalogue.get_coverage()
+    n_routes, n_connections = coverage.shape
+
+    # Variables: route fractions z, then connection fractions y
+    # Maximise value * sum(y) - sum((100 + minutes) * z)
+    costs = np.concatenate([100 + catalogue.minutes.astype(float),
+                            np.full(n_connections, -catalogue.value_per_connection)])
+
+    # y_c <= sum of z over routes containing c, sum(z) <= max_routes
+    routes, connections = np.nonzero(coverage)
+    rows = np.concatenate([connections, np.arange(n_connections),
+                           np.full(n_routes, n_connections)])
+    columns = np.concatenate([routes, n_routes + np.arange(n_connections),
+                              np.arange(n_routes)])
+    values = np.concatenate([-np.ones(len(routes)), np.ones(n_connections),
+                             np.ones(n_routes)])
+    matrix = coo_matrix((values, (rows, columns)),
+                        shape=(n_connections + 1, n_routes + n_connections))
+    limits = np.concatenate([np.zeros(n_connections), [max_routes]])
+
+    bounds = [(0, None)] * n_routes + [(0, 1)] * n_connections
+    result = linprog(costs, A_ub=matrix.tocsr(), b_ub=limits, bounds=bounds,
+                     method="highs")
+
+    return -result.fun
+
+
+@lru_cache(maxsize=None)
+def upper_bound(maprange: str,
+                route_time_limit: int | None = None,
+                max_routes: int | None = None,
+                use_lp: bool | None = None) -> float:
+    """
+    Upper bound on the score of any solution for a map.
+
+    - Full cover with T routes: 10000 - 100 T - the minimum cover minutes
+      (if those fit within T routes).
+    - Partial cover: see `prefix_bound`.
+    - If `use_lp` (default: only for Holland, where the complete route
+      catalogue is small), also the LP relaxation of the complete
+      catalogue. The lowest of the bounds is returned.
+
+    Results are cached per set of arguments.
+    """
+    # Imported here, route_catalogue depends on this module
+    from parent.code.algorithms.route_catalogue import Route_Catalogue
+
+    load = RailNL(maprange)
+    route_time_limit, max_routes = default_limits(load.mapname, route_time_limit,
+                                                  max_routes)
+    durations = [station1.connections[station2]
+                 for station1, station2 in load.connection_list]
+    value_per_connection = 10000 / len(durations)
+
+    # Partial cover: at least one connection is left out
+    bound = prefix_bound(durations, route_time_limit, max_routes,
+                         value_per_connection, max_connections=len(durations) - 1)
+
+    # Full cover with every possible number of routes
+    for n_routes in range(1, max_routes + 1):
+        minutes = minimum_cover_minutes(load, n_routes)
+        if minutes <= n_routes * route_time_limit:
+            bound = max(bound, 10000 - 100 * n_routes - minutes)
+
+    if use_lp is None:
+        use_lp = load.mapname == "Holland"
+    if use_lp:
+        catalogue = Route_Catalogue(maprange, route_time_limit,
+                                    allow_repeated_connections=True,
+                                    maximal_only=False)
+        bound = min(bound, lp_upper_bound(catalogue, max_routes))
+
+    return bound
+
+
+def optimality_gap(score: float, bound: float) -> float:
+    """
+    Relative gap between a score and an upper bound (0 means proven
+    optimal).
+    """
+    return max(0.0, (bound - score) / abs(bound))
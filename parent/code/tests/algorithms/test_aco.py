@@ -0,0 +1,22 @@
+from parent.code.algorithms.aco import ACO
+from parent.code.helpers.score import calculate_score
+
+aco = ACO("Holland", n_workers=1)
+
+# Check the best score never gets worse, matches the returned routes, and
+# every route stays within the time limit
+def test_run():
+    routes = aco.run(iterations=200, n_ants=20, seed=0, print_every_improvement=False)
+    assert len(aco.scores) == 200
+    assert aco.scores == sorted(aco.scores)
+    assert abs(calculate_score(routes, "Holland") - aco.best_score) < 1e-6
+    assert all(route.time <= 120 for route in routes)
+
+# Check the same seed gives the same result
+def test_seed():
+    aco.routes = []
+    aco.run(iterations=100, n_ants=20, seed=1, print_every_improvement=False)
+    first = aco.best_score
+    aco.routes = []
+    aco.run(iterations=100, n_ants=20, seed=1, print_every_improvement=False)
+    assert aco.best_score == first
@@ -0,0 +1,38 @@
+import random
+
+from parent.code.algorithms.alns import ALNS
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.helpers.score import calculate_score
+
+random.seed(0)
+start = Random_Greedy("Holland").run(final_number_of_routes=5)
+
+# Check every destroy and repair operator keeps routes within the time
+# limit, and greedy repair puts the beam settings back
+def test_operators():
+    alns = ALNS(list(start), "Holland")
+    alns.original_connections_only = False
+    builder = alns.route_builder
+    builder.beam_width, builder.beam_depth = 3, 2
+
+    for destroy in alns.destroy_operators:
+        for repair in alns.repair_operators:
+            kept = getattr(alns, f"destroy_{destroy}")(alns.copy_routes(start), 2)
+            assert len(kept) == len(start) - 2
+
+            routes = alns.repair(kept, 2, repair)
+            assert len(routes) <= alns.max_routes
+            assert all(route.time <= alns.route_time_limit for route in routes)
+            assert (builder.beam_width, builder.beam_depth) == (3, 2)
+
+# Check the best score is the score of the returned routes, and without
+# simulated annealing the current score never goes down
+def test_run():
+    random.seed(1)
+    alns = ALNS(list(start), "Holland")
+    routes = alns.run(200, print_every_improvement=False)
+
+    assert alns.best_score == calculate_score(routes, "Holland")
+    assert all(route.time <= alns.route_time_limit for route in routes)
+    assert alns.best_score >= max(alns.scores)
+    assert all(later >= earlier for earlier, later in zip(alns.scores, alns.scores[1:]))
@@ -0,0 +1,26 @@
+import numpy as np
+
+from parent.code.algorithms.batch_random_greedy import Batch_Random_Greedy
+from parent.code.helpers.score import calculate_score
+
+# Check the bulk scores equal calculate_score of the solutions from
+# get_solution, also over several batches and with varying settings
+def test_scores_match_solutions():
+    for maprange, route_time_limit in (("Holland", 120), ("Nationaal", [120, 150, 180])):
+        np.random.seed(0)
+        batch_random_greedy = Batch_Random_Greedy(maprange)
+        scores = batch_random_greedy.run(50, final_number_of_routes=(3, 7),
+                                         route_time_limit=route_time_limit,
+                                         batch_size=20)
+
+        assert len(scores) == 50 and not np.isnan(scores).any()
+        for index, score in enumerate(scores):
+            routes = batch_random_greedy.get_solution(index)
+            assert abs(calculate_score(routes, maprange) - score) < 1e-6
+            assert all(route.time <= max(np.atleast_1d(route_time_limit)) for route in routes)
+
+# Check which Random_Greedy settings can be handled
+def test_supports():
+    assert Batch_Random_Greedy.supports(next_connection_choice="random")
+    assert not Batch_Random_Greedy.supports(next_connection_choice="shortest")
+    assert not Batch_Random_Greedy.supports(chance_of_early_route_end=True)
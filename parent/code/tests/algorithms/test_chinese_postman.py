@@ -0,0 +1,22 @@
+import random
+
+from parent.code.algorithms.chinese_postman import Chinese_Postman
+
+# Check every route stays within the time limit and, with enough routes
+# allowed, every connection is covered
+def test_routes_cover_all_connections():
+    for maprange, route_time_limit, max_routes in (("Holland", 120, 7), ("Nationaal", 180, 20)):
+        random.seed(0)
+        chinese_postman = Chinese_Postman(maprange)
+        routes = chinese_postman.run(n_tours=5)
+
+        assert len(routes) <= max_routes
+        assert all(route.time <= route_time_limit for route in routes)
+        assert all(route.time == sum(station1.connections[station2] for station1, station2
+                                     in zip(route.stations, route.stations[1:]))
+                   for route in routes)
+
+        covered = {tuple(sorted((station1.name, station2.name)))
+                   for route in routes
+                   for station1, station2 in zip(route.stations, route.stations[1:])}
+        assert covered == set(chinese_postman.load.connection_index)
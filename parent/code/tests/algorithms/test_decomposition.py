@@ -0,0 +1,40 @@
+from parent.code.algorithms.decomposition import Decomposition, geographic_partition, min_cut_partition
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.classes.railnl import RailNL
+from parent.code.helpers.score import calculate_score
+
+railnl = RailNL("Holland")
+
+# Check both partitions put every station in exactly one region, and a
+# region only has the connections inside it
+def test_partitions():
+    for partition in (geographic_partition, min_cut_partition):
+        regions = partition(railnl, 3)
+        assert len(regions) == 3
+        assert sorted(name for region in regions for name in region) == sorted(railnl.stations)
+
+        region = railnl.subgraph(regions[0])
+        assert all(station1.name in regions[0] and station2.name in regions[0]
+                   for station1, station2 in region.connection_list)
+
+# Check the stitched solution is valid and scored correctly
+def test_decomposition():
+    decomposition = Decomposition("Holland", n_regions=2, n_workers=1)
+    routes = decomposition.run(iterations=100, polish_iterations=0)
+    assert all(route.time <= 120 for route in routes)
+    assert abs(calculate_score(routes, "Holland") - decomposition.best_score) < 1e-6
+    assert decomposition.step_scores["repaired"] >= decomposition.step_scores["regions"]
+
+# Check a Hillclimber on a region scores like the whole map, also with
+# delta scoring (local operators and batches)
+def test_region_scores():
+    region = railnl.subgraph(geographic_partition(railnl, 2)[0])
+    for run_kwargs in ({"local_operators": True}, {"batch_size": 8}):
+        hillclimber = Hillclimber([], "Holland", load=region)
+        hillclimber.original_connections_only = False
+        start = [route for route in (hillclimber.generate_random_route() for _ in range(3))
+                 if len(route.stations) > 1]
+
+        hillclimber = Hillclimber(start, "Holland", load=region)
+        routes = hillclimber.run(200, print_every_improvement=False, **run_kwargs)
+        assert abs(calculate_score(routes, "Holland") - hillclimber.best_score) < 1e-6
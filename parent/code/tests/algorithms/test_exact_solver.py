@@ -0,0 +1,38 @@
+from parent.code.algorithms.exact_solver import Exact_Solver
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.algorithms.route_catalogue import Route_Catalogue
+
+# Small instance (short routes), so the exact search takes a moment
+solver = Exact_Solver("Holland", route_time_limit=60, max_routes=5, n_workers=2)
+solver.run()
+
+# Check the search was completed and the solution matches the optimum
+def test_certificate():
+    assert solver.certificate["proven_optimal"]
+    assert solver.verify()
+
+# Check the optimum agrees with the catalogue branch-and-bound
+def test_route_catalogue():
+    catalogue = Route_Catalogue("Holland", route_time_limit=60,
+                                allow_repeated_connections=True, maximal_only=False)
+    catalogue.run(max_routes=5, branch_and_bound=True)
+    assert catalogue.proven_optimal
+    assert abs(catalogue.best_score - solver.certificate["optimum"]) < 1e-6
+
+# Check heuristic solutions never beat the optimum
+def test_oracle():
+    random_greedy = Random_Greedy("Holland")
+    for _ in range(20):
+        routes = random_greedy.run(final_number_of_routes=5, route_time_limit=60)
+        assert solver.gap(routes) >= -1e-6
+
+# Check split keeps the best of the nodes it expands (also when the
+# whole tree is searched while splitting, so there are no subtrees)
+def test_split():
+    small = Exact_Solver("Holland", route_time_limit=60, max_routes=2, n_workers=1)
+    small.run()
+    frontier, _, best_score, best_chosen = small.split(
+        (0, 0, 0, (), 0.0, 0), float("-inf"), (), 10**9)
+    assert not frontier
+    assert abs(best_score - small.certificate["optimum"]) < 1e-6
+    assert abs(small.catalogue.objective(list(best_chosen)) - best_score) < 1e-6
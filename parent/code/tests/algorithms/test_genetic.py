@@ -0,0 +1,22 @@
+import random
+
+from parent.code.algorithms.genetic import Genetic, fitness
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.helpers.score import calculate_score
+
+genetic = Genetic("Holland", n_workers=1)
+
+# Check fitness equals calculate_score
+def test_fitness():
+    random.seed(0)
+    routes = Random_Greedy("Holland").run(final_number_of_routes=5)
+    individual = genetic.to_individual(routes)
+    assert abs(fitness(individual, genetic.edges, genetic.n_connections)
+               - calculate_score(routes, "Holland")) < 1e-6
+
+# Check the best score never gets worse, and matches the returned routes
+def test_run():
+    random.seed(0)
+    routes = genetic.run(generations=20, population_size=20, print_every_improvement=False)
+    assert genetic.scores == sorted(genetic.scores)
+    assert abs(calculate_score(routes, "Holland") - genetic.best_score) < 1e-6
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from parent.code.algorithms.hillclimber import Hillclimber
+from parent.code.algorithms.hillclimber_moves import Batch_Move, Local_Move, Replace_Move
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.elite_archive import Elite_Archive
+from parent.code.helpers.score import calculate_score
+
+random.seed(0)
+start = Random_Greedy("Holland").run(final_number_of_routes=5)
+
+# Check every move strategy keeps its score equal to calculate_score
+def test_move_strategies():
+    for run_kwargs, strategy in (({"targeted_moves": True, "transposition_table": True}, Replace_Move),
+                                 ({"batch_size": 8, "optimal_trimming": True}, Batch_Move),
+                                 ({"local_operators": True}, Local_Move)):
+        hillclimber = Hillclimber(list(start), "Holland")
+        routes = hillclimber.run(300, print_every_improvement=False, **run_kwargs)
+        assert isinstance(hillclimber.move, strategy)
+        assert abs(calculate_score(routes, "Holland") - hillclimber.best_score) < 1e-6
+
+class Worst_Archive(Elite_Archive):
+    """
+    Archive that always restarts from a single route.
+    """
+
+    def sample(self, load):
+        return [route_from_path([load.stations[station.name] for station in start[0].stations])]
+
+# Check the best solution is returned, also when restarts from the elite
+# archive move the current solution away from it
+def test_best_is_kept(tmp_path):
+    archive = Worst_Archive(str(tmp_path / "elite.db"))
+    hillclimber = Hillclimber(list(start), "Holland")
+    routes = hillclimber.run(300, cap=20, elite_archive=archive, print_every_improvement=False)
+
+    assert hillclimber.best_score >= max(hillclimber.scores)
+    assert hillclimber.best_score > calculate_score(start[:1], "Holland")
+    assert abs(calculate_score(routes, "Holland") - hillclimber.best_score) < 1e-6
+    assert archive.best()[0] == hillclimber.best_score
+
+# Check settings that cannot be combined, or would be ignored, are refused
+def test_invalid_settings():
+    for run_kwargs in ({"local_operators": True, "batch_size": 8},
+                       {"batch_size": 8, "transposition_table": True},
+                       {"local_operators": True, "optimal_trimming": True},
+                       {"improve_routes": False, "optimal_trimming": True},
+                       {"batch_size": 8, "batch_selection": "worst"}):
+        with pytest.raises(ValueError):
+            Hillclimber(list(start), "Holland").run(10, **run_kwargs)
+
+# Check the inverted index of targeted moves follows the accepted moves
+def test_targeted_state():
+    hillclimber = Hillclimber(list(start), "Holland")
+    hillclimber.run(300, targeted_moves=True, simulated_annealing=True,
+                    print_every_improvement=False)
+    move = hillclimber.move
+    assert ([[station.name for station in path] for path in move.state.paths]
+            == [[station.name for station in route.stations] for route in move.routes])
+    assert abs(move.state.score() - calculate_score(move.routes, "Holland")) < 1e-6
@@ -0,0 +1,21 @@
+import pytest
+
+from parent.code.algorithms.island_model import Island_Model
+from parent.code.helpers.score import calculate_score
+
+# Check every island sends and receives a migrant each epoch (ring), and
+# the best solution is the best of the islands
+def test_ring_migration():
+    model = Island_Model("Holland", n_islands=2, topology="ring")
+    routes = model.run(epochs=3, iterations=50, local_operators=True,
+                       migration_timeout=5)
+    assert all(epoch["received"] == 1 for log in model.island_logs for epoch in log["epochs"])
+    assert model.best_score == max(model.island_scores)
+    assert abs(calculate_score(routes, "Holland") - model.best_score) < 1e-6
+
+# Check an error in an island is raised in the parent, instead of the
+# parent waiting forever for its result
+def test_island_error():
+    model = Island_Model("Holland", n_islands=2)
+    with pytest.raises(RuntimeError):
+        model.run(epochs=1, iterations=10, bogus_kwarg=1)
@@ -0,0 +1,22 @@
+from parent.code.algorithms.multi_chain_hillclimber import Multi_Chain_Hillclimber
+from parent.code.helpers.score import calculate_score
+
+# Check the array state of every chain matches calculate_score, and
+# without simulated annealing no chain gets worse
+def test_chains():
+    chains = Multi_Chain_Hillclimber("Holland", n_chains=8, seed=0)
+    solutions = chains.run(300, pool_size=256, original_connections_only=True)
+
+    for solution, score in zip(solutions, chains.current_scores):
+        assert abs(calculate_score(solution, "Holland") - score) < 1e-6
+    assert (chains.current_scores >= chains.start_scores).all()
+    assert chains.scores.shape == (300, 8)
+
+# Check runs with the same seed give the same solutions
+def test_seed():
+    scores = []
+    for _ in range(2):
+        chains = Multi_Chain_Hillclimber("Holland", n_chains=4, seed=1)
+        chains.run(100, pool_size=64)
+        scores.append(chains.current_scores.tolist())
+    assert scores[0] == scores[1]
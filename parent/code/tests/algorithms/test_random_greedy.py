@@ -0,0 +1,105 @@
+import random
+from collections import Counter
+
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.route import Route
+from parent.code.helpers.score import calculate_score
+
+random_greedy = Random_Greedy("Holland")
+
+
+def old_set_next_station(current_station, route, next_connection_choice,
+                         original_connections_only, chance_of_early_route_end,
+                         time_limit_this_route):
+    """
+    set_next_station as it was before the presorted adjacency: copy,
+    shuffle or sort the connections and pop from the front.
+    """
+    connections = current_station.get_connections()
+    if chance_of_early_route_end:
+        connections.append(tuple([current_station, 0]))
+
+    if next_connection_choice == "random":
+        random.shuffle(connections)
+    else:
+        connections.sort(key=lambda x: x[1])
+
+    if original_connections_only:
+        while len(connections) > 0 and route.is_connection_used(current_station, connections[0][0]):
+            connections.pop(0)
+    while len(connections) > 0 and route.time + connections[0][1] > time_limit_this_route:
+        connections.pop(0)
+
+    if len(connections) == 0:
+        return "break"
+    if chance_of_early_route_end and connections[0][1] == 0:
+        return "break"
+    return connections[0][0]
+
+
+def random_states(n_states: int) -> list[tuple[Route, int, set]]:
+    """
+    Random partial routes, with a time limit and their connection keys.
+    """
+    random.seed(0)
+    states = []
+    for _ in range(n_states):
+        random_greedy.reset()
+        start = random_greedy.load.get_random_station()
+        route = random_greedy.create_a_route(start, random.randint(0, 90), "random", True, False)
+        if not route.stations:
+            route.stations.append(start)
+        keys = {tuple(sorted(connection[:2])) for connection in route.connections_used}
+        states.append((route, route.time + random.randint(0, 60), keys))
+    return states
+
+
+def new_choice(route, choice, original, early, time_limit, keys):
+    connection = random_greedy.set_next_station(route.stations[-1], route, choice,
+                                                original, early, time_limit, keys)
+    return connection if connection == "break" else connection[0]
+
+# Check "shortest" picks the same station as the old selection
+def test_shortest_equals_old():
+    for route, time_limit, keys in random_states(200):
+        for original in (False, True):
+            for early in (False, True):
+                assert (new_choice(route, "shortest", original, early, time_limit, keys)
+                        == old_set_next_station(route.stations[-1], route, "shortest",
+                                                original, early, time_limit))
+
+# Check "random" picks from the same options as the old selection, with
+# the same frequencies (under a fixed seed)
+def test_random_equals_old():
+    for route, time_limit, keys in random_states(20):
+        for early in (False, True):
+            random.seed(1)
+            new = Counter(new_choice(route, "random", False, early, time_limit, keys)
+                          for _ in range(2000))
+            random.seed(1)
+            old = Counter(old_set_next_station(route.stations[-1], route, "random",
+                                               False, early, time_limit)
+                          for _ in range(2000))
+
+            assert set(new) == set(old)
+            assert all(abs(new[option] - old[option]) < 150 for option in new)
+
+# Check beam search routes stay within the time limit, and score at
+# least as well as greedy routes (a beam of one, one connection deep,
+# and "shortest") on fixed seeds
+def test_beam_search():
+    for maprange, route_time_limit, n_routes in (("Holland", 120, 7), ("Nationaal", 180, 20)):
+        builder = Random_Greedy(maprange)
+        for seed in range(3):
+            scores = {}
+            for name, settings in (("beam", {"next_connection_choice": "beam"}),
+                                   ("greedy", {"next_connection_choice": "beam",
+                                               "beam_width": 1, "beam_depth": 1}),
+                                   ("shortest", {"next_connection_choice": "shortest"})):
+                random.seed(seed)
+                routes = builder.run(starting_stations="original_stations_only_hard",
+                                     final_number_of_routes=n_routes, **settings)
+                assert all(route.time <= route_time_limit for route in routes)
+                scores[name] = calculate_score(routes, maprange)
+
+            assert scores["beam"] >= max(scores["greedy"], scores["shortest"])
@@ -0,0 +1,30 @@
+import random
+
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.algorithms.route_catalogue import Route_Catalogue
+from parent.code.algorithms.route_repair import Route_Repair
+
+random_greedy = Random_Greedy("Holland")
+load = random_greedy.load
+catalogue = Route_Catalogue("Holland", maximal_only=False)
+route_repair = Route_Repair(load, 120, max_nodes=10**6)
+
+# Check the repaired route is as good as the best route of the complete
+# catalogue, and fits within the time limit
+def test_best_route():
+    random.seed(0)
+    for _ in range(3):
+        routes = random_greedy.run(final_number_of_routes=3)
+        covered = {load.connection_index[tuple(sorted((station1.name, station2.name)))]
+                   for route in routes
+                   for station1, station2 in zip(route.stations, route.stations[1:])}
+        covered_mask = sum(1 << edge for edge in covered)
+
+        path, value = route_repair.best_route(covered)
+        best = max(bin(mask & ~covered_mask).count("1") * catalogue.value_per_connection - minutes
+                   for mask, minutes in zip(catalogue.masks, catalogue.minutes))
+
+        assert route_repair.exact
+        assert value >= best - 1e-6
+        assert sum(station1.connections[station2]
+                   for station1, station2 in zip(path, path[1:])) <= 120
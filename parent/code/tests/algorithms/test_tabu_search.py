@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.algorithms.tabu_search import Tabu_List, Tabu_Search
+from parent.code.classes.coverage import Coverage_Array, canonical_route
+from parent.code.helpers.score import calculate_score
+
+random.seed(0)
+start = Random_Greedy("Holland").run(final_number_of_routes=5)
+
+# Check a route is tabu for `tenure` iterations, and the oldest route is
+# forgotten when the list is full
+def test_tabu_list():
+    tabu_list = Tabu_List(tenure=3, size=2)
+    tabu_list.add(("A", "B"), 0)
+    assert tabu_list.is_tabu(("A", "B"), 2)
+    assert not tabu_list.is_tabu(("A", "B"), 3)
+
+    tabu_list.add(("B", "C"), 0)
+    tabu_list.add(("C", "D"), 0)
+    assert not tabu_list.is_tabu(("A", "B"), 1)
+    assert tabu_list.is_tabu(("B", "C"), 1) and tabu_list.is_tabu(("C", "D"), 1)
+
+# Check the returned routes have the best score
+def test_run():
+    random.seed(1)
+    tabu_search = Tabu_Search(list(start), "Holland")
+    routes = tabu_search.run(200, print_every_improvement=False)
+    assert abs(calculate_score(routes, "Holland") - tabu_search.best_score) < 1e-6
+
+# Check a tabu move is skipped, unless it gives a new best score
+def test_aspiration():
+    tabu_search = Tabu_Search(list(start), "Holland")
+    tabu_search.tabu_list = Tabu_List(tenure=10, size=50)
+    tabu_search.tabu_rejections = tabu_search.aspirations = 0
+
+    current = Coverage_Array(start, tabu_search.load)
+    tabu_search.best_score = current_score = current.score()
+    for path in current.paths:
+        tabu_search.tabu_list.add(canonical_route(path), 0)
+
+    # Removing any route is tabu: without a new best, no move is made
+    indices, new_paths = [0, 1], [[], []]
+    assert tabu_search.choose_move(current, indices, new_paths,
+                                   np.array([-50.0, -10.0]), current_score, 1) is None
+    assert tabu_search.tabu_rejections == 2
+
+    # A tabu move that gives a new best score is made
+    move = tabu_search.choose_move(current, indices, new_paths,
+                                   np.array([-50.0, 10.0]), current_score, 1)
+    assert move == (1, [], canonical_route(current.paths[1]))
+    assert tabu_search.aspirations == 1
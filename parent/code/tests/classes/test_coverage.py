@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.coverage import Coverage, Coverage_Array, best_subpath, path_keys
+from parent.code.helpers.score import calculate_score
+
+random_greedy = Random_Greedy("Holland")
+
+# Check the coverage score equals calculate_score
+def test_score():
+    routes = random_greedy.run(final_number_of_routes=5)
+    coverage = Coverage(routes, 28)
+    assert abs(coverage.score() - calculate_score(routes, "Holland")) < 1e-6
+
+# Check delta scoring equals the change in score
+def test_delta():
+    random.seed(0)
+    for _ in range(20):
+        routes = random_greedy.run(final_number_of_routes=5)
+        coverage = Coverage(routes, 28)
+        new_path = random_greedy.run(final_number_of_routes=1)[0].stations
+
+        new_routes = routes[:2] + [route_from_path(new_path)]
+        delta = coverage.delta([route.stations for route in routes[2:]], [new_path])
+        assert abs(calculate_score(new_routes, "Holland")
+                   - calculate_score(routes, "Holland") - delta) < 1e-6
+
+# Check batch deltas equal the change in score for every candidate
+def test_batch_delta():
+    random.seed(0)
+    routes = random_greedy.run(final_number_of_routes=5)
+    state = Coverage_Array(routes, random_greedy.load)
+    new_paths = [random_greedy.run(final_number_of_routes=1)[0].stations for _ in range(6)]
+    indices = [0, 1, 2, 3, 4, 5]
+
+    deltas = state.batch_delta(indices, new_paths)
+    for index, new_path, delta in zip(indices, new_paths, deltas):
+        new_routes = routes[:index] + [route_from_path(new_path)] + routes[index + 1:]
+        assert abs(calculate_score(new_routes, "Holland")
+                   - calculate_score(routes, "Holland") - delta) < 1e-6
+
+# Check the best sub-route equals the best of all contiguous parts
+def test_best_subpath():
+    random.seed(0)
+    value_per_connection = 10000 / 28
+    for _ in range(20):
+        path = random_greedy.run(final_number_of_routes=1)[0].stations
+        path = path + path[-2::-1] if random.random() < 0.5 else path
+        covered = {key for key in path_keys(path) if random.random() < 0.6}
+        start, end, value = best_subpath(path, lambda key: key in covered, value_per_connection)
+
+        best = 0.0
+        for i in range(len(path)):
+            for j in range(i + 1, len(path)):
+                part = path[i:j + 1]
+                new = set(path_keys(part)) - covered
+                minutes = sum(station1.connections[station2] for station1, station2 in zip(part, part[1:]))
+                best = max(best, len(new) * value_per_connection - minutes)
+
+        part = path[start:end + 1]
+        assert abs(value - best) < 1e-6
+        assert value == 0.0 or abs(len(set(path_keys(part)) - covered) * value_per_connection
+                                   - sum(station1.connections[station2]
+                                         for station1, station2 in zip(part, part[1:])) - value) < 1e-6
+
+# Check the inverted index stays equal to a recount after many replaces
+def test_inverted_index():
+    random.seed(0)
+    state = Coverage_Array(random_greedy.run(final_number_of_routes=5), random_greedy.load)
+    for _ in range(50):
+        index = random.randrange(len(state.paths) + 1)
+        new_path = random_greedy.run(final_number_of_routes=1)[0].stations
+        state.replace(index, new_path if random.random() < 0.8 else [])
+
+        for connection in range(state.n_connections):
+            assert sorted(state.routes_covering(connection)) == [
+                i for i, vector in enumerate(state.vectors) if vector[connection] > 0]
+        for i in range(len(state.paths)):
+            alone = np.count_nonzero((state.vectors[i] > 0) & (state.counts == state.vectors[i]))
+            assert state.unique_coverage(i) == alone
+
+            routes = [route_from_path(path) for path in state.paths]
+            without = routes[:i] + routes[i + 1:]
+            assert abs(calculate_score(routes, "Holland") - calculate_score(without, "Holland")
+                       - state.contribution(i)) < 1e-6
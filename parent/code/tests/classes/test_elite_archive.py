@@ -0,0 +1,63 @@
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.elite_archive import Elite_Archive, solution_digest
+from parent.code.helpers.score import calculate_score
+
+random_greedy = Random_Greedy("Holland")
+
+# Directory with the parent package
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 4))
+
+
+def publish_random_solutions(archive: Elite_Archive, seed: int) -> int:
+    random.seed(seed)
+    added = 0
+    for _ in range(10):
+        routes = random_greedy.run(final_number_of_routes=4)
+        added += archive.publish(routes, calculate_score(routes, "Holland"))
+    return added
+
+# Check duplicates are stored once, and sampled solutions keep their score
+def test_publish_and_sample(tmp_path):
+    archive = Elite_Archive(str(tmp_path / "elites.db"), "Holland")
+    routes = random_greedy.run(final_number_of_routes=4)
+    score = calculate_score(routes, "Holland")
+
+    assert archive.publish(routes, score)
+    assert not archive.publish(routes[::-1], score)
+    assert len(archive) == 1
+
+    sampled = archive.sample(random_greedy.load)
+    assert abs(calculate_score(sampled, "Holland") - score) < 1e-6
+
+# Check workers can publish at the same time, and only the best are kept
+def test_concurrent_workers(tmp_path):
+    archive = Elite_Archive(str(tmp_path / "elites.db"), "Holland", max_size=15)
+    with ProcessPoolExecutor(4) as pool:
+        list(pool.map(publish_random_solutions, [archive] * 8, range(8)))
+
+    assert len(archive) == 15
+    assert archive.best()[0] >= archive.threshold
+
+# Check the key of a solution is the same in another interpreter (with
+# another hash seed), so a solution is stored once across runs
+def test_digest_across_processes():
+    code = ("from parent.code.algorithms.operators import route_from_path\n"
+            "from parent.code.classes.railnl import RailNL\n"
+            "load = RailNL('Holland')\n"
+            "routes = [route_from_path(list(pair)) for pair in load.connection_list[:3]]\n")
+    namespace: dict = {}
+    exec(code, namespace)
+
+    for hash_seed in ("1", "2"):
+        output = subprocess.run(
+            [sys.executable, "-c", code + "from parent.code.classes.elite_archive import "
+             "solution_digest\nprint(solution_digest(routes))"],
+            capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": hash_seed, "PYTHONPATH": root_dir})
+        assert output.stdout.strip() == solution_digest(namespace["routes"])
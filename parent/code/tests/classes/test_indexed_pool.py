@@ -0,0 +1,17 @@
+from parent.code.classes.indexed_pool import IndexedPool
+
+pool = IndexedPool({"a": 1, "b": 2, "c": 3})
+
+# Check swap-remove keeps membership and values consistent
+def test_pop():
+    copy = pool.copy()
+    assert copy.pop("a") == 1
+    assert "a" not in copy and "c" in copy
+    assert sorted(copy.values()) == [2, 3]
+    assert len(pool) == 3
+
+# Check random choice only returns values in the pool
+def test_random_choice():
+    copy = pool.copy()
+    copy.pop("b")
+    assert all(copy.random_choice() in (1, 3) for _ in range(20))
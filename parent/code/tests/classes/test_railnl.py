@@ -1,3 +1,5 @@
+import pytest
+
 from parent.code.classes.railnl import RailNL
 from parent.code.classes.railnl import Station
 
@@ -21,4 +23,37 @@ def test_max():
 
 # Check if random station is of type Station
 def test_random():
-    assert isinstance(railnl.get_random_station(), Station)
\ No newline at end of file
+    assert isinstance(railnl.get_random_station(), Station)
+
+# Check CSR adjacency contains every connection in both directions
+def test_csr():
+    indptr, indices, durations, edge_ids = railnl.get_csr()
+    assert indptr[-1] == 2 * len(railnl.get_total_connections())
+    assert sorted(edge_ids.tolist()) == sorted(2 * list(range(28)))
+
+# Check Floyd-Warshall and Dijkstra agree, and paths have the right length
+def test_shortest_paths():
+    distances, predecessors = railnl.floyd_warshall()
+    assert (distances == railnl.dijkstra_all_pairs()[0]).all()
+    assert (distances == railnl.get_shortest_paths(use_cache=False)[0]).all()
+
+    n = len(railnl.station_list)
+    for source in range(n):
+        for target in range(n):
+            path = [railnl.station_list[i] for i in railnl.shortest_path(source, target)]
+            minutes = sum(station1.connections[station2] for station1, station2 in zip(path, path[1:]))
+            assert minutes == distances[source, target]
+
+# Check a path between unconnected stations raises instead of looping
+def test_unreachable_path():
+    station1, station2 = railnl.connection_list[0]
+    other = next(station for station in railnl.station_list
+                 if station not in (station1, station2)
+                 and station not in station1.connections and station not in station2.connections)
+    region = railnl.subgraph([station1.name, station2.name, other.name])
+    index = region.station_index
+
+    assert region.shortest_path(index[station1.name], index[station2.name]) == [
+        index[station1.name], index[station2.name]]
+    with pytest.raises(ValueError):
+        region.shortest_path(index[station1.name], index[other.name])
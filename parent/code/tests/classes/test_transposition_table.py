@@ -0,0 +1,22 @@
+from parent.code.algorithms.operators import route_from_path
+from parent.code.algorithms.random_greedy import Random_Greedy
+from parent.code.classes.transposition_table import Transposition_Table, solution_hash
+
+random_greedy = Random_Greedy("Holland")
+
+# Check the hash ignores route order and direction
+def test_solution_hash():
+    routes = random_greedy.run(final_number_of_routes=4)
+    reversed_routes = [route_from_path(route.stations[::-1]) for route in routes[::-1]]
+    assert solution_hash(routes) == solution_hash(reversed_routes)
+    assert solution_hash(routes) != solution_hash(routes[1:])
+
+# Check least recently used scores are forgotten first, and hits are counted
+def test_lru():
+    table = Transposition_Table(max_size=2)
+    table.put(1, 10.0)
+    table.put(2, 20.0)
+    assert table.get(1) == 10.0
+    table.put(3, 30.0)
+    assert table.get(2) is None and table.get(3) == 30.0
+    assert table.hits == 2 and table.misses == 1
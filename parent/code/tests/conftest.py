@@ -0,0 +1,12 @@
+import shutil
+import tempfile
+
+from parent.code.classes import railnl
+
+# Keep the shortest paths the tests compute out of parent/data/cache
+# (see RailNL.get_shortest_paths)
+def pytest_configure(config):
+    railnl.cache_path = tempfile.mkdtemp()
+
+def pytest_unconfigure(config):
+    shutil.rmtree(railnl.cache_path, ignore_errors=True)
@@ -0,0 +1,15 @@
+from parent.code.classes.railnl import RailNL
+from parent.code.helpers.bounds import minimum_routes, optimality_gap, upper_bound
+
+# Check the bound for Holland equals the proven optimum
+def test_upper_bound_holland():
+    assert round(upper_bound("Holland")) == 9210
+
+# Check the minimum number of routes to cover all of Holland
+def test_minimum_routes():
+    assert minimum_routes(RailNL("Holland"), 120) == 4
+
+# Check the gap is relative and never negative
+def test_optimality_gap():
+    assert optimality_gap(9000, 10000) == 0.1
+    assert optimality_gap(10000, 9000) == 0